@@ -28,6 +28,230 @@ def get_carpeta_procesados() -> str:
     os.makedirs(carpeta, exist_ok=True)
     return carpeta
 
+def get_parseo_columnar() -> bool:
+    """
+    Indica si el parser debe devolver columnas tipadas (categóricas / float64).
+    """
+    return os.getenv("PARSEO_COLUMNAR", "0").lower() in ("1", "true", "si", "sí")
+
+def get_carpeta_archivo_cfe() -> str:
+    """
+    Devuelve y asegura la existencia de la carpeta con los packs de XML crudos archivados.
+    """
+    carpeta = os.getenv("CARPETA_ARCHIVO_CFE", "./data/archivo_cfe")
+    os.makedirs(carpeta, exist_ok=True)
+    return carpeta
+
+def get_manifiesto_path() -> str:
+    """
+    Devuelve la ruta de la base SQLite con el manifiesto de CFE procesados.
+    """
+    return os.getenv("MANIFIESTO_PATH", "./data/manifiesto_cfe.db")
+
+def get_workers_parseo() -> int:
+    """
+    Devuelve la cantidad de procesos a usar para parsear XMLs (1 = serial).
+    """
+    return max(1, int(os.getenv("WORKERS_PARSEO", "1")))
+
+def get_motor_xml() -> str:
+    """
+    Devuelve el motor de parseo de XML a usar ("etree" o "lxml").
+    """
+    return os.getenv("MOTOR_XML", "etree")
+
+def get_intervalo_vigilancia() -> float:
+    """
+    Devuelve cada cuántos segundos se revisan las carpetas de descarga en modo vigilancia.
+    """
+    return float(os.getenv("INTERVALO_VIGILANCIA", "1.0"))
+
+def get_tamano_cola_etapas() -> int:
+    """
+    Devuelve cuántos lotes puede tener en espera cada etapa del pipeline (parseo, red de
+    pescadores, IA, subida) antes de frenar a la anterior.
+    """
+    return max(1, int(os.getenv("TAMANO_COLA_ETAPAS", "2")))
+
+def get_motor_red_de_pescadores() -> str:
+    """
+    Devuelve el motor de búsqueda de la red de pescadores ("secuencia" o "trigramas").
+    """
+    return os.getenv("MOTOR_RED_DE_PESCADORES", "secuencia")
+
+def get_umbral_proveedor_red() -> float:
+    """
+    Devuelve la similitud mínima entre nombres de proveedor para buscar en el histórico
+    de un proveedor parecido (solo con el motor "trigramas").
+    """
+    return float(os.getenv("UMBRAL_PROVEEDOR_RED", "0.85"))
+
+def get_workers_red() -> int:
+    """
+    Devuelve cuántos procesos usa la red de pescadores para buscar los ítems nuevos en el histórico.
+    """
+    return int(os.getenv("WORKERS_RED", "1"))
+
+def get_carpeta_historico_local() -> str:
+    """
+    Devuelve la carpeta del histórico verificado local de la red de pescadores (vacío = sin
+    histórico local: se descarga todo de Supabase en cada corrida).
+    """
+    return os.getenv("CARPETA_HISTORICO_LOCAL", "./data/historico_local")
+
+def get_historico_max_dias() -> float:
+    """
+    Devuelve cada cuántos días el histórico local se vuelve a descargar completo.
+    """
+    return float(os.getenv("HISTORICO_MAX_DIAS", "7"))
+
+def get_columna_cambios_historico() -> str:
+    """
+    Devuelve la columna de fecha de modificación de las tablas de Supabase con la que se
+    traen las filas cambiadas desde el último refresco (vacío = solo filas nuevas por id).
+    """
+    return os.getenv("HISTORICO_COLUMNA_CAMBIOS", "")
+
+def get_concurrencia_ia() -> int:
+    """
+    Devuelve cuántos pedidos de clasificación a OpenAI pueden estar en vuelo a la vez.
+    """
+    return max(1, int(os.getenv("CONCURRENCIA_IA", "8")))
+
+def get_rpm_ia() -> int:
+    """
+    Devuelve el límite de pedidos por minuto a OpenAI.
+    """
+    return int(os.getenv("RPM_IA", "500"))
+
+def get_tpm_ia() -> int:
+    """
+    Devuelve el límite de tokens por minuto a OpenAI.
+    """
+    return int(os.getenv("TPM_IA", "200000"))
+
+def get_presupuesto_tokens_lote() -> int:
+    """
+    Devuelve el máximo de tokens de datos (ítems) por pedido de clasificación.
+    """
+    return int(os.getenv("PRESUPUESTO_TOKENS_LOTE", "4000"))
+
+def get_max_proporcion_errores_ia() -> float:
+    """
+    Devuelve la proporción máxima de ítems sin clasificar (categoria 'error') con la que
+    igual se sube el lote; por encima se corta la corrida (p. ej. la API está caída).
+    """
+    return float(os.getenv("MAX_PROPORCION_ERRORES_IA", "0.1"))
+
+def get_modo_salida_ia(defecto: str = "nombres") -> str:
+    """
+    Devuelve cómo responde la IA al clasificar: "indices" (salida estructurada con pares
+    [rowid, número de categoría]) o "nombres" (lista JSON con el nombre de la categoría).
+    Sin SALIDA_IA vale 'defecto': "nombres" para clasificar_lote y las llamadas directas,
+    y el pipeline pide "indices".
+    """
+    return os.getenv("SALIDA_IA", defecto)
+
+def get_reglas_categorias() -> bool:
+    """
+    Indica si se aplican las reglas de palabras clave de la taxonomía antes de la IA.
+    """
+    return os.getenv("REGLAS_CATEGORIAS", "1").lower() in ("1", "true", "si", "sí")
+
+def get_modelo_local() -> bool:
+    """
+    Indica si se usa el modelo local entrenado con el histórico antes de la IA.
+    """
+    return os.getenv("MODELO_LOCAL", "1").lower() in ("1", "true", "si", "sí")
+
+def get_carpeta_modelos_locales() -> str:
+    """
+    Devuelve la carpeta con las versiones del modelo local (una subcarpeta por empresa).
+    """
+    return os.getenv("CARPETA_MODELOS_LOCALES", "./data/modelos_locales")
+
+def get_umbral_modelo_local(empresa: str = None) -> float:
+    """
+    Devuelve la probabilidad mínima para aceptar la categoría del modelo local.
+    UMBRAL_MODELO_LOCAL_<EMPRESA> pisa el valor general.
+    """
+    valor = os.getenv(f"UMBRAL_MODELO_LOCAL_{empresa.upper()}") if empresa else None
+    return float(valor or os.getenv("UMBRAL_MODELO_LOCAL", "0.9"))
+
+def get_clasificacion_cascada() -> bool:
+    """
+    Indica si la clasificación con IA usa la cascada de modelos (barato primero).
+    """
+    return os.getenv("CLASIFICACION_CASCADA", "0").lower() in ("1", "true", "si", "sí")
+
+def get_modelos_cascada() -> list:
+    """
+    Devuelve los modelos de la cascada, del más barato al más fuerte.
+    """
+    return [m.strip() for m in os.getenv("MODELOS_CASCADA", "gpt-4o-mini,gpt-4o").split(",") if m.strip()]
+
+def get_umbral_confianza(empresa: str = None) -> float:
+    """
+    Devuelve la confianza mínima para aceptar la categoría de un nivel de la cascada.
+    UMBRAL_CONFIANZA_<EMPRESA> (p. ej. UMBRAL_CONFIANZA_NIKE) pisa el valor general.
+    """
+    valor = os.getenv(f"UMBRAL_CONFIANZA_{empresa.upper()}") if empresa else None
+    return float(valor or os.getenv("UMBRAL_CONFIANZA", "0.9"))
+
+def get_clasificacion_cola() -> bool:
+    """
+    Indica si la clasificación con IA se reparte en la cola de trabajos entre procesos.
+    """
+    return os.getenv("CLASIFICACION_COLA", "0").lower() in ("1", "true", "si", "sí")
+
+def get_cola_trabajos_path() -> str:
+    """
+    Devuelve la ruta de la base SQLite de la cola de trabajos.
+    """
+    return os.getenv("COLA_TRABAJOS_PATH", "./data/cola_trabajos.db")
+
+def get_lease_cola() -> float:
+    """
+    Devuelve los segundos que un trabajador tiene reservado un trabajo sin dar señales de vida.
+    """
+    return float(os.getenv("LEASE_COLA", "120"))
+
+def get_trabajadores_cola() -> int:
+    """
+    Devuelve cuántos procesos trabajadores lanza el pipeline (0 = solo trabajadores externos).
+    """
+    return int(os.getenv("TRABAJADORES_COLA", "4"))
+
+def get_clasificacion_batch() -> bool:
+    """
+    Indica si la clasificación con IA del pipeline usa la Batch API (offline, más barata).
+    """
+    return os.getenv("CLASIFICACION_BATCH", "0").lower() in ("1", "true", "si", "sí")
+
+def get_carpeta_trabajos_batch() -> str:
+    """
+    Devuelve la carpeta donde se guardan los registros de trabajos de la Batch API.
+    """
+    return os.getenv("CARPETA_TRABAJOS_BATCH", "./data/batch")
+
+def get_cache_clasificacion_path() -> str:
+    """
+    Devuelve la ruta de la cache local de clasificaciones ("" la desactiva).
+    """
+    return os.getenv("CACHE_CLASIFICACION_PATH", "./data/cache_clasificacion.db")
+
+def get_cache_clasificacion_ttl_dias() -> int:
+    """
+    Devuelve cuántos días vale una clasificación guardada en la cache.
+    """
+    return int(os.getenv("CACHE_CLASIFICACION_TTL_DIAS", "365"))
+
+def get_cache_clasificacion_max() -> int:
+    """
+    Devuelve la cantidad máxima de entradas de la cache (se descartan las menos usadas).
+    """
+    return int(os.getenv("CACHE_CLASIFICACION_MAX", "200000"))
+
 def get_datalogic_credentials():
     """
     Returns a list of dictionaries containing credentials for each client.
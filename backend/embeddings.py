@@ -22,6 +22,16 @@ def generar_embedding(texto):
     )
     return response.data[0].embedding
 
+def generar_embeddings(textos):
+    """
+    Genera los embeddings de varios textos en un solo pedido (en el mismo orden).
+    """
+    response = openai_client.embeddings.create(
+        input=textos,
+        model="text-embedding-3-small"
+    )
+    return [dato.embedding for dato in sorted(response.data, key=lambda d: d.index)]
+
 def concatenar_columnas_contenido(fila, excluir=("id", "embedding")):
     partes = []
     for clave, valor in fila.items():
@@ -52,5 +62,43 @@ def actualizar_embeddings(tabla):
         except Exception as e:
             print(f"❌ Error con ID {fila['id']}: {e}")
 
-# Usar la función
-actualizar_embeddings("vector_redomon_2025")
\ No newline at end of file
+def actualizar_embeddings_por_ids(tabla, ids):
+    """
+    Genera y guarda los embeddings de las filas indicadas (un trabajo de la cola de embeddings).
+    Devuelve cuántas filas se actualizaron.
+    """
+    filas = supabase.table(tabla).select("*").in_("id", ids).is_("embedding", "null").execute()
+    if not filas.data:
+        return 0
+    embeddings = generar_embeddings([concatenar_columnas_contenido(fila) for fila in filas.data])
+    for fila, embedding in zip(filas.data, embeddings):
+        supabase.table(tabla).update({
+            "embedding": embedding
+        }).eq("id", fila["id"]).execute()
+    print(f"✅ Embeddings generados para {len(filas.data)} filas de {tabla}")
+    return len(filas.data)
+
+def encolar_embeddings(tabla, tamano=100):
+    """
+    Encola las filas sin embedding de la tabla en trabajos de 'tamano' ids, para que los
+    procese cualquier cantidad de trabajadores (ver backend/scripts/trabajador_cola.py).
+    """
+    from backend.etl.supabase_client import _descargar_paginado
+    from backend.etl.trabajos_cola import COLA_EMBEDDINGS, clave_trabajo, obtener_cola
+
+    # PostgREST corta cada respuesta en 1000 filas: se pide de a páginas
+    filas = _descargar_paginado(lambda: supabase.table(tabla).select("id").is_("embedding", "null"))
+    ids = sorted(fila["id"] for fila in filas)
+    trabajos = [
+        (clave_trabajo(tabla, ids[i:i + tamano]), {"tabla": tabla, "ids": ids[i:i + tamano]})
+        for i in range(0, len(ids), tamano)
+    ]
+    cola = obtener_cola()
+    nuevos = cola.encolar(COLA_EMBEDDINGS, tabla, trabajos)
+    cola.cerrar()
+    print(f"📥 {len(ids)} filas sin embedding en {tabla}: {nuevos} trabajos nuevos en la cola.")
+    return nuevos
+
+if __name__ == "__main__":
+    # Usar la función
+    actualizar_embeddings("vector_redomon_2025")
\ No newline at end of file
@@ -0,0 +1,143 @@
+# etl/archivo_cfe.py
+import hashlib
+import json
+import os
+import zlib
+from typing import Dict, Iterator, List, Optional, Tuple
+
+
+class ArchivoCFE:
+    """
+    Archivo comprimido de los XML crudos de una empresa y un período (mes).
+    Cada documento se guarda comprimido con zlib al final de '{periodo}.pack' y su
+    ubicación se agrega a '{periodo}.idx' (una línea JSON por documento: archivo,
+    offset, longitud, tamaño original y sha256). Si un archivo vuelve con otro contenido
+    se agrega de nuevo y la última entrada del índice es la que vale. Permite releer un
+    mes entero o un documento suelto sin volver a descargarlo de Datalogic.
+    """
+
+    def __init__(self, carpeta_base: str, empresa: str, periodo: str):
+        self.carpeta = os.path.join(carpeta_base, empresa)
+        os.makedirs(self.carpeta, exist_ok=True)
+        self.ruta_pack = os.path.join(self.carpeta, f"{periodo}.pack")
+        self.ruta_indice = os.path.join(self.carpeta, f"{periodo}.idx")
+        self.indice = self._cargar_indice()
+
+    def _cargar_indice(self) -> Dict[str, Tuple[int, int, Optional[str]]]:
+        """
+        Lee el índice descartando entradas que apunten más allá del pack (escrituras cortadas).
+        """
+        indice = {}
+        if not os.path.exists(self.ruta_indice):
+            return indice
+
+        tamano_pack = os.path.getsize(self.ruta_pack) if os.path.exists(self.ruta_pack) else 0
+        with open(self.ruta_indice, "r", encoding="utf-8") as f:
+            for linea in f:
+                try:
+                    entrada = json.loads(linea)
+                except json.JSONDecodeError:
+                    continue
+                if entrada["offset"] + entrada["longitud"] <= tamano_pack:
+                    indice[entrada["archivo"]] = (entrada["offset"], entrada["longitud"], entrada.get("sha256"))
+        return indice
+
+    def __contains__(self, archivo: str) -> bool:
+        return archivo in self.indice
+
+    def __len__(self) -> int:
+        return len(self.indice)
+
+    def archivos(self) -> List[str]:
+        return list(self.indice)
+
+    def agregar(self, archivo: str, contenido: bytes) -> bool:
+        """
+        Agrega un documento al final del pack. Si ya está archivado con el mismo contenido
+        no hace nada.
+
+        Returns:
+            True si se agregó, False si ya existía.
+        """
+        return self.agregar_comprimido(archivo, comprimir_documento(contenido))
+
+    def agregar_comprimido(self, archivo: str, documento: Dict) -> bool:
+        """
+        Agrega un documento ya comprimido con comprimir_documento (p. ej. en un worker del parser).
+
+        Returns:
+            True si se agregó, False si ya estaba archivado con el mismo sha256.
+        """
+        if archivo in self.indice and self._sha256(archivo) == documento["sha256"]:
+            return False
+
+        comprimido = documento["comprimido"]
+        with open(self.ruta_pack, "ab") as pack:
+            offset = pack.tell()
+            pack.write(comprimido)
+
+        with open(self.ruta_indice, "a", encoding="utf-8") as indice:
+            indice.write(json.dumps({
+                "archivo": archivo,
+                "offset": offset,
+                "longitud": len(comprimido),
+                "tamano": documento["tamano"],
+                "sha256": documento["sha256"]
+            }, ensure_ascii=False) + "\n")
+
+        self.indice[archivo] = (offset, len(comprimido), documento["sha256"])
+        return True
+
+    def _sha256(self, archivo: str) -> str:
+        sha256 = self.indice[archivo][2]
+        if sha256 is None:
+            # Entrada de un índice anterior al sha256: se calcula con el contenido archivado
+            sha256 = hashlib.sha256(self.leer(archivo)).hexdigest()
+            self.indice[archivo] = (*self.indice[archivo][:2], sha256)
+        return sha256
+
+    def leer(self, archivo: str) -> Optional[bytes]:
+        """
+        Devuelve el contenido original de un documento, o None si no está archivado.
+        """
+        ubicacion = self.indice.get(archivo)
+        if ubicacion is None:
+            return None
+        offset, longitud, _ = ubicacion
+        with open(self.ruta_pack, "rb") as pack:
+            pack.seek(offset)
+            return zlib.decompress(pack.read(longitud))
+
+    def iterar(self, archivos: List[str] = None) -> Iterator[Tuple[str, bytes]]:
+        """
+        Recorre los documentos (todos, o los indicados) en orden de archivo dentro del pack.
+        """
+        if archivos is None:
+            seleccion = sorted(self.indice.items(), key=lambda e: e[1][0])
+        else:
+            seleccion = sorted(
+                ((a, self.indice[a]) for a in archivos if a in self.indice),
+                key=lambda e: e[1][0]
+            )
+
+        if not seleccion:
+            return
+        with open(self.ruta_pack, "rb") as pack:
+            for archivo, (offset, longitud, _) in seleccion:
+                pack.seek(offset)
+                yield archivo, zlib.decompress(pack.read(longitud))
+
+
+def comprimir_documento(contenido: bytes, sha256: str = None) -> Dict:
+    """
+    Comprime un documento para ArchivoCFE.agregar_comprimido. Se puede llamar en otro
+    proceso (el resultado viaja comprimido); 'sha256' evita recalcular el hash si ya se tiene.
+
+    Returns:
+        Dict con 'comprimido', 'tamano' (original) y 'sha256'.
+    """
+    return {
+        "comprimido": zlib.compress(contenido, 6),
+        "tamano": len(contenido),
+        "sha256": sha256 or hashlib.sha256(contenido).hexdigest()
+    }
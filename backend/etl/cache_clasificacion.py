@@ -0,0 +1,193 @@
+# etl/cache_clasificacion.py
+import hashlib
+import os
+import sqlite3
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Tuple
+
+from backend.etl.red_de_pescadores import normalizar_texto
+
+
+def version_clasificacion(modelo: str, mensajes: List[Dict]) -> str:
+    """
+    Versión de la clasificación: hash del modelo y de la parte fija del prompt. Si cambia
+    el prompt o el modelo, las entradas viejas dejan de usarse.
+    """
+    contenido = modelo + "\n" + "\n".join(m["content"] for m in mensajes)
+    return hashlib.sha256(contenido.encode("utf-8")).hexdigest()[:16]
+
+
+def clave_item(item: Dict) -> str:
+    """
+    Clave normalizada de un ítem: RUC del proveedor (o su nombre si no hay RUC) + descripción.
+    """
+    ruc = item.get("ruc")
+    emisor = ruc.strip() if isinstance(ruc, str) and ruc.strip() else normalizar_texto(item.get("proveedor"))
+    return f"{emisor}|{normalizar_texto(item.get('descripcion'))}"
+
+
+class CacheClasificacion:
+    """
+    Cache local (SQLite) de categorías por (RUC/proveedor, descripción) normalizados, para no
+    volver a pagarle a la IA por ítems que ya clasificó en meses anteriores. Cada entrada
+    guarda la versión de modelo/prompt con la que se obtuvo; vencen a los 'ttl_dias' y, si
+    se supera 'max_entradas', se descartan las usadas hace más tiempo (LRU).
+    Cada corrida queda registrada en la tabla 'corridas' con sus aciertos y los tokens
+    ahorrados según 'estimador' (tokens que habría costado clasificar cada ítem).
+    """
+
+    def __init__(self, ruta: str, version: str, ttl_dias: int = 365, max_entradas: int = 200_000,
+                 estimador: Callable[[Dict], int] = None):
+        carpeta = os.path.dirname(ruta)
+        if carpeta:
+            os.makedirs(carpeta, exist_ok=True)
+        self.version = version
+        self.ttl_segundos = ttl_dias * 86400
+        self.max_entradas = max_entradas
+        self.estimador = estimador
+        self.conn = sqlite3.connect(ruta, check_same_thread=False)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS cache_clasificacion (
+                clave TEXT NOT NULL,
+                version TEXT NOT NULL,
+                categoria TEXT NOT NULL,
+                creado REAL NOT NULL,
+                ultimo_uso REAL NOT NULL,
+                usos INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (clave, version)
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_ultimo_uso ON cache_clasificacion (ultimo_uso)")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS corridas (
+                fecha TEXT NOT NULL,
+                version TEXT NOT NULL,
+                consultas INTEGER NOT NULL,
+                aciertos INTEGER NOT NULL,
+                tokens_ahorrados INTEGER NOT NULL
+            )
+        """)
+        self.conn.commit()
+        self.consultas = 0
+        self.aciertos = 0
+        self.tokens_ahorrados = 0
+
+    def buscar(self, items: List[Dict]) -> Tuple[List[Dict], List[Dict]]:
+        """
+        Busca los ítems en la cache.
+
+        Returns:
+            (resultados con 'rowid' y 'categoria' de los encontrados, ítems que faltan clasificar)
+        """
+        claves = {clave_item(item) for item in items}
+        vigentes_desde = time.time() - self.ttl_segundos
+        categorias = {}
+        lista = list(claves)
+        for i in range(0, len(lista), 500):
+            bloque = lista[i:i + 500]
+            marcadores = ", ".join("?" * len(bloque))
+            categorias.update(self.conn.execute(
+                f"SELECT clave, categoria FROM cache_clasificacion WHERE version = ? AND creado >= ? AND clave IN ({marcadores})",
+                [self.version, vigentes_desde, *bloque]
+            ).fetchall())
+
+        encontrados, faltantes = [], []
+        for item in items:
+            categoria = categorias.get(clave_item(item))
+            if categoria is None:
+                faltantes.append(item)
+            else:
+                encontrados.append({"rowid": item["rowid"], "categoria": categoria})
+                if self.estimador is not None:
+                    self.tokens_ahorrados += self.estimador(item)
+
+        if categorias:
+            self.conn.executemany(
+                "UPDATE cache_clasificacion SET ultimo_uso = ?, usos = usos + 1 WHERE clave = ? AND version = ?",
+                [(time.time(), clave, self.version) for clave in categorias]
+            )
+            self.conn.commit()
+
+        self.consultas += len(items)
+        self.aciertos += len(encontrados)
+        return encontrados, faltantes
+
+    def guardar(self, items: List[Dict], resultados: List[Dict]) -> None:
+        """
+        Guarda las categorías devueltas por la IA (las 'error' no se guardan).
+        """
+        por_rowid = {r["rowid"]: r.get("categoria") for r in resultados}
+        ahora = time.time()
+        filas = {}
+        for item in items:
+            categoria = por_rowid.get(item["rowid"])
+            if isinstance(categoria, str) and categoria and categoria != "error":
+                filas[clave_item(item)] = categoria
+
+        self.conn.executemany(
+            """
+            INSERT INTO cache_clasificacion (clave, version, categoria, creado, ultimo_uso)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (clave, version) DO UPDATE SET
+                categoria = excluded.categoria, creado = excluded.creado, ultimo_uso = excluded.ultimo_uso
+            """,
+            [(clave, self.version, categoria, ahora, ahora) for clave, categoria in filas.items()]
+        )
+        self.conn.commit()
+        self.purgar()
+
+    def clasificar(self, items: List[Dict], clasificar_faltantes: Callable[[List[Dict]], List[Dict]]) -> List[Dict]:
+        """
+        Resuelve los ítems desde la cache y clasifica el resto con 'clasificar_faltantes',
+        guardando lo nuevo. Devuelve los resultados en el orden de 'items'.
+        """
+        encontrados, faltantes = self.buscar(items)
+        nuevos = clasificar_faltantes(faltantes) if faltantes else []
+        self.guardar(faltantes, nuevos)
+
+        por_rowid = {r["rowid"]: r for r in encontrados + nuevos}
+        return [por_rowid[item["rowid"]] for item in items if item["rowid"] in por_rowid]
+
+    def purgar(self) -> None:
+        """
+        Borra las entradas vencidas y, si sobran, las menos usadas recientemente.
+        """
+        self.conn.execute("DELETE FROM cache_clasificacion WHERE creado < ?", (time.time() - self.ttl_segundos,))
+        total = self.conn.execute("SELECT COUNT(*) FROM cache_clasificacion").fetchone()[0]
+        if total > self.max_entradas:
+            self.conn.execute(
+                "DELETE FROM cache_clasificacion WHERE rowid IN (SELECT rowid FROM cache_clasificacion ORDER BY ultimo_uso LIMIT ?)",
+                (total - self.max_entradas,)
+            )
+        self.conn.commit()
+
+    def estadisticas(self) -> Dict:
+        tasa = self.aciertos / self.consultas if self.consultas else 0.0
+        return {
+            "consultas": self.consultas,
+            "aciertos": self.aciertos,
+            "tasa_aciertos": tasa,
+            "tokens_ahorrados": self.tokens_ahorrados
+        }
+
+    def reportar(self) -> Dict:
+        """
+        Imprime y registra en 'corridas' las estadísticas acumuladas, y reinicia los contadores.
+        """
+        stats = self.estadisticas()
+        if stats["consultas"]:
+            print(
+                f"💾 Cache de clasificación: {stats['aciertos']}/{stats['consultas']} ítems "
+                f"({stats['tasa_aciertos']:.0%}) sin llamar a la IA, ~{stats['tokens_ahorrados']} tokens ahorrados."
+            )
+            self.conn.execute(
+                "INSERT INTO corridas (fecha, version, consultas, aciertos, tokens_ahorrados) VALUES (?, ?, ?, ?, ?)",
+                (datetime.now().isoformat(), self.version, stats["consultas"], stats["aciertos"], stats["tokens_ahorrados"])
+            )
+            self.conn.commit()
+        self.consultas = self.aciertos = self.tokens_ahorrados = 0
+        return stats
+
+    def cerrar(self) -> None:
+        self.conn.close()
@@ -1,13 +1,20 @@
 # etl/clasificador.py
 
 import json
+import math
 import time
-from typing import List, Dict
-from openai import OpenAIError
+from functools import partial
+from typing import Callable, List, Dict, Optional, Tuple
+from openai import APIConnectionError, APITimeoutError, InternalServerError, OpenAIError, RateLimitError
 from openai import OpenAI
 from tqdm import tqdm
 import re
 
+from backend.config import get_modo_salida_ia, get_reglas_categorias, get_rpm_ia, get_tpm_ia, get_cache_clasificacion_path, get_cache_clasificacion_ttl_dias, get_cache_clasificacion_max
+from backend.etl.limitador import TOKENS_SALIDA_POR_ITEM, LimitadorTasa, estimar_tokens, estimar_tokens_mensajes, segundos_de_espera
+from backend.etl.cache_clasificacion import CacheClasificacion, clave_item, version_clasificacion
+from backend.etl.reglas_categorias import ReglasCategorias, cargar_taxonomia
+
 # Inicialización del cliente OpenAI desde entorno
 from dotenv import load_dotenv
 import os
@@ -15,6 +22,131 @@ load_dotenv()
 
 openai_api_key = os.getenv("OPENAI_API_KEY")
 openai = OpenAI(api_key=openai_api_key)
+MODELO_CLASIFICACION = "gpt-4o-mini"
+SYSTEM_PROMPT_POR_LOTES = "Tu siguiente output devuelve solamente el formato JSON. Sin texto adicional"
+
+_caches: Dict[str, CacheClasificacion] = {}
+_reglas: Optional[ReglasCategorias] = None
+
+
+def obtener_cache_clasificacion(version: str) -> Optional[CacheClasificacion]:
+    """
+    Devuelve la cache de clasificaciones para una versión de prompt (None si está desactivada).
+    """
+    ruta = get_cache_clasificacion_path()
+    if not ruta:
+        return None
+    if version not in _caches:
+        _caches[version] = CacheClasificacion(ruta, version, get_cache_clasificacion_ttl_dias(), get_cache_clasificacion_max(), estimar_tokens_item)
+    return _caches[version]
+
+
+def obtener_reglas_categorias() -> Optional[ReglasCategorias]:
+    """
+    Devuelve el pre-clasificador por reglas de la taxonomía (None si está desactivado).
+    """
+    global _reglas
+    if not get_reglas_categorias():
+        return None
+    if _reglas is None:
+        _reglas = ReglasCategorias(TAXONOMIA)
+    return _reglas
+
+
+# Taxonomía (categorías, palabras clave del prompt y reglas) en etl/taxonomia_categorias.json
+TAXONOMIA = cargar_taxonomia()
+# Categorías con sus palabras clave, una por línea: "categoria / palabras clave"
+BLOQUE_CATEGORIAS = "".join(entrada["linea_prompt"] + "\n\n" for entrada in TAXONOMIA)
+# Taxonomía numerada: el índice de cada categoría es su posición en esta lista
+CATEGORIAS = [entrada["categoria"] for entrada in TAXONOMIA]
+
+# Prefijo fijo del pedido de clasificación (instrucciones + categorías)
+PROMPT_CLASIFICACION = """Tu siguiente output devuelve solamente el formato JSON. Sin texto adicional
+
+Dado el siguiente listado de ítems con sus datos, clasifícalos en una de las siguientes categorías:
+A continuación listo las categorias seguido por / y palabras clave sobre cada una de la siguiente forma: categoria / palabras clave.
+
+""" + BLOQUE_CATEGORIAS + """
+Aclaraciones:
+- si no estas seguro de tu respuesta, busca detenidamente palabras clave en el campo descripcion o proveedor
+- Los datos vienen uno por línea, con los campos rowid, proveedor y descripcion separados por tabulador.
+- Devuélvelo como una lista JSON donde cada objeto tenga 'rowid' y 'categoria'.
+
+Ejemplo de output:
+[
+  {"rowid": 1, "categoria": "Combustible"},
+  ...
+]
+"""
+
+# Variante con salida estructurada: categorías numeradas y respuesta [rowid, índice]
+PROMPT_CLASIFICACION_INDICES = """Clasificá cada ítem de gasto en una de las siguientes categorías numeradas.
+Cada categoría está seguida por / y palabras clave: número. categoria / palabras clave.
+
+""" + "\n".join(f"{indice}. {entrada['linea_prompt'].strip()}" for indice, entrada in enumerate(TAXONOMIA)) + """
+
+Aclaraciones:
+- si no estas seguro de tu respuesta, busca detenidamente palabras clave en el campo descripcion o proveedor
+- Los datos vienen uno por línea, con los campos rowid, proveedor y descripcion separados por tabulador.
+- Respondé con un par [rowid, número de categoría] por ítem, en el campo "c".
+"""
+# Esquema de salida estructurada: {"c": [[rowid, indice], ...]}
+ESQUEMA_INDICES = {
+    "name": "clasificacion",
+    "strict": True,
+    "schema": {
+        "type": "object",
+        "properties": {"c": {"type": "array", "items": {"type": "array", "items": {"type": "integer"}}}},
+        "required": ["c"],
+        "additionalProperties": False
+    }
+}
+MODOS_SALIDA = ("nombres", "indices")
+# Campos que se le envían a la IA: el resto (dirección, teléfono, archivo...) no ayuda a clasificar
+CAMPOS_CLASIFICACION = ("rowid", "proveedor", "descripcion")
+_ESPACIOS = re.compile(r"\s+")
+# Posición de la categoría de cada ítem dentro de la respuesta, para leer su logprob
+_PATRON_PAR_INDICES = re.compile(r"\[\s*(\d+)\s*,\s*(\d+)\s*\]")
+_PATRON_PAR_NOMBRES = re.compile(r'"rowid"\s*:\s*(\d+)\s*,\s*"categoria"\s*:\s*"([^"]*)"')
+
+
+def _valor_para_prompt(valor) -> str:
+    if valor is None or (isinstance(valor, float) and valor != valor):
+        return ""
+    return _ESPACIOS.sub(" ", str(valor)).strip()
+
+
+def codificar_items_para_prompt(items: List[Dict]) -> str:
+    """
+    Proyecta cada ítem a CAMPOS_CLASIFICACION y lo escribe en una línea con los campos
+    separados por tabulador (mucho más corto que el JSON con sangría de todas las columnas).
+    """
+    return "\n".join("\t".join(_valor_para_prompt(item.get(campo)) for campo in CAMPOS_CLASIFICACION) for item in items)
+
+
+def estimar_tokens_item(item: Dict) -> int:
+    """
+    Estima lo que cuesta clasificar un ítem: su línea en el prompt más la respuesta.
+    """
+    return estimar_tokens(codificar_items_para_prompt([item])) + 1 + TOKENS_SALIDA_POR_ITEM
+
+
+def empaquetar_por_tokens(items: List[Dict], presupuesto_tokens: int, max_items: int = 100) -> List[List[Dict]]:
+    """
+    Arma bloques consecutivos cuyo texto de datos no supere 'presupuesto_tokens' (estimados
+    con el tokenizer si está instalado) ni 'max_items' ítems, en lugar de bloques fijos.
+    """
+    bloques, actual, tokens_actual = [], [], 0
+    for item in items:
+        tokens = estimar_tokens(codificar_items_para_prompt([item])) + 1
+        if actual and (tokens_actual + tokens > presupuesto_tokens or len(actual) >= max_items):
+            bloques.append(actual)
+            actual, tokens_actual = [], 0
+        actual.append(item)
+        tokens_actual += tokens
+    if actual:
+        bloques.append(actual)
+    return bloques
 
 
 def dividir_en_bloques(lista: List[dict], n: int) -> List[List[dict]]:
@@ -22,6 +154,115 @@ def dividir_en_bloques(lista: List[dict], n: int) -> List[List[dict]]:
     Divide una lista de ítems en bloques de tamaño n.
     """
     return [lista[i:i + n] for i in range(0, len(lista), n)]
+def deduplicar_items(items: List[Dict]) -> Tuple[List[Dict], Dict[int, List[int]]]:
+    """
+    Agrupa los ítems por (RUC/proveedor, descripción) normalizados y deja un representante
+    por grupo, para clasificar cada combinación una sola vez.
+
+    Returns:
+        (representantes, rowid del representante → rowids de todo su grupo)
+    """
+    grupos: Dict[str, List[Dict]] = {}
+    for item in items:
+        grupos.setdefault(clave_item(item), []).append(item)
+    representantes = [grupo[0] for grupo in grupos.values()]
+    rowids_por_representante = {grupo[0]["rowid"]: [item["rowid"] for item in grupo] for grupo in grupos.values()}
+    return representantes, rowids_por_representante
+def expandir_resultados(items: List[Dict], resultados: List[Dict], rowids_por_representante: Dict[int, List[int]]) -> List[Dict]:
+    """
+    Reparte la categoría de cada representante a todos los rowids de su grupo, en el orden de 'items'.
+    """
+    categorias = {}
+    for resultado in resultados:
+        for rowid in rowids_por_representante.get(resultado["rowid"], [resultado["rowid"]]):
+            categorias[rowid] = resultado["categoria"]
+    return [{"rowid": item["rowid"], "categoria": categorias[item["rowid"]]} for item in items if item["rowid"] in categorias]
+def reportar_deduplicacion(items: List[Dict], representantes: List[Dict]) -> None:
+    """
+    Informa cuántos ítems y tokens (estimados) se dejaron de enviar a la IA por estar repetidos.
+    """
+    repetidos = len(items) - len(representantes)
+    if repetidos <= 0:
+        return
+    enviados = {id(item) for item in representantes}
+    tokens = sum(estimar_tokens_item(item) for item in items if id(item) not in enviados)
+    print(f"🧬 {len(items)} ítems → {len(representantes)} únicos: {repetidos} ítems y ~{tokens} tokens menos enviados a la IA.")
+def nuevos_contadores() -> Dict[str, int]:
+    """
+    Contadores de una corrida de clasificación (pedidos, reintentos, bisecciones, etc.).
+    """
+    return {"pedidos": 0, "reintentos": 0, "bisecciones": 0, "tokens_desperdiciados": 0, "sin_clasificar": 0,
+            "tokens_entrada": 0, "tokens_salida": 0, "segundos_api": 0.0}
+def reportar_contadores(contadores: Dict[str, int]) -> None:
+    print(
+        f"📈 {contadores['pedidos']} pedidos a la IA, {contadores['reintentos']} reintentos, "
+        f"{contadores['bisecciones']} bisecciones, ~{contadores['tokens_desperdiciados']} tokens desperdiciados, "
+        f"{contadores['sin_clasificar']} ítems sin clasificar."
+    )
+def validar_resultados(bloque: List[Dict], resultados: Optional[List[Dict]]) -> Tuple[Dict[int, str], List[Dict]]:
+    """
+    Valida la respuesta por rowid: solo cuentan rowids pedidos, sin repetir y con una
+    categoría no vacía. Detecta filas perdidas, inventadas o reordenadas.
+
+    Returns:
+        (rowid → categoría válida, ítems del bloque que siguen sin categoría)
+    """
+    esperados = {item["rowid"] for item in bloque}
+    categorias = {}
+    for resultado in resultados if isinstance(resultados, list) else []:
+        if not isinstance(resultado, dict):
+            continue
+        try:
+            rowid = int(resultado.get("rowid"))
+        except (TypeError, ValueError):
+            continue
+        categoria = resultado.get("categoria")
+        if rowid in esperados and rowid not in categorias and isinstance(categoria, str) and categoria.strip() and categoria != "error":
+            categorias[rowid] = categoria.strip()
+    return categorias, [item for item in bloque if item["rowid"] not in categorias]
+def planificar_reintentos(bloque: List[Dict], validos: Dict[int, str], faltantes: List[Dict], intentos: int,
+                          tokens: int, contadores: Dict[str, int]) -> List[Tuple[List[Dict], int]]:
+    """
+    Decide qué volver a pedir tras una respuesta incompleta:
+    - si vinieron algunas filas válidas, se vuelven a pedir solo las faltantes;
+    - si no vino ninguna, el bloque se parte al medio (bisección) para aislar el ítem problemático;
+    - un ítem suelto se reintenta hasta agotar 'intentos' y después queda sin clasificar.
+
+    Returns:
+        Lista de (sub-bloque, intentos restantes) a pedir.
+    """
+    if not faltantes:
+        return []
+    contadores["tokens_desperdiciados"] += round(tokens * len(faltantes) / len(bloque))
+    if validos:
+        contadores["reintentos"] += 1
+        return [(faltantes, intentos)]
+    if len(bloque) > 1:
+        contadores["bisecciones"] += 1
+        mitad = len(bloque) // 2
+        return [(bloque[:mitad], intentos), (bloque[mitad:], intentos)]
+    if intentos > 1:
+        contadores["reintentos"] += 1
+        return [(bloque, intentos - 1)]
+    contadores["sin_clasificar"] += 1
+    return []
+def clasificar_con_biseccion(items: List[Dict], intentar: Callable[[List[Dict]], Tuple[Optional[List[Dict]], int]],
+                             contadores: Dict[str, int], intentos: int = 2) -> List[Dict]:
+    """
+    Clasifica 'items' con 'intentar' (un pedido a la IA que devuelve la respuesta parseada,
+    o None si no se pudo parsear, y los tokens usados), validando por rowid y reintentando
+    solo lo que falta. Los ítems que no se logran clasificar vuelven con categoria 'error'.
+    """
+    categorias = {}
+    pendientes = [(items, intentos)]
+    while pendientes:
+        bloque, intentos_restantes = pendientes.pop()
+        respuesta, tokens = intentar(bloque)
+        contadores["pedidos"] += 1
+        validos, faltantes = validar_resultados(bloque, respuesta)
+        categorias.update(validos)
+        pendientes += planificar_reintentos(bloque, validos, faltantes, intentos_restantes, tokens, contadores)
+    return [{"rowid": item["rowid"], "categoria": categorias.get(item["rowid"], "error")} for item in items]
 def clasificar_items_por_lotes(items: List[dict], lote: int = 100) -> List[str]:
     """
     Clasifica los ítems usando OpenAI en lotes.
@@ -34,36 +275,57 @@ def clasificar_items_por_lotes(items: List[dict], lote: int = 100) -> List[str]:
         Lista de dicts con 'rowid' y categorías clasificadas (una por ítem).
     """
     resultados = []
+    originales = items
+    items, rowids_por_representante = deduplicar_items(originales)
+    reportar_deduplicacion(originales, items)
+    cache = obtener_cache_clasificacion(version_clasificacion(MODELO_CLASIFICACION, [
+        {"content": SYSTEM_PROMPT_POR_LOTES}, {"content": generar_prompt_clasificacion([])}
+    ]))
+    if cache is not None:
+        resultados, items = cache.buscar(items)
     bloques = dividir_en_bloques(items, lote)
+    limitador = LimitadorTasa(get_rpm_ia(), get_tpm_ia())
+    contadores = nuevos_contadores()
+
+    def intentar(bloque: List[Dict]) -> Tuple[Optional[List[Dict]], int]:
+        mensajes = [
+            {"role": "system", "content": SYSTEM_PROMPT_POR_LOTES},
+            {"role": "user", "content": generar_prompt_clasificacion(bloque)}
+        ]
+        limitador.esperar_sync(estimar_tokens_mensajes(mensajes))
+        respuesta = openai.chat.completions.create(
+            model=MODELO_CLASIFICACION,
+            messages=mensajes,
+            temperature=0.1
+        )
+        tokens = respuesta.usage.total_tokens if respuesta.usage else estimar_tokens_mensajes(mensajes)
+        categorias = extraer_categorias_de_respuesta(respuesta.choices[0].message.content)
+        # Sin rowid en la respuesta, una cantidad distinta de líneas no se puede alinear: se descarta
+        if len(categorias) != len(bloque):
+            return None, tokens
+        return [{"rowid": item["rowid"], "categoria": categoria} for item, categoria in zip(bloque, categorias)], tokens
 
     for i, bloque in enumerate(tqdm(bloques, desc="🤖 Clasificando")):
         try:
-            prompt = generar_prompt_clasificacion(bloque)
-            respuesta = openai.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {"role": "system", "content": "Tu siguiente output devuelve solamente el formato JSON. Sin texto adicional"},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.1
-            )
-            categorias = extraer_categorias_de_respuesta(respuesta.choices[0].message.content)
-            for item, categoria in zip(bloque, categorias):
-                resultados.append({
-                    "rowid": item["rowid"],
-                    "categoria": categoria
-                })
+            clasificados = clasificar_con_biseccion(bloque, intentar, contadores)
+            if cache is not None:
+                cache.guardar(bloque, clasificados)
+            resultados += clasificados
 
         except Exception as e:
+            if isinstance(e, RateLimitError):
+                limitador.penalizar(5)
             print(f"❌ Error en lote {i}: {e}")
             for item in bloque:
                 resultados.append({
                     "rowid": item["rowid"],
                     "categoria": "error"
                 })
-        time.sleep(1.5)
 
-    return resultados
+    if cache is not None:
+        cache.reportar()
+    reportar_contadores(contadores)
+    return expandir_resultados(originales, resultados, rowids_por_representante)
 def generar_prompt_clasificacion(items: List[dict]) -> str:
     """
     Genera el prompt a enviar a OpenAI con los ítems.
@@ -92,85 +354,164 @@ def intentar_parsear_json(texto: str) -> List[Dict]:
     """
     return json.loads(texto)
 
-def clasificar_lote(lote_datos: List[Dict]) -> List[Dict]:
+def resolver_modo_salida(modo: Optional[str]) -> str:
+    """
+    Devuelve el modo de salida a usar (el configurado si no se indica) y valida que exista.
+    """
+    modo = modo or get_modo_salida_ia()
+    if modo not in MODOS_SALIDA:
+        raise ValueError(f"Modo de salida desconocido: {modo!r} (opciones: {', '.join(MODOS_SALIDA)})")
+    return modo
+def armar_mensajes_clasificacion(lote_datos: List[Dict], modo: str = "nombres") -> List[Dict]:
+    """
+    Arma los mensajes del pedido de clasificación de un lote. Todo lo fijo (instrucciones y
+    categorías) va en el mensaje system, idéntico en cada pedido, para que OpenAI pueda
+    reutilizarlo como prefijo cacheado; el mensaje user lleva solo los ítems compactados.
+    """
+    return [
+        {"role": "system", "content": PROMPT_CLASIFICACION_INDICES if modo == "indices" else PROMPT_CLASIFICACION},
+        {"role": "user", "content": "Datos:\n" + codificar_items_para_prompt(lote_datos)}
+    ]
+def parametros_de_respuesta(modo: str) -> Dict:
+    """
+    Parámetros extra del pedido según el modo: en 'indices' se exige salida estructurada.
+    """
+    if modo == "indices":
+        return {"response_format": {"type": "json_schema", "json_schema": ESQUEMA_INDICES}}
+    return {}
+def parsear_respuesta_clasificacion(output: str, modo: str = "nombres") -> List[Dict]:
+    """
+    Convierte la respuesta del modelo en la lista de dicts con 'rowid' y 'categoria'.
+    En modo 'indices' traduce cada par [rowid, índice] al nombre de la categoría y descarta
+    los pares mal formados o con índices fuera de la taxonomía (quedan como faltantes).
+    Lanza JSONDecodeError si la respuesta no es JSON válido.
+    """
+    if modo == "indices":
+        datos = json.loads(output)
+        pares = datos.get("c", []) if isinstance(datos, dict) else []
+        return [
+            {"rowid": par[0], "categoria": CATEGORIAS[par[1]]}
+            for par in pares
+            if isinstance(par, list) and len(par) == 2 and all(isinstance(v, int) and not isinstance(v, bool) for v in par) and 0 <= par[1] < len(CATEGORIAS)
+        ]
+    try:
+        output = limpiar_output_de_chatgpt(output)
+        resultado = intentar_parsear_json(output)
+        return resultado
+    except json.JSONDecodeError:
+        print("❌ Error: la respuesta de GPT no es JSON válido.")
+        raise
+
+def confianzas_desde_logprobs(output: str, logprobs: Optional[List], modo: str = "nombres") -> Dict[int, float]:
     """
-    Clasifica un lote de ítems usando categorías personalizadas.
+    Confianza del modelo en la categoría de cada ítem: la probabilidad conjunta de los
+    tokens que forman la categoría (el índice en modo 'indices', que es un solo token, o el
+    nombre en modo 'nombres'). 'logprobs' es choices[0].logprobs.content de la respuesta.
+
+    Returns:
+        rowid → probabilidad entre 0 y 1 (los ítems que no se pueden ubicar no aparecen).
+    """
+    if not logprobs:
+        return {}
+    inicios, logps, posicion = [], [], 0
+    for token in logprobs:
+        inicios.append(posicion)
+        logps.append(token.logprob)
+        posicion += len(token.token)
+
+    patron = _PATRON_PAR_INDICES if modo == "indices" else _PATRON_PAR_NOMBRES
+    confianzas = {}
+    for coincidencia in patron.finditer(output):
+        desde, hasta = coincidencia.span(2)
+        # Tokens que se superponen con el valor de la categoría
+        suma = sum(lp for inicio, lp, siguiente in zip(inicios, logps, inicios[1:] + [posicion])
+                   if inicio < hasta and siguiente > desde)
+        confianzas.setdefault(int(coincidencia.group(1)), math.exp(suma))
+    return confianzas
+
+def version_clasificacion_lote(modo: str = "nombres") -> str:
+    """
+    Versión (modelo + prompt fijo + esquema de salida) de las clasificaciones hechas con clasificar_lote.
+    """
+    mensajes = armar_mensajes_clasificacion([], modo)
+    if modo == "indices":
+        mensajes.append({"content": json.dumps(ESQUEMA_INDICES, sort_keys=True)})
+    return version_clasificacion(MODELO_CLASIFICACION, mensajes)
+
+def clasificar_lote(lote_datos: List[Dict], usar_cache: bool = True, modo: str = None, limitador: LimitadorTasa = None) -> List[Dict]:
+    """
+    Clasifica un lote de ítems usando categorías personalizadas. Los ítems que resuelven las
+    reglas de la taxonomía no se envían, los repetidos se envían una sola vez y los que ya
+    están en la cache local de clasificaciones tampoco se envían.
+    La respuesta se valida por rowid: lo que falte o venga mal se vuelve a pedir (partiendo
+    el lote si hace falta) y lo que no se logra clasificar vuelve con categoria 'error'.
 
     Args:
         lote_datos: Lista de ítems con campos como 'rowid', 'descripcion', etc.
+        usar_cache: Si es False se consulta siempre a la IA.
+        modo: 'nombres' (la IA devuelve el nombre de la categoría) o 'indices' (salida
+            estructurada con pares [rowid, índice]); por defecto SALIDA_IA.
+        limitador: Si se pasa, cada pedido espera su turno en él y un 429 o un error
+            transitorio de la API se reintenta con pausa en lugar de cortar el lote.
 
     Returns:
         Lista de dicts con 'rowid' y 'categoria'.
     """
-    system_prompt = "Tu siguiente output devuelve solamente el formato JSON. Sin texto adicional"
+    modo = resolver_modo_salida(modo)
+    representantes, rowids_por_representante = deduplicar_items(lote_datos)
+    contadores = nuevos_contadores()
 
-    user_prompt = f"""
-Dado el siguiente listado de ítems con sus datos, clasifícalos en una de las siguientes categorías:
-A continuación listo las categorias seguido por / y palabras clave sobre cada una de la siguiente forma: categoria / palabras clave.
+    def clasificar_con_ia(items: List[Dict]) -> List[Dict]:
+        return clasificar_con_biseccion(items, partial(_intentar_lote_con_ia, modo=modo, limitador=limitador), contadores)
 
-Dividendos fictos / extremadamente poco frecuente\n
-Comisiones tarjetas / OCA S.A., PASS CARD; \n
-Gastos por deudas incobrables / \n
-Telepeaje / CVU, Corporación vial del uruguay; \n
-Flete costo de mercaderías / DAC, encomiendas, bersal group \n
-Gastos Varios / último recurso, cuando no sepas donde clasificar usa esta categoría \n
-Uniformes / camisa, zapatos, casco;\n
-Patente vehículos / \n
-Sueldos y Jornales / liquidación, aguinaldo; \n
-Gastos de importación / Carlos Piaggio, Carlos A. Piaggio Zibechi; \n
-Viáticos / viáticos\n
-Adelanto de sueldos / adelanto de sueldos\n
-Salario vacacional / licencia; \n
-Cargas Sociales / BPS, Banco previsión social; \n
-Seguros / BSE, banco seguro estado, mapfre; \n
-Papelería / tijera, papel, cuaderno, cuadernola, lapiz, lápices, colores\n
-Combustible / nafta, super 95, gasoil, gas, oil, ancap, paraje, marimar; \n
-Gastos varios compartidos / poco frecuente\n
-Mantenimiento Vehículos / tireshop, roda, accesorios, ruedas, neumáticos, aceite; \n
-Alquiler de vehículos / poco frecuente \n
-Mantenimiento Local / relacionado a arreglos domésticos \n
-Mantenimiento de equipos / luces, servicio técnico, computadora, cpu, disco, memoria, ram, acondicionado; \n
-Honorarios Profesionales / estudio contable asociados asesoramiento legal; \n
-Servicios Contratados / zeta software punta traking acqua life; \n
-Energía Eléctrica y Aguas Corrientes / UTE, U.T.E., Administración Nacional de Usinas y Transmisiones Eléctricas, ADMINISTRACION DE LAS OBRAS SANITARIAS DEL ESTADO, OSE; \n
-Comunicaciones y Servicios Telefónicos / ADMINISTRACION NACIONAL DE TELECOMUNICACIONES, ANTEL, ETHERNET, DEDICADO, NETGATE, CLARO, MOVISTAR \n
-Alquileres / alquiler maldonado, alquiler melo; \n
-Publicidad / radio melo fm, televisión, la voz, canal, pautas; \n
-Representación / expo, agro, prado, rural; \n
-Comisiones por ventas / comisiones \n
-Costos de Servicios / abitab; \n
-Intereses y Gastos Bancarios / préstamo, diferencia, cargo, tasa; \n
-Diferencias de Cambio perdidas / poco frecuente\n
-Retiro socios / ana, diego; \n
-Pérdida por diferencia de efectivo / poco frecuente\n
-Costos de ventas/ cervinia, barraca, ferreteria, servicios en acero, materiales de construcción, herramientas, consumidor final; \n
+    cache = obtener_cache_clasificacion(version_clasificacion_lote(modo)) if usar_cache else None
 
-Aclaraciones:
-- si no estas seguro de tu respuesta, busca detenidamente palabras clave en el campo descripcion o proveedor
-- Devuélvelo como una lista JSON donde cada objeto tenga 'rowid' y 'categoria'.
+    def clasificar_sin_reglas(items: List[Dict]) -> List[Dict]:
+        return clasificar_con_ia(items) if cache is None else cache.clasificar(items, clasificar_con_ia)
 
-Ejemplo de output:
-[
-  {{"rowid": 1, "categoria": "Combustible"}},
-  ...
-]
+    reglas = obtener_reglas_categorias()
+    if reglas is None:
+        resultados = clasificar_sin_reglas(representantes)
+    else:
+        resultados = reglas.clasificar(representantes, clasificar_sin_reglas)
+    if contadores["pedidos"] > 1 or contadores["sin_clasificar"]:
+        reportar_contadores(contadores)
+    return expandir_resultados(lote_datos, resultados, rowids_por_representante)
 
-Datos:
-{json.dumps(lote_datos, ensure_ascii=False, indent=2)}
-"""
-    respuesta = openai.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt}
-        ],
-        temperature=0
-    )
+def _intentar_lote_con_ia(lote_datos: List[Dict], modo: str = "nombres", limitador: LimitadorTasa = None,
+                         reintentos: int = 5) -> Tuple[Optional[List[Dict]], int]:
+    """
+    Un pedido de clasificación: devuelve (respuesta parseada o None si no es JSON, tokens usados).
+    Con un limitador, espera su turno antes de enviarlo y ante un 429 o un error transitorio
+    pausa (Retry-After o backoff) y reintenta el mismo pedido hasta 'reintentos' veces.
+    """
+    mensajes = armar_mensajes_clasificacion(lote_datos, modo)
+    tokens_estimados = estimar_tokens_mensajes(mensajes) + TOKENS_SALIDA_POR_ITEM * len(lote_datos)
+    for intento in range(reintentos + 1):
+        if limitador is not None:
+            limitador.esperar_sync(tokens_estimados)
+        try:
+            respuesta = openai.chat.completions.create(
+                model=MODELO_CLASIFICACION,
+                messages=mensajes,
+                temperature=0,
+                **parametros_de_respuesta(modo)
+            )
+            break
+        except (RateLimitError, APIConnectionError, APITimeoutError, InternalServerError) as e:
+            if limitador is None or intento == reintentos:
+                raise
+            espera = segundos_de_espera(e, intento)
+            if isinstance(e, RateLimitError):
+                print(f"⏳ 429 de OpenAI, pausando {espera:.1f}s (intento {intento + 1}/{reintentos + 1})")
+                limitador.penalizar(espera)
+            else:
+                print(f"⚠️ Error transitorio de OpenAI ({e}), reintentando en {espera:.1f}s")
+                time.sleep(espera)
+    tokens = respuesta.usage.total_tokens if respuesta.usage else tokens_estimados
+    if limitador is not None and respuesta.usage:
+        limitador.ajustar(tokens_estimados, tokens)
     try:
-        output = respuesta.choices[0].message.content
-        output = limpiar_output_de_chatgpt(output)
-        resultado = intentar_parsear_json(output)
-        return resultado
+        return parsear_respuesta_clasificacion(respuesta.choices[0].message.content, modo), tokens
     except json.JSONDecodeError:
-        print("❌ Error: la respuesta de GPT no es JSON válido.")
-        raise
+        return None, tokens
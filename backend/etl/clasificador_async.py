@@ -0,0 +1,201 @@
+# etl/clasificador_async.py
+import asyncio
+import json
+import time
+from typing import Dict, List, Optional, Tuple
+
+from openai import AsyncOpenAI, RateLimitError, APIConnectionError, APITimeoutError, InternalServerError
+from tqdm import tqdm
+
+from backend.config import get_concurrencia_ia, get_max_proporcion_errores_ia, get_presupuesto_tokens_lote, get_rpm_ia, get_tpm_ia
+from backend.etl.clasificador import (
+    MODELO_CLASIFICACION, resolver_modo_salida, armar_mensajes_clasificacion, confianzas_desde_logprobs, deduplicar_items, empaquetar_por_tokens, expandir_resultados,
+    nuevos_contadores, obtener_cache_clasificacion, parametros_de_respuesta, parsear_respuesta_clasificacion, planificar_reintentos,
+    reportar_contadores, reportar_deduplicacion, validar_resultados, version_clasificacion_lote
+)
+from backend.etl.limitador import TOKENS_SALIDA_POR_ITEM, LimitadorTasa, estimar_tokens_mensajes, segundos_de_espera
+
+
+async def _pedir_clasificacion(cliente: AsyncOpenAI, bloque: List[Dict], limitador: LimitadorTasa,
+                               semaforo: asyncio.Semaphore, reintentos: int, modo: str, modelo: str = MODELO_CLASIFICACION,
+                               contadores: Dict = None, confianzas: Dict[int, float] = None) -> Tuple[Optional[List[Dict]], int]:
+    """
+    Hace un pedido de clasificación respetando el limitador; ante 429 o errores transitorios
+    de red reintenta el mismo pedido. Si se pasan 'contadores', acumula los tokens de
+    entrada/salida y la demora de la API; si se pasa 'confianzas', pide logprobs y guarda
+    ahí la confianza del modelo en cada rowid (ver confianzas_desde_logprobs).
+
+    Returns:
+        (respuesta parseada, o None si no es JSON válido; tokens usados)
+
+    Raises:
+        Exception si la API sigue fallando tras 'reintentos' (no tiene sentido partir el bloque).
+    """
+    mensajes = armar_mensajes_clasificacion(bloque, modo)
+    tokens_estimados = estimar_tokens_mensajes(mensajes) + TOKENS_SALIDA_POR_ITEM * len(bloque)
+
+    for intento in range(reintentos + 1):
+        await limitador.esperar(tokens_estimados)
+        try:
+            async with semaforo:
+                inicio = time.monotonic()
+                respuesta = await cliente.chat.completions.create(
+                    model=modelo,
+                    messages=mensajes,
+                    temperature=0,
+                    **({"logprobs": True} if confianzas is not None else {}),
+                    **parametros_de_respuesta(modo)
+                )
+        except RateLimitError as e:
+            if intento == reintentos:
+                raise
+            espera = segundos_de_espera(e, intento)
+            print(f"⏳ 429 de OpenAI, pausando {espera:.1f}s (intento {intento + 1}/{reintentos + 1})")
+            limitador.penalizar(espera)
+            continue
+        except (APIConnectionError, APITimeoutError, InternalServerError) as e:
+            if intento == reintentos:
+                raise
+            espera = segundos_de_espera(e, intento)
+            print(f"⚠️ Error transitorio de OpenAI ({e}), reintentando en {espera:.1f}s")
+            await asyncio.sleep(espera)
+            continue
+
+        tokens = tokens_estimados
+        if respuesta.usage is not None:
+            tokens = respuesta.usage.total_tokens
+            limitador.ajustar(tokens_estimados, tokens)
+        if contadores is not None:
+            contadores["segundos_api"] += time.monotonic() - inicio
+            if respuesta.usage is not None:
+                contadores["tokens_entrada"] += respuesta.usage.prompt_tokens
+                contadores["tokens_salida"] += respuesta.usage.completion_tokens
+        contenido = respuesta.choices[0].message.content
+        if confianzas is not None and respuesta.choices[0].logprobs is not None:
+            confianzas.update(confianzas_desde_logprobs(contenido, respuesta.choices[0].logprobs.content, modo))
+        try:
+            return parsear_respuesta_clasificacion(contenido, modo), tokens
+        except json.JSONDecodeError:
+            return None, tokens
+
+
+async def _clasificar_bloque(cliente: AsyncOpenAI, bloque: List[Dict], limitador: LimitadorTasa,
+                             semaforo: asyncio.Semaphore, reintentos: int, modo: str, contadores: Dict[str, int],
+                             intentos: int = 2, modelo: str = MODELO_CLASIFICACION) -> Dict[int, str]:
+    """
+    Clasifica un bloque validando por rowid: vuelve a pedir solo lo que falta y parte el
+    bloque al medio si no vino nada válido (ver planificar_reintentos). Las mitades se
+    piden en paralelo.
+
+    Returns:
+        rowid → categoría de los ítems que se lograron clasificar.
+    """
+    try:
+        respuesta, tokens = await _pedir_clasificacion(cliente, bloque, limitador, semaforo, reintentos, modo, modelo, contadores)
+    except Exception as e:
+        print(f"❌ Error clasificando bloque de {len(bloque)} ítems: {e}")
+        contadores["sin_clasificar"] += len(bloque)
+        return {}
+
+    contadores["pedidos"] += 1
+    categorias, faltantes = validar_resultados(bloque, respuesta)
+    siguientes = planificar_reintentos(bloque, categorias, faltantes, intentos, tokens, contadores)
+    for parcial in await asyncio.gather(*(
+        _clasificar_bloque(cliente, sub_bloque, limitador, semaforo, reintentos, modo, contadores, intentos_restantes, modelo)
+        for sub_bloque, intentos_restantes in siguientes
+    )):
+        categorias.update(parcial)
+    return categorias
+
+
+async def clasificar_items_async(items: List[Dict], lote: int = 200, concurrencia: int = None,
+                                 rpm: int = None, tpm: int = None, reintentos: int = 5,
+                                 cliente: AsyncOpenAI = None, usar_cache: bool = True, modo: str = None) -> List[Dict]:
+    """
+    Clasifica los ítems con varios pedidos a OpenAI en vuelo a la vez, limitados por un
+    semáforo (concurrencia) y un token bucket de pedidos/tokens por minuto. Los ítems
+    repetidos se envían una sola vez y la categoría se reparte a todos sus rowids.
+
+    Args:
+        items: Lista de ítems con 'rowid', 'descripcion', etc.
+        lote: Máximo de ítems por consulta; los bloques se arman por presupuesto de tokens
+            (PRESUPUESTO_TOKENS_LOTE) sin pasar de este tope.
+        concurrencia, rpm, tpm: Por defecto se leen de la configuración (CONCURRENCIA_IA, RPM_IA, TPM_IA).
+        cliente: Cliente AsyncOpenAI a usar (toma OPENAI_BASE_URL si está definida).
+        usar_cache: Si es True, los ítems ya clasificados en la cache local no se envían.
+        modo: 'nombres' o 'indices' (salida estructurada [rowid, índice]); por defecto SALIDA_IA.
+
+    Returns:
+        Lista de dicts con 'rowid' y 'categoria', en el mismo orden de los ítems.
+    """
+    modo = resolver_modo_salida(modo)
+    representantes, rowids_por_representante = deduplicar_items(items)
+    reportar_deduplicacion(items, representantes)
+
+    cache = obtener_cache_clasificacion(version_clasificacion_lote(modo)) if usar_cache else None
+    if cache is None:
+        resultados = await _clasificar_items_con_ia(representantes, lote, concurrencia, rpm, tpm, reintentos, cliente, modo)
+    else:
+        encontrados, faltantes = cache.buscar(representantes)
+        nuevos = await _clasificar_items_con_ia(faltantes, lote, concurrencia, rpm, tpm, reintentos, cliente, modo)
+        cache.guardar(faltantes, nuevos)
+        cache.reportar()
+        resultados = encontrados + nuevos
+
+    return expandir_resultados(items, resultados, rowids_por_representante)
+
+
+async def _clasificar_items_con_ia(items: List[Dict], lote: int, concurrencia: int, rpm: int, tpm: int,
+                                   reintentos: int, cliente: AsyncOpenAI, modo: str) -> List[Dict]:
+    bloques = empaquetar_por_tokens(items, get_presupuesto_tokens_lote(), max_items=lote)
+    if not bloques:
+        return []
+
+    # Los reintentos los maneja el limitador, no el cliente
+    cliente = cliente or AsyncOpenAI(max_retries=0)
+    limitador = LimitadorTasa(rpm or get_rpm_ia(), tpm or get_tpm_ia())
+    semaforo = asyncio.Semaphore(concurrencia or get_concurrencia_ia())
+
+    contadores = nuevos_contadores()
+
+    with tqdm(total=len(items), desc="🤖 Clasificando") as barra:
+        async def clasificar_y_avanzar(bloque: List[Dict]) -> Dict[int, str]:
+            categorias = await _clasificar_bloque(cliente, bloque, limitador, semaforo, reintentos, modo, contadores)
+            barra.update(len(bloque))
+            return categorias
+
+        categorias = {}
+        for parcial in await asyncio.gather(*(clasificar_y_avanzar(b) for b in bloques)):
+            categorias.update(parcial)
+
+    reportar_contadores(contadores)
+    return [{"rowid": item["rowid"], "categoria": categorias.get(item["rowid"], "error")} for item in items]
+
+
+def verificar_clasificacion_completa(resultados: List[Dict], max_proporcion: float = None) -> int:
+    """
+    Informa los ítems que quedaron sin clasificar: se suben con categoria 'error' y sin
+    verificar, para que unos pocos ítems problemáticos no hagan perder el resto del lote.
+    Solo lanza un error si superan 'max_proporcion' de los resultados (por defecto
+    MAX_PROPORCION_ERRORES_IA), lo que indica un problema general y no ítems puntuales.
+
+    Returns:
+        Cantidad de ítems sin clasificar.
+    """
+    max_proporcion = get_max_proporcion_errores_ia() if max_proporcion is None else max_proporcion
+    errores = [r["rowid"] for r in resultados if r.get("categoria") == "error"]
+    if not errores:
+        return 0
+    if len(errores) > max_proporcion * len(resultados):
+        raise RuntimeError(f"{len(errores)} de {len(resultados)} ítems no se pudieron clasificar con IA")
+    muestra = ", ".join(map(str, errores[:10])) + (", ..." if len(errores) > 10 else "")
+    print(f"⚠️ {len(errores)} de {len(resultados)} ítems quedaron sin clasificar; se suben con categoria 'error' "
+          f"y sin verificar (rowids: {muestra}).")
+    return len(errores)
+
+
+def clasificar_items_concurrente(items: List[Dict], lote: int = 200, **kwargs) -> List[Dict]:
+    """
+    Versión sincrónica de clasificar_items_async, para usar desde el pipeline.
+    """
+    return asyncio.run(clasificar_items_async(items, lote=lote, **kwargs))
@@ -0,0 +1,190 @@
+# etl/clasificador_batch.py
+import asyncio
+import json
+import os
+import time
+from datetime import datetime
+from typing import Dict, List
+
+from openai import OpenAI
+
+from backend.config import get_carpeta_trabajos_batch, get_presupuesto_tokens_lote
+from backend.etl.cache_clasificacion import clave_item
+from backend.etl.clasificador import (
+    MODELO_CLASIFICACION, armar_mensajes_clasificacion, deduplicar_items, empaquetar_por_tokens, expandir_resultados,
+    obtener_cache_clasificacion, parametros_de_respuesta, parsear_respuesta_clasificacion, reportar_deduplicacion,
+    resolver_modo_salida, validar_resultados, version_clasificacion_lote
+)
+from backend.etl.clasificador_async import clasificar_items_async
+
+ESTADOS_FINALES = ("completed", "failed", "expired", "cancelled")
+
+
+class TrabajoBatch:
+    """
+    Registro en disco (JSON) de un trabajo de clasificación por la Batch API de OpenAI, para
+    poder cortar la corrida y retomarla sin volver a enviar ni a pagar nada: guarda el id del
+    batch, qué ítems (rowid y clave normalizada) fue en cada pedido y, al terminar, la
+    categoría de cada clave. Los resultados se reparten por clave, así que sirven aunque al
+    retomar los rowids hayan cambiado, y se acumulan entre batches del mismo trabajo.
+    """
+
+    def __init__(self, nombre: str, carpeta: str = None):
+        carpeta = carpeta or get_carpeta_trabajos_batch()
+        os.makedirs(carpeta, exist_ok=True)
+        self.ruta = os.path.join(carpeta, f"{nombre}.json")
+        self.ruta_entrada = os.path.join(carpeta, f"{nombre}.jsonl")
+        self.datos = {}
+        if os.path.exists(self.ruta):
+            with open(self.ruta, "r", encoding="utf-8") as f:
+                self.datos = json.load(f)
+
+    def __getitem__(self, clave: str):
+        return self.datos.get(clave)
+
+    def actualizar(self, **campos) -> None:
+        """
+        Actualiza campos del registro y lo guarda (escritura atómica).
+        """
+        self.datos.update(campos, actualizado=datetime.now().isoformat())
+        temporal = self.ruta + ".tmp"
+        with open(temporal, "w", encoding="utf-8") as f:
+            json.dump(self.datos, f, ensure_ascii=False, indent=2)
+        os.replace(temporal, self.ruta)
+
+    def es_compatible(self, version: str) -> bool:
+        return self.datos.get("version") == version
+
+
+def _escribir_entrada(trabajo: TrabajoBatch, items: List[Dict], modo: str, lote: int) -> Dict[str, List]:
+    """
+    Escribe el JSONL de entrada del batch (un pedido de chat por bloque de ítems).
+
+    Returns:
+        custom_id → [[rowid, clave], ...] de cada pedido.
+    """
+    bloques = {}
+    with open(trabajo.ruta_entrada, "w", encoding="utf-8") as f:
+        for i, bloque in enumerate(empaquetar_por_tokens(items, get_presupuesto_tokens_lote(), max_items=lote)):
+            custom_id = f"bloque-{i}"
+            bloques[custom_id] = [[item["rowid"], clave_item(item)] for item in bloque]
+            f.write(json.dumps({
+                "custom_id": custom_id,
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": {
+                    "model": MODELO_CLASIFICACION,
+                    "messages": armar_mensajes_clasificacion(bloque, modo),
+                    "temperature": 0,
+                    **parametros_de_respuesta(modo)
+                }
+            }, ensure_ascii=False) + "\n")
+    return bloques
+
+
+def _leer_salida(cliente: OpenAI, trabajo: TrabajoBatch, modo: str) -> Dict[str, str]:
+    """
+    Descarga el archivo de salida del batch y valida cada respuesta por rowid.
+
+    Returns:
+        clave normalizada → categoría de los ítems bien clasificados.
+    """
+    batch = cliente.batches.retrieve(trabajo["batch_id"])
+    categorias = {}
+    fallidos = 0
+    if batch.output_file_id:
+        for linea in cliente.files.content(batch.output_file_id).text.splitlines():
+            if not linea.strip():
+                continue
+            salida = json.loads(linea)
+            bloque = [{"rowid": rowid, "clave": clave} for rowid, clave in trabajo["bloques"].get(salida["custom_id"], [])]
+            respuesta = salida.get("response") or {}
+            if respuesta.get("status_code") != 200:
+                fallidos += 1
+                continue
+            try:
+                contenido = respuesta["body"]["choices"][0]["message"]["content"]
+                validos, _ = validar_resultados(bloque, parsear_respuesta_clasificacion(contenido, modo))
+            except (KeyError, IndexError, json.JSONDecodeError):
+                fallidos += 1
+                continue
+            claves = {item["rowid"]: item["clave"] for item in bloque}
+            categorias.update({claves[rowid]: categoria for rowid, categoria in validos.items()})
+
+    if fallidos or batch.error_file_id:
+        print(f"⚠️ {fallidos} pedidos del batch sin respuesta válida (error_file_id={batch.error_file_id}).")
+    return categorias
+
+
+def _esperar_batch(cliente: OpenAI, trabajo: TrabajoBatch, intervalo: float) -> str:
+    """
+    Consulta el batch cada 'intervalo' segundos hasta que termine; devuelve su estado final.
+    """
+    while True:
+        batch = cliente.batches.retrieve(trabajo["batch_id"])
+        conteo = batch.request_counts
+        if conteo is not None:
+            print(f"⏳ Batch {batch.id}: {batch.status} ({conteo.completed}/{conteo.total} pedidos, {conteo.failed} fallidos)")
+        trabajo.actualizar(estado_batch=batch.status)
+        if batch.status in ESTADOS_FINALES:
+            return batch.status
+        time.sleep(intervalo)
+
+
+def clasificar_items_batch(items: List[Dict], nombre_trabajo: str, lote: int = 200, modo: str = None,
+                           intervalo: float = 60, cliente: OpenAI = None, usar_cache: bool = True) -> List[Dict]:
+    """
+    Clasifica los ítems con la Batch API de OpenAI (mitad de precio y cuota aparte, con
+    resultados en hasta 24 h), pensado para la clasificación de fin de mes o cargas masivas.
+    Escribe un JSONL con un pedido por bloque, lo sube, espera a que termine y reparte los
+    resultados por rowid. El avance queda en data/batch/{nombre_trabajo}.json: si la corrida
+    se corta, volver a llamar con el mismo nombre retoma el mismo batch. Los ítems que el
+    batch no resolvió se clasifican en línea con clasificar_items_async.
+
+    Returns:
+        Lista de dicts con 'rowid' y 'categoria', en el orden de 'items'.
+    """
+    modo = resolver_modo_salida(modo)
+    version = version_clasificacion_lote(modo)
+    representantes, rowids_por_representante = deduplicar_items(items)
+    reportar_deduplicacion(items, representantes)
+
+    cache = obtener_cache_clasificacion(version) if usar_cache else None
+    resultados, faltantes = cache.buscar(representantes) if cache is not None else ([], representantes)
+
+    trabajo = TrabajoBatch(nombre_trabajo)
+    # Las categorías de un trabajo ya terminado son una caché más: sin usar_cache no se reutilizan
+    if not trabajo.es_compatible(version) or (not usar_cache and trabajo["terminado"]):
+        trabajo.datos = {"version": version, "modo": modo, "categorias": {}, "terminado": True}
+    cliente = cliente or OpenAI()
+
+    if not trabajo["terminado"]:
+        print(f"🔁 Retomando batch {trabajo['batch_id']} ({trabajo['estado_batch']}).")
+    else:
+        por_enviar = [item for item in faltantes if clave_item(item) not in trabajo["categorias"]]
+        if por_enviar:
+            bloques = _escribir_entrada(trabajo, por_enviar, modo, lote)
+            with open(trabajo.ruta_entrada, "rb") as f:
+                archivo = cliente.files.create(file=f, purpose="batch")
+            batch = cliente.batches.create(input_file_id=archivo.id, endpoint="/v1/chat/completions", completion_window="24h")
+            trabajo.actualizar(archivo_entrada=archivo.id, batch_id=batch.id, estado_batch=batch.status,
+                               bloques=bloques, terminado=False)
+            print(f"📤 Batch {batch.id} enviado: {len(por_enviar)} ítems en {len(bloques)} pedidos.")
+
+    if not trabajo["terminado"]:
+        estado = _esperar_batch(cliente, trabajo, intervalo)
+        if estado != "completed":
+            print(f"⚠️ El batch terminó en estado '{estado}'.")
+        trabajo.actualizar(categorias={**trabajo["categorias"], **_leer_salida(cliente, trabajo, modo)}, terminado=True)
+
+    categorias = trabajo["categorias"]
+    del_batch = [{"rowid": item["rowid"], "categoria": categorias[clave_item(item)]} for item in faltantes if clave_item(item) in categorias]
+    pendientes = [item for item in faltantes if clave_item(item) not in categorias]
+    print(f"✅ Batch: {len(del_batch)} ítems clasificados, {len(pendientes)} quedan para clasificar en línea.")
+
+    en_linea = asyncio.run(clasificar_items_async(pendientes, lote=lote, modo=modo, usar_cache=False)) if pendientes else []
+    if cache is not None:
+        cache.guardar(faltantes, del_batch + en_linea)
+        cache.reportar()
+
+    return expandir_resultados(items, resultados + del_batch + en_linea, rowids_por_representante)
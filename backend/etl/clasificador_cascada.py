@@ -0,0 +1,188 @@
+# etl/clasificador_cascada.py
+import asyncio
+import json
+import time
+from typing import Dict, List, Optional, Tuple
+
+from openai import AsyncOpenAI
+from tqdm import tqdm
+
+from backend.config import get_concurrencia_ia, get_modelos_cascada, get_presupuesto_tokens_lote, get_rpm_ia, get_tpm_ia, get_umbral_confianza
+from backend.etl.cache_clasificacion import version_clasificacion
+from backend.etl.clasificador import (
+    ESQUEMA_INDICES, armar_mensajes_clasificacion, deduplicar_items, empaquetar_por_tokens, expandir_resultados,
+    nuevos_contadores, obtener_cache_clasificacion, reportar_deduplicacion, resolver_modo_salida, validar_resultados
+)
+from backend.etl.clasificador_async import _clasificar_bloque, _pedir_clasificacion
+from backend.etl.limitador import LimitadorTasa
+
+# Precios en USD por millón de tokens (entrada, salida), para estimar el costo de cada nivel
+PRECIOS_POR_MILLON = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4.1-nano": (0.10, 0.40),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4.1": (2.00, 8.00),
+}
+
+
+def costo_estimado(modelo: str, tokens_entrada: int, tokens_salida: int) -> Optional[float]:
+    """
+    Costo en USD de los tokens usados con 'modelo' (None si no está en PRECIOS_POR_MILLON).
+    """
+    precios = PRECIOS_POR_MILLON.get(modelo)
+    if precios is None:
+        return None
+    return (tokens_entrada * precios[0] + tokens_salida * precios[1]) / 1_000_000
+
+
+def version_cascada(modelos: List[str], umbral: float, modo: str) -> str:
+    """
+    Versión de las clasificaciones de una cascada: cambia con los modelos, el umbral o el prompt.
+    """
+    mensajes = armar_mensajes_clasificacion([], modo)
+    if modo == "indices":
+        mensajes.append({"content": json.dumps(ESQUEMA_INDICES, sort_keys=True)})
+    return version_clasificacion(" > ".join(modelos) + f" @{umbral}", mensajes)
+
+
+def _metricas_nivel(nivel: int, modelo: str, items: int, resueltos: int, contadores: Dict, segundos: float) -> Dict:
+    escalados = items - resueltos
+    return {
+        "nivel": nivel,
+        "modelo": modelo,
+        "items": items,
+        "resueltos": resueltos,
+        "escalados": escalados,
+        "tasa_escalado": escalados / items if items else 0.0,
+        "pedidos": contadores["pedidos"],
+        "segundos": segundos,
+        "segundos_por_pedido": contadores["segundos_api"] / contadores["pedidos"] if contadores["pedidos"] else 0.0,
+        "tokens_entrada": contadores["tokens_entrada"],
+        "tokens_salida": contadores["tokens_salida"],
+        "costo_usd": costo_estimado(modelo, contadores["tokens_entrada"], contadores["tokens_salida"])
+    }
+
+
+def reportar_metricas_cascada(metricas: List[Dict], empresa: str = None, umbral: float = None) -> None:
+    """
+    Imprime latencia, costo y tasa de escalado de cada nivel de la cascada.
+    """
+    if not metricas:
+        return
+    print(f"🪜 Cascada{f' ({empresa})' if empresa else ''}, umbral de confianza {umbral}:")
+    for m in metricas:
+        costo = f"${m['costo_usd']:.4f}" if m["costo_usd"] is not None else "sin precio"
+        print(
+            f"   {m['nivel']}. {m['modelo']}: {m['items']} ítems, {m['resueltos']} resueltos, "
+            f"{m['escalados']} escalados ({m['tasa_escalado']:.0%}) | {m['pedidos']} pedidos, "
+            f"{m['segundos']:.1f}s ({m['segundos_por_pedido']:.2f}s/pedido) | "
+            f"{m['tokens_entrada']}+{m['tokens_salida']} tokens, {costo}"
+        )
+    costos = [m["costo_usd"] for m in metricas if m["costo_usd"] is not None]
+    if costos:
+        print(f"   💵 Costo total estimado: ${sum(costos):.4f}")
+
+
+async def _nivel_con_confianza(cliente: AsyncOpenAI, bloque: List[Dict], limitador: LimitadorTasa, semaforo: asyncio.Semaphore,
+                               reintentos: int, modo: str, modelo: str, umbral: float, contadores: Dict) -> Dict[int, str]:
+    """
+    Un pedido a un nivel intermedio: devuelve solo las categorías con confianza >= umbral.
+    Lo que venga mal, falte o tenga baja confianza no se reintenta: pasa al siguiente nivel.
+    """
+    confianzas = {}
+    try:
+        respuesta, _ = await _pedir_clasificacion(cliente, bloque, limitador, semaforo, reintentos, modo, modelo, contadores, confianzas)
+    except Exception as e:
+        print(f"⚠️ Nivel {modelo} falló para un bloque de {len(bloque)} ítems, se escala: {e}")
+        return {}
+    contadores["pedidos"] += 1
+    validos, _ = validar_resultados(bloque, respuesta)
+    return {rowid: categoria for rowid, categoria in validos.items() if confianzas.get(rowid, 0.0) >= umbral}
+
+
+async def clasificar_en_cascada(items: List[Dict], modelos: List[str], umbral: float, modo: str, lote: int = 200,
+                                concurrencia: int = None, rpm: int = None, tpm: int = None, reintentos: int = 5,
+                                cliente: AsyncOpenAI = None) -> Tuple[List[Dict], List[Dict]]:
+    """
+    Clasifica pasando por los modelos en orden: cada nivel recibe lo que el anterior no
+    resolvió con confianza suficiente (según los logprobs de la categoría). El último nivel
+    acepta su respuesta sin mirar la confianza y reintenta/parte bloques como siempre.
+
+    Returns:
+        (lista de dicts con 'rowid' y 'categoria' en el orden de 'items', métricas por nivel)
+    """
+    cliente = cliente or AsyncOpenAI(max_retries=0)
+    limitador = LimitadorTasa(rpm or get_rpm_ia(), tpm or get_tpm_ia())
+    semaforo = asyncio.Semaphore(concurrencia or get_concurrencia_ia())
+
+    categorias, metricas = {}, []
+    pendientes = items
+    for nivel, modelo in enumerate(modelos, start=1):
+        if not pendientes:
+            break
+        ultimo = nivel == len(modelos)
+        contadores = nuevos_contadores()
+        inicio = time.monotonic()
+
+        with tqdm(total=len(pendientes), desc=f"🤖 Nivel {nivel} ({modelo})") as barra:
+            async def clasificar_y_avanzar(bloque: List[Dict]) -> Dict[int, str]:
+                if ultimo:
+                    parcial = await _clasificar_bloque(cliente, bloque, limitador, semaforo, reintentos, modo, contadores, modelo=modelo)
+                else:
+                    parcial = await _nivel_con_confianza(cliente, bloque, limitador, semaforo, reintentos, modo, modelo, umbral, contadores)
+                barra.update(len(bloque))
+                return parcial
+
+            resueltos = {}
+            bloques = empaquetar_por_tokens(pendientes, get_presupuesto_tokens_lote(), max_items=lote)
+            for parcial in await asyncio.gather(*(clasificar_y_avanzar(b) for b in bloques)):
+                resueltos.update(parcial)
+
+        metricas.append(_metricas_nivel(nivel, modelo, len(pendientes), len(resueltos), contadores, time.monotonic() - inicio))
+        categorias.update(resueltos)
+        pendientes = [item for item in pendientes if item["rowid"] not in resueltos]
+
+    return [{"rowid": item["rowid"], "categoria": categorias.get(item["rowid"], "error")} for item in items], metricas
+
+
+async def clasificar_items_cascada_async(items: List[Dict], empresa: str = None, modelos: List[str] = None, umbral: float = None,
+                                         lote: int = 200, usar_cache: bool = True, modo: str = None, **kwargs) -> List[Dict]:
+    """
+    Como clasificar_items_async, pero con la cascada de modelos: un modelo barato clasifica
+    todo y solo los ítems en los que no está seguro se mandan a uno más fuerte. El umbral
+    puede ajustarse por empresa (UMBRAL_CONFIANZA_<EMPRESA>); al terminar se informan la
+    latencia, el costo y la tasa de escalado de cada nivel para poder calibrarlo.
+
+    Args:
+        items: Lista de ítems con 'rowid', 'descripcion', etc.
+        empresa: Empresa de los ítems (para el umbral y el reporte).
+        modelos: Modelos del más barato al más fuerte; por defecto MODELOS_CASCADA.
+        umbral: Confianza mínima (0 a 1) para no escalar; por defecto la de la empresa.
+        kwargs: concurrencia, rpm, tpm, reintentos y cliente, como en clasificar_items_async.
+
+    Returns:
+        Lista de dicts con 'rowid' y 'categoria', en el mismo orden de los ítems.
+    """
+    modo = resolver_modo_salida(modo)
+    modelos = modelos or get_modelos_cascada()
+    umbral = get_umbral_confianza(empresa) if umbral is None else umbral
+    representantes, rowids_por_representante = deduplicar_items(items)
+    reportar_deduplicacion(items, representantes)
+
+    cache = obtener_cache_clasificacion(version_cascada(modelos, umbral, modo)) if usar_cache else None
+    encontrados, faltantes = cache.buscar(representantes) if cache is not None else ([], representantes)
+    nuevos, metricas = await clasificar_en_cascada(faltantes, modelos, umbral, modo, lote, **kwargs)
+    if cache is not None:
+        cache.guardar(faltantes, nuevos)
+        cache.reportar()
+    reportar_metricas_cascada(metricas, empresa, umbral)
+
+    return expandir_resultados(items, encontrados + nuevos, rowids_por_representante)
+
+
+def clasificar_items_cascada(items: List[Dict], empresa: str = None, **kwargs) -> List[Dict]:
+    """
+    Versión sincrónica de clasificar_items_cascada_async, para usar desde el pipeline.
+    """
+    return asyncio.run(clasificar_items_cascada_async(items, empresa=empresa, **kwargs))
@@ -0,0 +1,236 @@
+# etl/cola_trabajos.py
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+
+class ColaTrabajos:
+    """
+    Cola de trabajos durable (SQLite) compartida por varios procesos: se encolan lotes (de
+    rowids o ítems) y cualquier cantidad de trabajadores los reclaman, procesan y confirman.
+
+    Reclamar un trabajo da un "lease" de 'lease' segundos que el trabajador renueva con
+    latidos mientras procesa; si el proceso muere, el lease vence y otro trabajador lo
+    retoma. Un trabajo que falla vuelve a la cola hasta 'max_intentos' y después queda
+    'fallido'. Encolar es idempotente por (cola, clave), así que volver a encolar una corrida
+    interrumpida solo deja pendiente lo que no se terminó.
+    """
+
+    def __init__(self, ruta: str, lease: float = 120, max_intentos: int = 3):
+        carpeta = os.path.dirname(ruta)
+        if carpeta:
+            os.makedirs(carpeta, exist_ok=True)
+        self.ruta = ruta
+        self.lease = lease
+        self.max_intentos = max_intentos
+        self.conn = sqlite3.connect(ruta, timeout=30, check_same_thread=False)
+        # WAL: los trabajadores leen mientras otro escribe
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS trabajos (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                cola TEXT NOT NULL,
+                lote TEXT NOT NULL,
+                clave TEXT NOT NULL,
+                carga TEXT NOT NULL,
+                estado TEXT NOT NULL DEFAULT 'pendiente',
+                intentos INTEGER NOT NULL DEFAULT 0,
+                trabajador TEXT,
+                vence REAL,
+                resultado TEXT,
+                error TEXT,
+                creado TEXT NOT NULL,
+                actualizado TEXT NOT NULL,
+                UNIQUE (cola, clave)
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_trabajos_estado ON trabajos (cola, estado, id)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_trabajos_lote ON trabajos (cola, lote)")
+        self.conn.commit()
+        self._lock = threading.Lock()
+
+    def encolar(self, cola: str, lote: str, trabajos: Iterable[Tuple[str, Dict]]) -> int:
+        """
+        Encola trabajos (clave, carga JSON) de un lote. Las claves ya encoladas se ignoran.
+
+        Returns:
+            Cantidad de trabajos nuevos.
+        """
+        ahora = datetime.now().isoformat()
+        with self._lock:
+            antes = self.conn.total_changes
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO trabajos (cola, lote, clave, carga, creado, actualizado) VALUES (?, ?, ?, ?, ?, ?)",
+                [(cola, lote, clave, json.dumps(carga, ensure_ascii=False, default=str), ahora, ahora) for clave, carga in trabajos]
+            )
+            self.conn.commit()
+            return self.conn.total_changes - antes
+
+    def reclamar(self, cola: str, trabajador: str) -> Optional[Dict]:
+        """
+        Toma el trabajo pendiente más viejo (o uno con el lease vencido) de forma atómica.
+
+        Returns:
+            Dict con 'id', 'lote', 'clave', 'carga' e 'intentos', o None si no hay trabajo.
+        """
+        ahora = time.time()
+        with self._lock:
+            fila = self.conn.execute(
+                """
+                UPDATE trabajos SET estado = 'en_proceso', trabajador = ?, vence = ?, intentos = intentos + 1, actualizado = ?
+                WHERE id = (
+                    SELECT id FROM trabajos
+                    WHERE cola = ? AND (estado = 'pendiente' OR (estado = 'en_proceso' AND vence < ?))
+                    ORDER BY id LIMIT 1
+                )
+                RETURNING id, lote, clave, carga, intentos
+                """,
+                (trabajador, ahora + self.lease, datetime.now().isoformat(), cola, ahora)
+            ).fetchone()
+            self.conn.commit()
+        if fila is None:
+            return None
+        return {"id": fila[0], "lote": fila[1], "clave": fila[2], "carga": json.loads(fila[3]), "intentos": fila[4]}
+
+    def latido(self, id_trabajo: int, trabajador: str) -> bool:
+        """
+        Renueva el lease. Devuelve False si el trabajo ya no es de este trabajador (venció y lo tomó otro).
+        """
+        with self._lock:
+            cursor = self.conn.execute(
+                "UPDATE trabajos SET vence = ?, actualizado = ? WHERE id = ? AND trabajador = ? AND estado = 'en_proceso'",
+                (time.time() + self.lease, datetime.now().isoformat(), id_trabajo, trabajador)
+            )
+            self.conn.commit()
+            return cursor.rowcount == 1
+
+    def confirmar(self, id_trabajo: int, trabajador: str, resultado=None) -> bool:
+        """
+        Marca el trabajo como 'hecho' con su resultado (solo si sigue siendo de este trabajador).
+        """
+        with self._lock:
+            cursor = self.conn.execute(
+                "UPDATE trabajos SET estado = 'hecho', resultado = ?, error = NULL, vence = NULL, actualizado = ? "
+                "WHERE id = ? AND trabajador = ? AND estado = 'en_proceso'",
+                (json.dumps(resultado, ensure_ascii=False, default=str), datetime.now().isoformat(), id_trabajo, trabajador)
+            )
+            self.conn.commit()
+            return cursor.rowcount == 1
+
+    def fallar(self, id_trabajo: int, trabajador: str, error: str) -> None:
+        """
+        Devuelve el trabajo a la cola, o lo marca 'fallido' si agotó sus intentos.
+        """
+        with self._lock:
+            self.conn.execute(
+                "UPDATE trabajos SET estado = CASE WHEN intentos >= ? THEN 'fallido' ELSE 'pendiente' END, "
+                "error = ?, vence = NULL, actualizado = ? WHERE id = ? AND trabajador = ? AND estado = 'en_proceso'",
+                (self.max_intentos, error, datetime.now().isoformat(), id_trabajo, trabajador)
+            )
+            self.conn.commit()
+
+    def reintentar_fallidos(self, cola: str, lote: str = None) -> int:
+        """
+        Vuelve a poner en la cola los trabajos fallidos (con los intentos en cero).
+        """
+        consulta = "UPDATE trabajos SET estado = 'pendiente', intentos = 0, actualizado = ? WHERE cola = ? AND estado = 'fallido'"
+        parametros = [datetime.now().isoformat(), cola]
+        if lote is not None:
+            consulta += " AND lote = ?"
+            parametros.append(lote)
+        with self._lock:
+            cursor = self.conn.execute(consulta, parametros)
+            self.conn.commit()
+            return cursor.rowcount
+
+    def estado(self, cola: str, lote: str = None) -> Dict[str, int]:
+        """
+        Cantidad de trabajos por estado (pendiente, en_proceso, hecho, fallido).
+        """
+        consulta = "SELECT estado, COUNT(*) FROM trabajos WHERE cola = ?"
+        parametros = [cola]
+        if lote is not None:
+            consulta += " AND lote = ?"
+            parametros.append(lote)
+        with self._lock:
+            conteo = dict(self.conn.execute(consulta + " GROUP BY estado", parametros).fetchall())
+        return {estado: conteo.get(estado, 0) for estado in ("pendiente", "en_proceso", "hecho", "fallido")}
+
+    def resultados(self, cola: str, lote: str, claves: List[str] = None) -> List:
+        """
+        Resultados de los trabajos terminados de un lote (o solo de 'claves'), en el orden en que se encolaron.
+        """
+        with self._lock:
+            filas = self.conn.execute(
+                "SELECT clave, resultado FROM trabajos WHERE cola = ? AND lote = ? AND estado = 'hecho' ORDER BY id", (cola, lote)
+            ).fetchall()
+        if claves is not None:
+            claves = set(claves)
+            filas = [fila for fila in filas if fila[0] in claves]
+        return [json.loads(fila[1]) for fila in filas]
+
+    def cerrar(self) -> None:
+        self.conn.close()
+
+
+class TrabajadorCola:
+    """
+    Trabajador que reclama trabajos de una cola y los procesa con 'procesar' (carga → resultado),
+    renovando el lease con latidos en un hilo aparte mientras dura cada trabajo.
+    """
+
+    def __init__(self, cola: ColaTrabajos, nombre_cola: str, procesar: Callable[[Dict], object], nombre: str = None):
+        self.cola = cola
+        self.nombre_cola = nombre_cola
+        self.procesar = procesar
+        self.nombre = nombre or f"{socket.gethostname()}-{os.getpid()}-{threading.get_ident()}"
+        self.procesados = 0
+        self.fallidos = 0
+
+    def _latir(self, id_trabajo: int, terminado: threading.Event) -> None:
+        while not terminado.wait(self.cola.lease / 3):
+            if not self.cola.latido(id_trabajo, self.nombre):
+                print(f"⚠️ {self.nombre} perdió el lease del trabajo {id_trabajo}.")
+                return
+
+    def procesar_uno(self) -> bool:
+        """
+        Procesa un trabajo. Devuelve False si la cola no tenía trabajos disponibles.
+        """
+        trabajo = self.cola.reclamar(self.nombre_cola, self.nombre)
+        if trabajo is None:
+            return False
+        terminado = threading.Event()
+        latidos = threading.Thread(target=self._latir, args=(trabajo["id"], terminado), daemon=True)
+        latidos.start()
+        try:
+            resultado = self.procesar(trabajo["carga"])
+        except Exception as e:
+            terminado.set()
+            print(f"❌ {self.nombre}: trabajo {trabajo['clave']} falló (intento {trabajo['intentos']}): {e}")
+            self.cola.fallar(trabajo["id"], self.nombre, str(e))
+            self.fallidos += 1
+            return True
+        terminado.set()
+        if self.cola.confirmar(trabajo["id"], self.nombre, resultado):
+            self.procesados += 1
+        return True
+
+    def ejecutar(self, esperar_nuevos: bool = False, intervalo: float = 2.0) -> None:
+        """
+        Procesa trabajos hasta vaciar la cola; con 'esperar_nuevos' sigue esperando trabajos nuevos.
+        """
+        while True:
+            if self.procesar_uno():
+                continue
+            estado = self.cola.estado(self.nombre_cola)
+            if not esperar_nuevos and not estado["pendiente"] and not estado["en_proceso"]:
+                break
+            # Quedan trabajos en proceso de otros: si su lease vence, este trabajador los retoma
+            time.sleep(intervalo)
+        print(f"🏁 {self.nombre}: {self.procesados} trabajos procesados, {self.fallidos} fallidos.")
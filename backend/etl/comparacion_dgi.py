@@ -13,8 +13,9 @@ def procesar_comparacion_dgi(path_json_datalogic: str, path_json_dgi: str) -> pd
     df_dgi = pd.read_json(path_json_dgi)
 
     # Normalización
-    df_cfe["ruc"] = df_cfe["ruc"].astype(str).str.strip()
-    df_dgi["rut_emisor"] = df_dgi["rut_emisor"].astype(str).str.strip()
+    # RUC como categórica: los group-by agrupan por código entero en vez de hashear strings
+    df_cfe["ruc"] = df_cfe["ruc"].astype(str).str.strip().astype("category")
+    df_dgi["rut_emisor"] = df_dgi["rut_emisor"].astype(str).str.strip().astype("category")
 
     df_cfe["monto_item"] = pd.to_numeric(df_cfe["monto_item"], errors="coerce")
     df_dgi["monto_total"] = pd.to_numeric(df_dgi["monto_total"], errors="coerce")
@@ -28,12 +29,12 @@ def procesar_comparacion_dgi(path_json_datalogic: str, path_json_dgi: str) -> pd
     df_dgi["fecha_comprobante"] = pd.to_datetime(df_dgi["fecha_comprobante"], format="%d/%m/%Y", errors="coerce")
 
     # Agrupamiento
-    df_cfe_group = df_cfe.groupby("ruc", as_index=False).agg({
+    df_cfe_group = df_cfe.groupby("ruc", as_index=False, observed=True).agg({
         "monto_item": "sum",
         "fecha": "max"
     }).rename(columns={"monto_item": "suma_datalogic"})
 
-    df_dgi_group = df_dgi.groupby("rut_emisor", as_index=False).agg({
+    df_dgi_group = df_dgi.groupby("rut_emisor", as_index=False, observed=True).agg({
         "monto_total": "sum",
         "monto_neto": "sum",
         "moneda": lambda x: x.iloc[0] if not x.empty else None,  # Tomamos la primera moneda del grupo
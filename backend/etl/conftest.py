@@ -0,0 +1,5 @@
+# etl/conftest.py
+import os
+
+# clasificador crea el cliente de OpenAI al importarse; los tests no hacen pedidos reales
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
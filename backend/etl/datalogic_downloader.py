@@ -18,15 +18,17 @@ from backend.utils import obtener_rango_de_fechas_por_mes
 from backend.config import get_carpeta_descarga, get_carpeta_procesados, get_datalogic_credentials
 from backend.etl.xml_parser import descomprimir_archivos_zip_en  # definiremos esto luego
 
-def descargar_y_descomprimir(carpeta_base, creds_list):
+def descargar_y_descomprimir(carpeta_base, creds_list, descomprimir=True, rango=None):
     """
     Downloads and decompresses XML files for multiple clients.
     
     Args:
         carpeta_base: Base directory where client folders will be created
         creds_list: List of client credentials dictionaries
+        descomprimir: If False, ZIPs are left as downloaded (to be parsed with parsear_zips_en_carpeta)
+        rango: (mes, anio, fecha_desde, fecha_hasta) already asked to the user; if None it is asked here
     """
-    mes, anio, fecha_desde, fecha_hasta = obtener_rango_de_fechas_por_mes()
+    mes, anio, fecha_desde, fecha_hasta = rango or obtener_rango_de_fechas_por_mes()
     print(f"📥 Buscando XMLs desde {fecha_desde} hasta {fecha_hasta}...")
     
     for creds in creds_list:
@@ -50,7 +52,8 @@ def descargar_y_descomprimir(carpeta_base, creds_list):
                 fecha_hasta_str=fecha_hasta
             )
             
-            descomprimir_archivos_zip_en(carpeta_cliente)
+            if descomprimir:
+                descomprimir_archivos_zip_en(carpeta_cliente)
             print(f"✅ Cliente {client_id} - {empresa_datalogic} procesado exitosamente")
             
         except Exception as e:
@@ -0,0 +1,96 @@
+# etl/etapas.py
+import queue
+import threading
+import time
+from typing import Callable, Iterable, List, Tuple
+
+# Marca de fin que cada etapa le pasa a la siguiente
+_FIN = object()
+
+
+def ejecutar_etapas(fuente: Iterable, etapas: List[Tuple[str, Callable]], tamano_cola: int = 2,
+                    nombre_fuente: str = "parseo") -> List:
+    """
+    Corre un pipeline por etapas superpuestas: 'fuente' (p. ej. el generador de lotes del
+    parser) y cada etapa (nombre, función elemento → resultado) en su propio hilo, unidas
+    por colas de a lo sumo 'tamano_cola' elementos. Mientras una etapa procesa un lote, la
+    anterior ya prepara el siguiente, así el tiempo total se acerca al de la etapa más
+    lenta y no a la suma de todas; las colas acotadas frenan a una etapa rápida para que
+    no acumule lotes en memoria.
+
+    Una etapa que devuelve None descarta el elemento (no pasa a las siguientes). Los
+    elementos salen en el mismo orden en que los dio la fuente. Si una etapa falla, la
+    fuente deja de producir, las demás descartan lo que quede y la excepción se relanza.
+
+    Returns:
+        Los resultados de la última etapa, en orden.
+    """
+    colas = [queue.Queue(maxsize=max(1, tamano_cola)) for _ in etapas]
+    resultados = []
+    errores = []
+    detener = threading.Event()
+    segundos = {nombre: 0.0 for nombre in [nombre_fuente] + [nombre for nombre, _ in etapas]}
+
+    def fallar(nombre: str, error: Exception) -> None:
+        print(f"❌ Falló la etapa '{nombre}': {error}")
+        errores.append(error)
+        detener.set()
+
+    def producir() -> None:
+        try:
+            iterador = iter(fuente)
+            while not detener.is_set():
+                inicio = time.perf_counter()
+                elemento = next(iterador, _FIN)
+                segundos[nombre_fuente] += time.perf_counter() - inicio
+                if elemento is _FIN:
+                    break
+                colas[0].put(elemento)
+        except Exception as e:
+            fallar(nombre_fuente, e)
+        finally:
+            colas[0].put(_FIN)
+
+    def procesar(posicion: int, nombre: str, funcion: Callable) -> None:
+        # Siempre se vacía la cola de entrada hasta la marca de fin, aunque otra etapa haya
+        # fallado: así ninguna etapa anterior queda bloqueada esperando lugar
+        siguiente = colas[posicion + 1] if posicion + 1 < len(colas) else None
+        while True:
+            elemento = colas[posicion].get()
+            if elemento is _FIN:
+                break
+            if detener.is_set():
+                continue
+            try:
+                inicio = time.perf_counter()
+                resultado = funcion(elemento)
+                segundos[nombre] += time.perf_counter() - inicio
+            except Exception as e:
+                fallar(nombre, e)
+                continue
+            if resultado is None:
+                continue
+            if siguiente is not None:
+                siguiente.put(resultado)
+            else:
+                resultados.append(resultado)
+        if siguiente is not None:
+            siguiente.put(_FIN)
+
+    inicio = time.perf_counter()
+    hilos = [threading.Thread(target=producir, name=f"etapa-{nombre_fuente}", daemon=True)] + [
+        threading.Thread(target=procesar, args=(posicion, nombre, funcion), name=f"etapa-{nombre}", daemon=True)
+        for posicion, (nombre, funcion) in enumerate(etapas)
+    ]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    total = time.perf_counter() - inicio
+
+    if errores:
+        raise errores[0]
+    if resultados:
+        detalle = ", ".join(f"{nombre} {s:.1f}s" for nombre, s in segundos.items())
+        print(f"⏱️ Etapas: {detalle}; total {total:.1f}s (en serie serían {sum(segundos.values()):.1f}s).")
+    return resultados
@@ -0,0 +1,197 @@
+# etl/historico_local.py
+import json
+import os
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from backend.config import get_carpeta_historico_local, get_columna_cambios_historico, get_historico_max_dias
+from backend.etl.red_de_pescadores import normalizar_serie
+
+# Cambia si cambian las columnas guardadas o la normalización: obliga a una descarga completa
+VERSION_FORMATO = 1
+COLUMNAS_SUPABASE = "id, proveedor, ruc, descripcion, categoria, verificado"
+COLUMNAS_TEXTO = ("proveedor", "ruc", "descripcion", "categoria", "proveedor_norm", "descripcion_norm")
+
+
+def _como_texto(valor):
+    if isinstance(valor, str) or pd.isna(valor):
+        return valor
+    # Los RUC pueden venir como números
+    return str(int(valor)) if isinstance(valor, (float, np.floating)) and float(valor).is_integer() else str(valor)
+
+
+def _empaquetar_textos(valores: pd.Series) -> Dict[str, np.ndarray]:
+    """
+    Una columna de texto como códigos int32 (-1 = nulo) más sus valores distintos, guardados
+    en un único bloque UTF-8 con las posiciones (en caracteres) donde empieza cada uno.
+    """
+    codigos, unicos = pd.factorize(valores.map(_como_texto))
+    posiciones = np.zeros(len(unicos) + 1, dtype=np.int64)
+    np.cumsum([len(u) for u in unicos], out=posiciones[1:])
+    return {
+        "codigos": codigos.astype(np.int32),
+        "texto": np.frombuffer("".join(unicos).encode("utf-8"), dtype=np.uint8),
+        "posiciones": posiciones
+    }
+
+
+def _desempaquetar_textos(codigos: np.ndarray, texto: np.ndarray, posiciones: np.ndarray) -> np.ndarray:
+    completo = texto.tobytes().decode("utf-8")
+    unicos = np.array([completo[posiciones[i]:posiciones[i + 1]] for i in range(len(posiciones) - 1)] + [np.nan], dtype=object)
+    # Los nulos tienen código -1, que apunta al NaN del final
+    return unicos[codigos]
+
+
+def preparar_filas(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Filas del histórico con las columnas que se guardan y las claves ya normalizadas.
+    """
+    df = df.copy()
+    for columna in ("id", "año", "proveedor", "ruc", "descripcion", "categoria"):
+        if columna not in df.columns:
+            df[columna] = np.nan
+    df = df.dropna(subset=["id"])
+    df["id"] = df["id"].astype(np.int64)
+    df["año"] = df["año"].astype(np.int64)
+    df["proveedor_norm"] = normalizar_serie(df["proveedor"])
+    df["descripcion_norm"] = normalizar_serie(df["descripcion"])
+    columnas = ["id", "año", *COLUMNAS_TEXTO] + (["verificado"] if "verificado" in df.columns else [])
+    return df[columnas].reset_index(drop=True)
+
+
+def fusionar(base: pd.DataFrame, nuevas: pd.DataFrame, cambiadas: pd.DataFrame = None) -> pd.DataFrame:
+    """
+    Agrega al histórico las filas nuevas y reemplaza las cambiadas (las que dejaron de
+    estar verificadas se sacan). Queda ordenado por año e id, sin repetidos.
+    """
+    partes = [base, nuevas]
+    if cambiadas is not None and not cambiadas.empty:
+        claves = set(zip(cambiadas["año"], cambiadas["id"]))
+        partes = [base[[clave not in claves for clave in zip(base["año"], base["id"])]], nuevas,
+                  cambiadas[cambiadas["verificado"] == True]]
+    df = pd.concat([p.drop(columns=["verificado"], errors="ignore") for p in partes], ignore_index=True)
+    df = df.drop_duplicates(subset=["año", "id"], keep="last").sort_values(["año", "id"], kind="stable")
+    return df.reset_index(drop=True)
+
+
+class HistoricoLocal:
+    """
+    Histórico verificado de una empresa, ya preparado para la red de pescadores, guardado
+    en disco: un npz con id, año y las columnas de texto factorizadas (cada valor distinto
+    una sola vez) y un json con la marca de agua (id más alto por año) y las fechas de
+    refresco. El json se escribe último: si falta o no coincide, se descarga todo de nuevo.
+    """
+
+    def __init__(self, carpeta: str, empresa: str):
+        self.carpeta = carpeta
+        self.ruta_datos = os.path.join(carpeta, f"{empresa}.npz")
+        self.ruta_metadatos = os.path.join(carpeta, f"{empresa}.json")
+
+    def cargar(self) -> Tuple[Optional[pd.DataFrame], Dict]:
+        """
+        Returns:
+            (histórico guardado, metadatos), o (None, {}) si no hay uno válido
+        """
+        if not os.path.exists(self.ruta_metadatos) or not os.path.exists(self.ruta_datos):
+            return None, {}
+        with open(self.ruta_metadatos, "r", encoding="utf-8") as f:
+            metadatos = json.load(f)
+        if metadatos.get("version") != VERSION_FORMATO:
+            return None, {}
+        with np.load(self.ruta_datos, allow_pickle=False) as datos:
+            df = pd.DataFrame({"id": datos["id"], "año": datos["año"]})
+            for columna in COLUMNAS_TEXTO:
+                df[columna] = _desempaquetar_textos(datos[f"{columna}_codigos"], datos[f"{columna}_texto"], datos[f"{columna}_posiciones"])
+        if len(df) != metadatos.get("filas"):
+            return None, {}
+        return df, metadatos
+
+    def guardar(self, df: pd.DataFrame, metadatos: Dict) -> None:
+        os.makedirs(self.carpeta, exist_ok=True)
+        arreglos = {"id": df["id"].to_numpy(np.int64), "año": df["año"].to_numpy(np.int64)}
+        for columna in COLUMNAS_TEXTO:
+            for parte, valores in _empaquetar_textos(df[columna]).items():
+                arreglos[f"{columna}_{parte}"] = valores
+        temporal = self.ruta_datos + ".tmp.npz"
+        np.savez_compressed(temporal, **arreglos)
+        os.replace(temporal, self.ruta_datos)
+        self.guardar_metadatos(metadatos, len(df))
+
+    def guardar_metadatos(self, metadatos: Dict, filas: int) -> None:
+        metadatos = {**metadatos, "version": VERSION_FORMATO, "filas": filas}
+        with open(self.ruta_metadatos + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(metadatos, f, ensure_ascii=False, indent=2)
+        os.replace(self.ruta_metadatos + ".tmp", self.ruta_metadatos)
+
+
+def _edad_dias(marca: str) -> float:
+    return (datetime.now(timezone.utc) - datetime.fromisoformat(marca)).total_seconds() / 86400
+
+
+def obtener_historico_red(empresa: str, años: List[int], carpeta: str = None, max_dias: float = None) -> pd.DataFrame:
+    """
+    Histórico verificado de la empresa, listo para la red de pescadores. Con el histórico
+    local (CARPETA_HISTORICO_LOCAL) solo se bajan de Supabase las filas verificadas con id
+    mayor a la marca de agua de cada año (y, si HISTORICO_COLUMNA_CAMBIOS está definida,
+    las filas modificadas desde el último refresco); los años que no estaban se bajan
+    enteros. Cada HISTORICO_MAX_DIAS se vuelve a bajar todo, para tomar filas viejas que
+    se verificaron o cambiaron de categoría después. Sin carpeta se descarga todo, como antes.
+    Si falla una consulta no se guarda nada ni se mueven las marcas: se usa el histórico
+    guardado tal como estaba o, si no hay uno, se propaga el error.
+    """
+    # Import diferido: supabase_client exige las credenciales de Supabase al importarse
+    from backend.etl.supabase_client import obtener_cambios_historico, obtener_historico
+
+    carpeta = get_carpeta_historico_local() if carpeta is None else carpeta
+    if not carpeta:
+        return obtener_historico(empresa=empresa, años=años)
+    max_dias = get_historico_max_dias() if max_dias is None else max_dias
+
+    inicio = time.perf_counter()
+    almacen = HistoricoLocal(carpeta, empresa)
+    base, metadatos = almacen.cargar()
+    completo = base is None or _edad_dias(metadatos["completo"]) > max_dias
+    if completo:
+        base = preparar_filas(pd.DataFrame())
+        metadatos = {"completo": datetime.now(timezone.utc).isoformat(), "marcas": {}}
+    marcas = {int(año): marca for año, marca in metadatos["marcas"].items()}
+
+    refresco = datetime.now(timezone.utc).isoformat()
+    cambiadas = None
+    columna_cambios = get_columna_cambios_historico()
+    conocidos = [año for año in años if año in marcas]
+    try:
+        nuevas = preparar_filas(obtener_historico(empresa=empresa, años=años, id_desde=marcas, columnas=COLUMNAS_SUPABASE, estricto=True))
+        if columna_cambios and conocidos and metadatos.get("refrescado"):
+            cambiadas = preparar_filas(obtener_cambios_historico(empresa, conocidos, columna_cambios, metadatos["refrescado"],
+                                                                 COLUMNAS_SUPABASE, estricto=True))
+    except Exception as e:
+        guardado, _ = almacen.cargar()
+        if guardado is None:
+            raise
+        print(f"❌ No se pudo refrescar el histórico de {empresa} ({e}); se usa el guardado sin cambios.")
+        df = guardado[guardado["año"].isin(años)].reset_index(drop=True)
+        df["verificado"] = True
+        return df
+
+    df = fusionar(base, nuevas, cambiadas)
+    for año in años:
+        # Las filas nuevas llegan ordenadas por id y completas: la marca es el último id recibido
+        ids = nuevas.loc[nuevas["año"] == año, "id"]
+        marcas[año] = int(ids.iloc[-1]) if len(ids) else marcas.get(año, 0)
+    metadatos.update(marcas={str(año): marca for año, marca in marcas.items()}, refrescado=refresco)
+    if completo or len(nuevas) or (cambiadas is not None and len(cambiadas)):
+        almacen.guardar(df, metadatos)
+    else:
+        almacen.guardar_metadatos(metadatos, len(df))
+
+    df = df[df["año"].isin(años)].reset_index(drop=True)
+    df["verificado"] = True
+    print(f"📚 Histórico local de {empresa}: {len(df)} filas verificadas "
+          f"({'descarga completa' if completo else f'{len(nuevas)} nuevas'}"
+          f"{f', {len(cambiadas)} cambiadas' if cambiadas is not None else ''}) en {time.perf_counter() - inicio:.2f}s")
+    return df
@@ -0,0 +1,124 @@
+# etl/indice_trigramas.py
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+
+def trigramas(texto: str) -> set:
+    """
+    Trigramas de caracteres de un texto normalizado, con relleno para que el comienzo y el
+    final también cuenten ("gasoil" → "  g", " ga", "gas", ..., "il ").
+    """
+    relleno = f"  {texto} "
+    return {relleno[i:i + 3] for i in range(len(relleno) - 2)}
+
+
+def mascaras_caracteres(texto: str) -> Dict[str, int]:
+    """
+    Para cada carácter, un entero con un bit prendido en cada posición donde aparece
+    (lo que necesita longitud_lcs; se precalcula una vez por texto del índice).
+    """
+    mascaras: Dict[str, int] = {}
+    for posicion, caracter in enumerate(texto):
+        mascaras[caracter] = mascaras.get(caracter, 0) | (1 << posicion)
+    return mascaras
+
+
+def longitud_lcs(mascaras: Dict[str, int], largo: int, otro: str) -> int:
+    """
+    Largo de la subsecuencia común más larga entre el texto de 'mascaras' (de 'largo'
+    caracteres) y 'otro', con el algoritmo bit-paralelo de Hyyrö: una suma y unas pocas
+    operaciones de bits por carácter de 'otro', en lugar de la tabla de programación dinámica.
+    """
+    todos = (1 << largo) - 1
+    v = todos
+    for caracter in otro:
+        u = v & mascaras.get(caracter, 0)
+        v = ((v + u) | (v - u)) & todos
+    return largo - bin(v).count("1")
+
+
+def similitud(a: str, b: str) -> float:
+    """
+    2 * LCS / (largo de a + largo de b): la misma escala que SequenceMatcher.ratio()
+    (1.0 = iguales), pero con la subsecuencia común más larga exacta en lugar de los
+    bloques que encuentra SequenceMatcher, así que nunca da menos que ratio().
+    """
+    total = len(a) + len(b)
+    if not total:
+        return 1.0
+    return 2.0 * longitud_lcs(mascaras_caracteres(a), len(a), b) / total
+
+
+class IndiceTrigramas:
+    """
+    Índice invertido trigrama → posiciones de los textos que lo contienen. Para una
+    consulta devuelve los textos que comparten trigramas con ella, ordenados por el
+    coeficiente de Dice de sus trigramas, y calcula la similitud solo de esos candidatos.
+    Las posiciones de cada lista están ordenadas, así que se puede buscar dentro de un
+    rango de textos contiguos (p. ej. los de un proveedor) sin recorrer el resto.
+    """
+
+    def __init__(self, textos: List[str]):
+        self.textos = list(textos)
+        self.largos = np.array([len(texto) for texto in self.textos], dtype=np.int64)
+        self.cantidad_trigramas = np.empty(len(self.textos), dtype=np.int64)
+        listas = defaultdict(list)
+        for posicion, texto in enumerate(self.textos):
+            propios = trigramas(texto)
+            self.cantidad_trigramas[posicion] = len(propios)
+            for trigrama in propios:
+                listas[trigrama].append(posicion)
+        self.listas: Dict[str, np.ndarray] = {t: np.array(p, dtype=np.int64) for t, p in listas.items()}
+        self._mascaras: Dict[int, Dict[str, int]] = {}
+
+    def candidatos(self, texto: str, desde: int = 0, hasta: int = None, dice_minimo: float = 0.0) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Textos de [desde, hasta) que comparten trigramas con 'texto' y cuyo Dice es >= dice_minimo.
+
+        Returns:
+            (posiciones, dice), de mayor a menor Dice (a igual Dice, en el orden del índice)
+        """
+        hasta = len(self.textos) if hasta is None else hasta
+        propios = trigramas(texto)
+        partes = []
+        for trigrama in propios:
+            lista = self.listas.get(trigrama)
+            if lista is not None:
+                partes.append(lista[np.searchsorted(lista, desde):np.searchsorted(lista, hasta)])
+        if not partes:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        compartidos = np.bincount(np.concatenate(partes) - desde, minlength=hasta - desde)
+        posiciones = np.flatnonzero(compartidos)
+        dice = 2.0 * compartidos[posiciones] / (len(propios) + self.cantidad_trigramas[posiciones + desde])
+        elegidos = dice >= dice_minimo
+        posiciones, dice = posiciones[elegidos] + desde, dice[elegidos]
+        orden = np.argsort(-dice, kind="stable")
+        return posiciones[orden], dice[orden]
+
+    def mas_parecido(self, texto: str, umbral: float, desde: int = 0, hasta: int = None, dice_minimo: float = 0.0) -> Tuple[int, float]:
+        """
+        Texto de [desde, hasta) con la mayor similitud(texto) >= umbral (a igual similitud,
+        el primero en el índice). Antes de calcular cada similitud descarta los candidatos
+        cuya cota por largos (2 * el más corto / la suma) no llega al umbral o al mejor ya encontrado.
+
+        Returns:
+            (posición, similitud), o (-1, 0.0) si ninguno llega al umbral
+        """
+        posiciones, _ = self.candidatos(texto, desde, hasta, dice_minimo)
+        mejor, mejor_similitud = -1, 0.0
+        largo = len(texto)
+        for posicion in posiciones.tolist():
+            largo_indice = int(self.largos[posicion])
+            total = largo + largo_indice
+            cota = 2.0 * min(largo, largo_indice) / total if total else 1.0
+            if cota < umbral or cota < mejor_similitud or (cota == mejor_similitud and posicion > mejor):
+                continue
+            mascaras = self._mascaras.get(posicion)
+            if mascaras is None:
+                mascaras = self._mascaras[posicion] = mascaras_caracteres(self.textos[posicion])
+            valor = 2.0 * longitud_lcs(mascaras, largo_indice, texto) / total if total else 1.0
+            if valor >= umbral and (valor > mejor_similitud or (valor == mejor_similitud and posicion < mejor)):
+                mejor, mejor_similitud = posicion, valor
+        return mejor, mejor_similitud
@@ -0,0 +1,116 @@
+# etl/limitador.py
+import asyncio
+import random
+import threading
+import time
+from typing import Dict, List
+
+try:
+    import tiktoken
+    _CODIFICADOR = tiktoken.get_encoding("o200k_base")
+except Exception:
+    # Sin tiktoken (o sin poder bajar su vocabulario) se usa la aproximación por caracteres
+    _CODIFICADOR = None
+
+# Tokens de salida esperados por ítem clasificado ({"rowid": n, "categoria": "..."})
+TOKENS_SALIDA_POR_ITEM = 20
+
+
+def estimar_tokens(texto: str) -> int:
+    """
+    Cuenta los tokens con el tokenizer de gpt-4o si tiktoken está instalado; si no, los
+    aproxima (≈ 4 caracteres por token), suficiente para el limitador y el empaquetado.
+    """
+    if _CODIFICADOR is not None:
+        return len(_CODIFICADOR.encode(texto))
+    return len(texto) // 4 + 1
+
+
+def estimar_tokens_mensajes(mensajes: List[Dict]) -> int:
+    """
+    Estima los tokens de entrada de una lista de mensajes de chat.
+    """
+    return sum(estimar_tokens(m["content"]) + 4 for m in mensajes)
+
+
+def segundos_de_espera(error: Exception, intento: int) -> float:
+    """
+    Usa el Retry-After del 429 si viene; si no, backoff exponencial con jitter (tope 60 s).
+    """
+    respuesta = getattr(error, "response", None)
+    if respuesta is not None:
+        try:
+            return float(respuesta.headers.get("retry-after"))
+        except (TypeError, ValueError):
+            pass
+    return min(60.0, 2 ** intento) * (0.5 + random.random() / 2)
+
+
+class LimitadorTasa:
+    """
+    Token bucket doble para la API de OpenAI: pedidos por minuto (rpm) y tokens por minuto
+    (tpm). Cada pedido reserva su cuota por adelantado (el saldo puede quedar negativo) y
+    espera lo necesario hasta que el balde se recargue, así los pedidos concurrentes salen
+    en orden y sin ráfagas. Un 429 pausa a todos los pedidos durante el tiempo indicado.
+
+    Sirve tanto para código asíncrono (esperar) como sincrónico (esperar_sync).
+    """
+
+    def __init__(self, rpm: int, tpm: int):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.pedidos = float(rpm)
+        self.tokens = float(tpm)
+        self._ultimo = time.monotonic()
+        self._pausa_hasta = 0.0
+        self._lock = threading.Lock()
+
+    def _recargar(self, ahora: float) -> None:
+        transcurrido = ahora - self._ultimo
+        self.pedidos = min(self.rpm, self.pedidos + transcurrido * self.rpm / 60)
+        self.tokens = min(self.tpm, self.tokens + transcurrido * self.tpm / 60)
+        self._ultimo = ahora
+
+    def reservar(self, tokens: int) -> float:
+        """
+        Reserva un pedido de 'tokens' tokens.
+
+        Returns:
+            Segundos a esperar antes de enviarlo.
+        """
+        with self._lock:
+            ahora = time.monotonic()
+            self._recargar(ahora)
+            # Un pedido más grande que el balde nunca entraría: se limita a la capacidad
+            self.pedidos -= 1
+            self.tokens -= min(tokens, self.tpm)
+            return max(
+                0.0,
+                -self.pedidos * 60 / self.rpm,
+                -self.tokens * 60 / self.tpm,
+                self._pausa_hasta - ahora
+            )
+
+    def ajustar(self, tokens_estimados: int, tokens_reales: int) -> None:
+        """
+        Corrige el saldo con los tokens que informó la API en lugar de la estimación.
+        """
+        with self._lock:
+            self.tokens = min(self.tpm, self.tokens + tokens_estimados - tokens_reales)
+
+    def penalizar(self, segundos: float) -> None:
+        """
+        Frena todos los pedidos durante 'segundos' (p. ej. tras un 429 con Retry-After).
+        """
+        with self._lock:
+            self._pausa_hasta = max(self._pausa_hasta, time.monotonic() + segundos)
+
+    async def esperar(self, tokens: int) -> None:
+        espera = self.reservar(tokens)
+        if espera > 0:
+            await asyncio.sleep(espera)
+
+    def esperar_sync(self, tokens: int) -> None:
+        espera = self.reservar(tokens)
+        if espera > 0:
+            time.sleep(espera)
@@ -0,0 +1,163 @@
+# etl/manifiesto.py
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, List
+
+import pandas as pd
+
+# Campos que identifican un CFE: RUC emisor + tipo + serie + número
+_CAMPOS_IDENTIDAD = ("RUCEmisor", "TipoCFE", "Serie", "Nro")
+_PATRONES_IDENTIDAD = {
+    campo: re.compile(rb"<(?:[\w.-]+:)?" + campo.encode() + rb">\s*([^<]*?)\s*</")
+    for campo in _CAMPOS_IDENTIDAD
+}
+
+
+def identificar_cfe(contenido: bytes) -> Dict[str, str]:
+    """
+    Calcula la identidad de un CFE a partir de sus bytes crudos, sin parsear el XML.
+
+    Returns:
+        Dict con 'clave' (RUC-tipo-serie-número, o el hash si falta algún campo) y 'hash' (sha256).
+    """
+    hash_contenido = hashlib.sha256(contenido).hexdigest()
+
+    valores = []
+    for campo in _CAMPOS_IDENTIDAD:
+        match = _PATRONES_IDENTIDAD[campo].search(contenido)
+        if not match or not match.group(1):
+            return {"clave": f"sha256:{hash_contenido}", "hash": hash_contenido}
+        valores.append(match.group(1).decode("utf-8", errors="replace"))
+
+    return {"clave": "-".join(valores), "hash": hash_contenido}
+
+
+class ManifiestoCFE:
+    """
+    Registro local (SQLite) de los CFE ya procesados por empresa, para que las corridas
+    sean idempotentes: un documento pasa a 'parseado' al extraer sus ítems y a 'subido'
+    cuando todas sus filas llegaron a Supabase. Los documentos 'subidos' se saltean tanto
+    en el parser como en subir_dataframe, aunque se vuelvan a descargar.
+    """
+
+    def __init__(self, ruta: str, empresa: str):
+        carpeta = os.path.dirname(ruta)
+        if carpeta:
+            os.makedirs(carpeta, exist_ok=True)
+        self.empresa = empresa
+        # Se usa desde varios hilos (el vigilante de carpetas, las etapas del pipeline): cada
+        # operación toma el lock para no usar la conexión en simultáneo
+        self.conn = sqlite3.connect(ruta, check_same_thread=False)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS cfe_procesados (
+                empresa TEXT NOT NULL,
+                clave TEXT NOT NULL,
+                hash TEXT NOT NULL,
+                archivo TEXT,
+                estado TEXT NOT NULL,
+                actualizado TEXT NOT NULL,
+                PRIMARY KEY (empresa, clave)
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_cfe_hash ON cfe_procesados (empresa, hash)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_cfe_archivo ON cfe_procesados (empresa, archivo)")
+        self.conn.commit()
+        self._lock = threading.Lock()
+
+    def ya_subido(self, identidad: Dict[str, str]) -> bool:
+        """
+        Devuelve True si el documento (por clave o por hash de contenido) ya se subió.
+        """
+        with self._lock:
+            fila = self.conn.execute(
+                "SELECT 1 FROM cfe_procesados WHERE empresa = ? AND estado = 'subido' AND (clave = ? OR hash = ?) LIMIT 1",
+                (self.empresa, identidad["clave"], identidad["hash"])
+            ).fetchone()
+        return fila is not None
+
+    def identidades_subidas(self) -> set:
+        """
+        Claves y hashes de todos los documentos ya subidos, para saltearlos sin consultar
+        la base por cada archivo (p. ej. desde los workers del parser).
+        """
+        with self._lock:
+            filas = self.conn.execute(
+                "SELECT clave, hash FROM cfe_procesados WHERE empresa = ? AND estado = 'subido'", (self.empresa,)
+            ).fetchall()
+        return {valor for fila in filas for valor in fila}
+
+    def registrar_parseados(self, documentos: List[Dict[str, str]]) -> None:
+        """
+        Registra documentos parseados (dicts con 'clave', 'hash' y 'archivo'), sin pisar los ya subidos.
+        """
+        ahora = datetime.now().isoformat()
+        with self._lock:
+            self.conn.executemany(
+                """
+                INSERT INTO cfe_procesados (empresa, clave, hash, archivo, estado, actualizado)
+                VALUES (?, ?, ?, ?, 'parseado', ?)
+                ON CONFLICT (empresa, clave) DO UPDATE SET
+                    hash = excluded.hash, archivo = excluded.archivo, actualizado = excluded.actualizado
+                WHERE cfe_procesados.estado != 'subido'
+                """,
+                [(self.empresa, d["clave"], d["hash"], d["archivo"], ahora) for d in documentos]
+            )
+            self.conn.commit()
+
+    def archivos_subidos(self, archivos: Iterable[str]) -> set:
+        """
+        Devuelve cuáles de los archivos dados corresponden a documentos ya subidos.
+        """
+        archivos = list(set(archivos))
+        subidos = set()
+        for i in range(0, len(archivos), 500):
+            bloque = archivos[i:i + 500]
+            marcadores = ", ".join("?" * len(bloque))
+            with self._lock:
+                filas = self.conn.execute(
+                    f"SELECT archivo FROM cfe_procesados WHERE empresa = ? AND estado = 'subido' AND archivo IN ({marcadores})",
+                    [self.empresa, *bloque]
+                ).fetchall()
+            subidos.update(f[0] for f in filas)
+        return subidos
+
+    def marcar_subidos(self, archivos: Iterable[str]) -> None:
+        """
+        Marca como subidos los documentos registrados con esos nombres de archivo.
+        """
+        ahora = datetime.now().isoformat()
+        filas = [(ahora, self.empresa, archivo) for archivo in set(archivos)]
+        with self._lock:
+            self.conn.executemany(
+                "UPDATE cfe_procesados SET estado = 'subido', actualizado = ? WHERE empresa = ? AND archivo = ?", filas
+            )
+            self.conn.commit()
+
+    def marcar_filas_subidas(self, archivos: List[str], filas_subidas: int) -> None:
+        """
+        Recibe el archivo de cada fila en el orden en que se subieron y cuántas llegaron.
+        Un documento cuenta como subido solo si ninguna de sus filas quedó sin subir.
+        """
+        pendientes = set(archivos[filas_subidas:])
+        self.marcar_subidos(a for a in archivos[:filas_subidas] if a not in pendientes)
+
+    def descartar_filas_subidas(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Quita del DataFrame las filas de documentos que ya figuran como subidos.
+        """
+        if df.empty or "archivo" not in df.columns:
+            return df
+        subidos = self.archivos_subidos(df["archivo"].dropna())
+        if not subidos:
+            return df
+        print(f"⏭️ {int(df['archivo'].isin(subidos).sum())} filas de {len(subidos)} CFE ya subidos, se omiten.")
+        return df[~df["archivo"].isin(subidos)]
+
+    def cerrar(self) -> None:
+        with self._lock:
+            self.conn.close()
+
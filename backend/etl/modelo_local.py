@@ -0,0 +1,312 @@
+# etl/modelo_local.py
+import hashlib
+import json
+import os
+import time
+import zlib
+from collections import Counter
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from backend.config import get_carpeta_modelos_locales, get_modelo_local, get_umbral_modelo_local
+from backend.etl.red_de_pescadores import normalizar_texto
+
+# Rasgos hasheados en 2^15 columnas: n-gramas de caracteres de la descripción, sus palabras
+# y el proveedor (entero y en 4-gramas, para tolerar variantes del nombre)
+DIMENSION = 2 ** 15
+NGRAMAS_DESCRIPCION = (3, 4, 5)
+NGRAMAS_PROVEEDOR = (4,)
+
+_modelos: Dict[str, Optional["ModeloLocal"]] = {}
+
+
+def _rasgos(item: Dict) -> Counter:
+    proveedor = normalizar_texto(item.get("proveedor"))
+    descripcion = normalizar_texto(item.get("descripcion"))
+    rasgos = [f"p|{proveedor}"] + [f"w|{palabra}" for palabra in descripcion.split()]
+    for prefijo, texto, tamanos in (("c", f" {descripcion} ", NGRAMAS_DESCRIPCION), ("q", f" {proveedor} ", NGRAMAS_PROVEEDOR)):
+        for n in tamanos:
+            rasgos += [f"{prefijo}|{texto[i:i + n]}" for i in range(len(texto) - n + 1)]
+    # crc32 y no hash(): tiene que dar lo mismo en cada proceso para que el modelo guardado sirva
+    return Counter(zlib.crc32(rasgo.encode("utf-8")) & (DIMENSION - 1) for rasgo in rasgos)
+
+
+def vectorizar(items: List[Dict], idf: np.ndarray = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Convierte los ítems en una matriz dispersa TF-IDF (tf sublineal, filas de norma 1),
+    como tres arreglos paralelos (fila, columna, valor) ordenados por fila. Sin 'idf'
+    devuelve solo los conteos (tf sublineal), para calcular el idf al entrenar.
+    """
+    filas, columnas, valores = [], [], []
+    for i, item in enumerate(items):
+        conteo = _rasgos(item)
+        filas += [i] * len(conteo)
+        columnas += conteo.keys()
+        valores += conteo.values()
+    filas = np.asarray(filas, dtype=np.int64)
+    columnas = np.asarray(columnas, dtype=np.int64)
+    valores = 1.0 + np.log(np.asarray(valores, dtype=np.float32))
+    if idf is not None:
+        valores *= idf[columnas]
+        normas = np.sqrt(np.bincount(filas, weights=valores ** 2, minlength=len(items)))
+        valores /= normas[filas].astype(np.float32)
+    return filas, columnas, valores
+
+
+def _sumar_por_grupo(valores: np.ndarray, claves: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Suma las filas de 'valores' que comparten clave ('claves' ordenadas). Devuelve (claves únicas, sumas).
+    """
+    inicios = np.flatnonzero(np.r_[True, claves[1:] != claves[:-1]])
+    return claves[inicios], np.add.reduceat(valores, inicios, axis=0)
+
+
+class ModeloLocal:
+    """
+    Clasificador de texto liviano (solo NumPy, CPU) entrenado con el histórico verificado
+    de una empresa: n-gramas de caracteres hasheados con TF-IDF y una regresión logística
+    multinomial. Clasifica en microsegundos y devuelve la probabilidad de su respuesta, así
+    que solo se aceptan los ítems por encima de un umbral; el resto sigue a la IA.
+    """
+
+    def __init__(self, categorias: List[str], pesos: np.ndarray, sesgo: np.ndarray, idf: np.ndarray,
+                 version: str = None, metadatos: Dict = None):
+        self.categorias = categorias
+        self.pesos = pesos
+        self.sesgo = sesgo
+        self.idf = idf
+        self.version = version
+        self.metadatos = metadatos or {}
+        self.umbral = 0.9
+        self.consultas = 0
+        self.aciertos = 0
+
+    @classmethod
+    def entrenar(cls, items: List[Dict], etiquetas: List[str], iteraciones: int = 300, tasa: float = 0.1,
+                 regularizacion: float = 1e-4) -> "ModeloLocal":
+        """
+        Entrena con descenso por gradiente (Adam) sobre la entropía cruzada. Los pares
+        (proveedor, descripción, categoría) repetidos se usan una vez, pesados por su frecuencia.
+        """
+        pares = Counter(
+            (normalizar_texto(item.get("proveedor")), normalizar_texto(item.get("descripcion")), etiqueta)
+            for item, etiqueta in zip(items, etiquetas)
+        )
+        unicos = [{"proveedor": p, "descripcion": d} for p, d, _ in pares]
+        categorias = sorted({c for _, _, c in pares})
+        indice = {c: i for i, c in enumerate(categorias)}
+        y = np.array([indice[c] for _, _, c in pares])
+        frecuencias = np.array(list(pares.values()), dtype=np.float32)
+        frecuencias /= frecuencias.sum()
+
+        filas, columnas, valores = vectorizar(unicos)
+        documentos = np.bincount(columnas, minlength=DIMENSION)
+        idf = (np.log((1 + len(unicos)) / (1 + documentos)) + 1).astype(np.float32)
+        filas, columnas, valores = vectorizar(unicos, idf)
+        # Solo se optimizan las columnas que aparecen en el entrenamiento (el resto queda en 0)
+        usadas_total, columnas = np.unique(columnas, return_inverse=True)
+        orden = np.argsort(columnas, kind="stable")
+
+        k = len(categorias)
+        pesos = np.zeros((len(usadas_total), k), dtype=np.float32)
+        sesgo = np.zeros(k, dtype=np.float32)
+        objetivo = np.eye(k, dtype=np.float32)[y]
+        momentos = [np.zeros_like(pesos), np.zeros_like(pesos), np.zeros_like(sesgo), np.zeros_like(sesgo)]
+        for t in range(1, iteraciones + 1):
+            probabilidades = cls._softmax(_sumar_por_grupo(valores[:, None] * pesos[columnas], filas)[1] + sesgo)
+            error = (probabilidades - objetivo) * frecuencias[:, None]
+            gradiente = regularizacion * pesos
+            usadas, sumas = _sumar_por_grupo((valores[:, None] * error[filas])[orden], columnas[orden])
+            gradiente[usadas] += sumas
+            for parametro, g, m, v in ((pesos, gradiente, momentos[0], momentos[1]), (sesgo, error.sum(axis=0), momentos[2], momentos[3])):
+                m *= 0.9
+                m += 0.1 * g
+                v *= 0.999
+                v += 0.001 * g ** 2
+                parametro -= tasa * (m / (1 - 0.9 ** t)) / (np.sqrt(v / (1 - 0.999 ** t)) + 1e-8)
+
+        pesos_completos = np.zeros((DIMENSION, k), dtype=np.float32)
+        pesos_completos[usadas_total] = pesos
+        return cls(categorias, pesos_completos, sesgo, idf, metadatos={"ejemplos": len(items), "ejemplos_unicos": len(unicos)})
+
+    @staticmethod
+    def _softmax(logits: np.ndarray) -> np.ndarray:
+        logits = logits - logits.max(axis=1, keepdims=True)
+        exp = np.exp(logits)
+        return exp / exp.sum(axis=1, keepdims=True)
+
+    def predecir(self, items: List[Dict]) -> Tuple[List[str], np.ndarray]:
+        """
+        Returns:
+            (categoría más probable de cada ítem, su probabilidad)
+        """
+        if not items:
+            return [], np.zeros(0, dtype=np.float32)
+        filas, columnas, valores = vectorizar(items, self.idf)
+        logits = np.zeros((len(items), len(self.categorias)), dtype=np.float32)
+        presentes, sumas = _sumar_por_grupo(valores[:, None] * self.pesos[columnas], filas)
+        logits[presentes] = sumas
+        probabilidades = self._softmax(logits + self.sesgo)
+        mejores = probabilidades.argmax(axis=1)
+        return [self.categorias[i] for i in mejores], probabilidades[np.arange(len(items)), mejores]
+
+    def aplicar(self, items: List[Dict]) -> Tuple[List[Dict], List[Dict]]:
+        """
+        Returns:
+            (resultados con 'rowid' y 'categoria' de los ítems con probabilidad >= umbral, ítems pendientes)
+        """
+        categorias, probabilidades = self.predecir(items)
+        resueltos, pendientes = [], []
+        for item, categoria, probabilidad in zip(items, categorias, probabilidades):
+            if probabilidad >= self.umbral:
+                resueltos.append({"rowid": item["rowid"], "categoria": categoria})
+            else:
+                pendientes.append(item)
+        self.consultas += len(items)
+        self.aciertos += len(resueltos)
+        return resueltos, pendientes
+
+    def clasificar(self, items: List[Dict], clasificar_resto: Callable[[List[Dict]], List[Dict]]) -> List[Dict]:
+        """
+        Resuelve con el modelo lo que supere el umbral y clasifica el resto con 'clasificar_resto'.
+        Devuelve los resultados en el orden de 'items'.
+        """
+        resueltos, pendientes = self.aplicar(items)
+        self.reportar()
+        nuevos = clasificar_resto(pendientes) if pendientes else []
+        por_rowid = {r["rowid"]: r for r in resueltos + nuevos}
+        return [por_rowid[item["rowid"]] for item in items if item["rowid"] in por_rowid]
+
+    def reportar(self) -> None:
+        if self.consultas:
+            print(
+                f"🧮 Modelo local {self.version}: {self.aciertos}/{self.consultas} ítems "
+                f"({self.aciertos / self.consultas:.0%}) con probabilidad >= {self.umbral} clasificados sin IA."
+            )
+        self.consultas = self.aciertos = 0
+
+    def guardar(self, carpeta: str, activar: bool = True) -> str:
+        """
+        Guarda el modelo como una versión nueva (npz + json de metadatos) y, si 'activar',
+        la marca como la versión en uso. Devuelve el nombre de la versión.
+        """
+        os.makedirs(carpeta, exist_ok=True)
+        huella = hashlib.sha256(self.pesos.tobytes()).hexdigest()[:8]
+        self.version = f"{datetime.now():%Y%m%d_%H%M%S}_{huella}"
+        np.savez_compressed(os.path.join(carpeta, f"{self.version}.npz"), pesos=self.pesos, sesgo=self.sesgo, idf=self.idf)
+        self.metadatos.update(version=self.version, categorias=self.categorias, dimension=DIMENSION, creado=datetime.now().isoformat())
+        with open(os.path.join(carpeta, f"{self.version}.json"), "w", encoding="utf-8") as f:
+            json.dump(self.metadatos, f, ensure_ascii=False, indent=2)
+        if activar:
+            activar_version(carpeta, self.version)
+        return self.version
+
+    @classmethod
+    def cargar(cls, carpeta: str, version: str = None) -> Optional["ModeloLocal"]:
+        """
+        Carga la versión indicada o la activa de la carpeta (None si no hay ninguna).
+        """
+        if version is None:
+            ruta_actual = os.path.join(carpeta, "actual.json")
+            if not os.path.exists(ruta_actual):
+                return None
+            with open(ruta_actual, "r", encoding="utf-8") as f:
+                version = json.load(f)["version"]
+        with open(os.path.join(carpeta, f"{version}.json"), "r", encoding="utf-8") as f:
+            metadatos = json.load(f)
+        if metadatos.get("dimension") != DIMENSION:
+            print(f"⚠️ El modelo local {version} se entrenó con otros rasgos; hay que reentrenarlo.")
+            return None
+        arreglos = np.load(os.path.join(carpeta, f"{version}.npz"))
+        return cls(metadatos["categorias"], arreglos["pesos"], arreglos["sesgo"], arreglos["idf"], version, metadatos)
+
+
+def activar_version(carpeta: str, version: str) -> None:
+    """
+    Marca 'version' como la versión del modelo en uso (sirve para volver a una anterior).
+    """
+    with open(os.path.join(carpeta, "actual.json"), "w", encoding="utf-8") as f:
+        json.dump({"version": version, "activado": datetime.now().isoformat()}, f)
+
+
+def evaluar_modelo(modelo: ModeloLocal, items: List[Dict], etiquetas: List[str], umbrales=(0.5, 0.7, 0.8, 0.9, 0.95)) -> Dict:
+    """
+    Exactitud total y, para cada umbral, cobertura (ítems aceptados) y exactitud de los aceptados.
+    También mide la latencia de predicción por ítem.
+    """
+    inicio = time.perf_counter()
+    categorias, probabilidades = modelo.predecir(items)
+    segundos = time.perf_counter() - inicio
+    correctos = np.array([c == e for c, e in zip(categorias, etiquetas)])
+    por_umbral = []
+    for umbral in umbrales:
+        aceptados = probabilidades >= umbral
+        por_umbral.append({
+            "umbral": umbral,
+            "cobertura": float(aceptados.mean()) if len(items) else 0.0,
+            "exactitud": float(correctos[aceptados].mean()) if aceptados.any() else None
+        })
+    return {
+        "items": len(items),
+        "exactitud": float(correctos.mean()) if len(items) else None,
+        "microsegundos_por_item": segundos / len(items) * 1e6 if items else 0.0,
+        "por_umbral": por_umbral
+    }
+
+
+def entrenar_modelo_empresa(historico, empresa: str, carpeta: str = None, validacion: float = 0.2,
+                            activar: bool = True) -> ModeloLocal:
+    """
+    Entrena el modelo local de una empresa con su histórico verificado (DataFrame con
+    proveedor, descripcion y categoria). Si alcanzan los datos, primero lo evalúa dejando
+    afuera una parte de los pares únicos, y guarda esas métricas junto a la versión.
+    """
+    historico = historico.dropna(subset=["categoria"])
+    historico = historico[historico["categoria"].astype(str).str.strip() != ""]
+    items = historico[["proveedor", "descripcion"]].to_dict(orient="records")
+    etiquetas = historico["categoria"].astype(str).tolist()
+
+    metricas = None
+    claves = [(normalizar_texto(i.get("proveedor")), normalizar_texto(i.get("descripcion"))) for i in items]
+    unicas = sorted(set(claves))
+    if validacion and len(unicas) >= 50:
+        # Se separa por par único para que un ítem repetido no esté en ambos lados
+        azar = np.random.default_rng(0)
+        afuera = {unicas[i] for i in azar.choice(len(unicas), int(len(unicas) * validacion), replace=False)}
+        dentro = [i for i, clave in enumerate(claves) if clave not in afuera]
+        prueba = [i for i, clave in enumerate(claves) if clave in afuera]
+        parcial = ModeloLocal.entrenar([items[i] for i in dentro], [etiquetas[i] for i in dentro])
+        metricas = evaluar_modelo(parcial, [items[i] for i in prueba], [etiquetas[i] for i in prueba])
+
+    inicio = time.perf_counter()
+    modelo = ModeloLocal.entrenar(items, etiquetas)
+    modelo.metadatos.update(empresa=empresa, segundos_entrenamiento=time.perf_counter() - inicio, validacion=metricas)
+    version = modelo.guardar(carpeta or os.path.join(get_carpeta_modelos_locales(), empresa), activar=activar)
+    print(f"🧮 Modelo local de {empresa}: versión {version}, {len(items)} ejemplos ({modelo.metadatos['ejemplos_unicos']} únicos), "
+          f"{len(modelo.categorias)} categorías.")
+    if metricas:
+        print(f"   Validación: exactitud {metricas['exactitud']:.1%} sobre {metricas['items']} ítems; " + ", ".join(
+            f"umbral {u['umbral']}: cobertura {u['cobertura']:.0%}" + (f" exactitud {u['exactitud']:.1%}" if u["exactitud"] is not None else "")
+            for u in metricas["por_umbral"]
+        ))
+    _modelos.pop(empresa, None)
+    return modelo
+
+
+def obtener_modelo_local(empresa: str) -> Optional[ModeloLocal]:
+    """
+    Devuelve el modelo local activo de la empresa con su umbral configurado (None si está
+    desactivado o todavía no se entrenó).
+    """
+    if not empresa or not get_modelo_local():
+        return None
+    if empresa not in _modelos:
+        _modelos[empresa] = ModeloLocal.cargar(os.path.join(get_carpeta_modelos_locales(), empresa))
+        if _modelos[empresa] is None:
+            print(f"ℹ️ No hay modelo local entrenado para {empresa} (python -m backend.scripts.entrenar_modelo_local --empresa {empresa}).")
+    modelo = _modelos[empresa]
+    if modelo is not None:
+        modelo.umbral = get_umbral_modelo_local(empresa)
+    return modelo
@@ -1,6 +1,57 @@
+import gc
+import multiprocessing
+import numpy as np
 import pandas as pd
-import re
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
 from difflib import SequenceMatcher
+from functools import lru_cache
+from typing import Dict, List, Tuple
+
+from backend.config import get_motor_red_de_pescadores, get_umbral_proveedor_red, get_workers_red
+from backend.etl.indice_trigramas import IndiceTrigramas, similitud as similitud_texto
+
+UMBRAL_SIMILITUD = 0.70
+# Con menos ítems distintos que esto, repartir entre procesos cuesta más de lo que ahorra
+MINIMO_PARALELO = 500
+# Dice mínimo de trigramas para que una descripción sea candidata: en el histórico de data/
+# ningún par con SequenceMatcher >= 0.70 queda por debajo de 0.19
+DICE_MINIMO = 0.2
+
+_ACENTOS = {
+    **dict.fromkeys("áàäâ", "a"), **dict.fromkeys("éèëê", "e"), **dict.fromkeys("íìïî", "i"),
+    **dict.fromkeys("óòöô", "o"), **dict.fromkeys("úùüû", "u")
+}
+
+
+class _TablaNormalizacion(dict):
+    """
+    Tabla para str.translate que se completa a medida que aparecen caracteres: las vocales
+    con tilde pasan a su letra, a-z y 0-9 quedan, cualquier espacio pasa a ' ' y el resto se elimina.
+    """
+
+    def __missing__(self, codigo: int):
+        caracter = chr(codigo)
+        if caracter in _ACENTOS:
+            reemplazo = _ACENTOS[caracter]
+        elif "a" <= caracter <= "z" or "0" <= caracter <= "9":
+            reemplazo = caracter
+        elif caracter.isspace():
+            reemplazo = " "
+        else:
+            reemplazo = None
+        self[codigo] = reemplazo
+        return reemplazo
+
+
+_TABLA_NORMALIZACION = _TablaNormalizacion()
+
+
+@lru_cache(maxsize=65536)
+def _normalizar_cadena(texto: str) -> str:
+    return " ".join(texto.lower().translate(_TABLA_NORMALIZACION).split())
+
 
 def normalizar_texto(texto: str) -> str:
     """
@@ -8,18 +59,22 @@ def normalizar_texto(texto: str) -> str:
     - Convierte a minúsculas
     - Elimina tildes y caracteres especiales
     - Elimina espacios redundantes
+    Usa una tabla de traducción en lugar de expresiones regulares y recuerda los textos
+    ya normalizados (los proveedores se repiten en casi todos los ítems).
     """
     if not isinstance(texto, str):
         return ''
-    texto = texto.lower()
-    texto = re.sub(r'[áàäâ]', 'a', texto)
-    texto = re.sub(r'[éèëê]', 'e', texto)
-    texto = re.sub(r'[íìïî]', 'i', texto)
-    texto = re.sub(r'[óòöô]', 'o', texto)
-    texto = re.sub(r'[úùüû]', 'u', texto)
-    texto = re.sub(r'[^a-z0-9\s]', '', texto)
-    texto = re.sub(r'\s+', ' ', texto).strip()
-    return texto
+    return _normalizar_cadena(texto)
+
+
+def normalizar_serie(serie: pd.Series) -> pd.Series:
+    """
+    normalizar_texto sobre una columna entera: normaliza cada valor distinto una sola vez.
+    """
+    codigos, unicos = pd.factorize(serie)
+    normalizados = np.array([normalizar_texto(valor) for valor in unicos] + [""], dtype=object)
+    # Los nulos tienen código -1, que apunta al "" del final
+    return pd.Series(normalizados[codigos], index=serie.index, name=serie.name)
 
 def es_similar(a: str, b: str, umbral: float = 0.9) -> bool:
     """
@@ -38,6 +93,10 @@ def preparar_historico_para_red(df_historico: pd.DataFrame) -> pd.DataFrame:
         print("⚠️ El histórico está vacío")
         return pd.DataFrame(columns=["proveedor", "descripcion", "categoria", "proveedor_norm", "descripcion_norm"])
 
+    if {"proveedor_norm", "descripcion_norm"}.issubset(df_historico.columns):
+        # Ya viene preparado (p. ej. del histórico local): no se vuelve a normalizar
+        return df_historico[df_historico["verificado"] == True] if "verificado" in df_historico.columns else df_historico
+
     df = df_historico.copy()
     
     # Si no existe la columna verificado, asumimos que todos los registros están verificados
@@ -51,44 +110,331 @@ def preparar_historico_para_red(df_historico: pd.DataFrame) -> pd.DataFrame:
         print("⚠️ No hay registros verificados en el histórico")
         return pd.DataFrame(columns=["proveedor", "descripcion", "categoria", "proveedor_norm", "descripcion_norm"])
 
-    df["proveedor_norm"] = df["proveedor"].apply(normalizar_texto)
-    df["descripcion_norm"] = df["descripcion"].apply(normalizar_texto)
+    df["proveedor_norm"] = normalizar_serie(df["proveedor"])
+    df["descripcion_norm"] = normalizar_serie(df["descripcion"])
 
     return df
 
 
+def _posicion_mejor(similitudes: np.ndarray) -> int:
+    """
+    Posición de la mejor similitud con el mismo desempate que
+    sort_values("similitud", ascending=False).iloc[0] (quicksort de pandas en orden descendente).
+    """
+    posiciones = np.arange(len(similitudes))[::-1]
+    orden = posiciones[similitudes[::-1].argsort(kind="quicksort")]
+    return int(orden[-1])
+
+
+class GrupoProveedor:
+    """
+    Histórico verificado de un proveedor: las descripciones únicas (para calcular cada
+    similitud una sola vez), el código de descripción y la categoría de cada fila en el
+    orden del histórico, y un diccionario descripción → categoría para el camino exacto.
+    """
+
+    def __init__(self, descripciones: list, categorias: list):
+        self.codigos, self.unicas = pd.factorize(pd.Series(descripciones, dtype=object))
+        # None y NaN como la misma categoría vacía; None queda libre para "sin coincidencia"
+        categorias = [np.nan if pd.isna(c) else c for c in categorias]
+        self.categorias = np.asarray(categorias, dtype=object)
+        exactas: Dict[str, object] = {}
+        ambiguas = set()
+        for descripcion, categoria in zip(descripciones, categorias):
+            anterior = exactas.setdefault(descripcion, categoria)
+            if not _misma_categoria(anterior, categoria):
+                ambiguas.add(descripcion)
+        # Las descripciones con más de una categoría no toman el camino exacto
+        self.exactas = {d: c for d, c in exactas.items() if d not in ambiguas}
+
+    def buscar(self, descripcion_n: str, umbral: float = UMBRAL_SIMILITUD):
+        """
+        Categoría de la fila más parecida con similitud >= umbral, o None si no hay ninguna.
+        """
+        if descripcion_n in self.exactas:
+            # Similitud 1.0 solo con la misma descripción, y todas esas filas dicen lo mismo
+            return self.exactas[descripcion_n]
+        similitudes = np.array([SequenceMatcher(None, x, descripcion_n).ratio() for x in self.unicas])[self.codigos]
+        posibles = similitudes >= umbral
+        if not posibles.any():
+            return None
+        return self.categorias[posibles][_posicion_mejor(similitudes[posibles])]
+
+
+def _misma_categoria(a, b) -> bool:
+    return a == b or (pd.isna(a) and pd.isna(b))
+
+
+class IndiceHistorico:
+    """
+    Índice del histórico verificado por proveedor normalizado, para no recorrer todo el
+    histórico por cada ítem nuevo.
+    """
+
+    def __init__(self, historico: pd.DataFrame):
+        self.grupos: Dict[str, GrupoProveedor] = {}
+        # Siempre 0: este índice no busca en otros proveedores (mismo contador que el de trigramas)
+        self.por_proveedor_parecido = 0
+        if historico.empty:
+            return
+        for proveedor_n, filas in historico.groupby("proveedor_norm", sort=False).indices.items():
+            self.grupos[proveedor_n] = GrupoProveedor(
+                historico["descripcion_norm"].iloc[filas].tolist(), historico["categoria"].iloc[filas].tolist()
+            )
+
+    def buscar(self, proveedor_n: str, descripcion_n: str, ruc: str = "", umbral: float = UMBRAL_SIMILITUD):
+        """
+        Categoría para el ítem, o None. Solo busca en el mismo proveedor ('ruc' no se usa).
+        """
+        grupo = self.grupos.get(proveedor_n)
+        return grupo.buscar(descripcion_n, umbral) if grupo is not None else None
+
+    def reportar(self) -> None:
+        pass
+
+
+def _clave_ruc(valor) -> str:
+    if isinstance(valor, str):
+        return valor.strip()
+    if isinstance(valor, (int, float, np.integer, np.floating)) and not pd.isna(valor):
+        return str(int(valor))
+    return ""
+
+
+def _categoria_mas_frecuente(categorias: list):
+    # A igual frecuencia gana la que aparece primero en el histórico
+    categoria = Counter(None if pd.isna(c) else c for c in categorias).most_common(1)[0][0]
+    return np.nan if categoria is None else categoria
+
+
+class IndiceHistoricoTrigramas:
+    """
+    Índice difuso del histórico verificado: las descripciones únicas de cada proveedor
+    (con su categoría más frecuente) en un índice de trigramas, contiguas por proveedor.
+    Para un ítem busca primero la misma descripción, después la más parecida del mismo
+    proveedor (similitud por subsecuencia común más larga, misma escala y umbral que
+    SequenceMatcher) y, si no hay, en los proveedores con el mismo RUC o con nombre
+    parecido (similitud >= umbral_proveedor), para cuando el nombre viene escrito distinto.
+    """
+
+    def __init__(self, historico: pd.DataFrame, umbral_proveedor: float = None, buscar_parecidos: bool = True):
+        self.umbral_proveedor = get_umbral_proveedor_red() if umbral_proveedor is None else umbral_proveedor
+        self.buscar_parecidos = buscar_parecidos
+        categorias_por_clave: Dict[str, Dict[str, list]] = {}
+        proveedores_por_ruc: Dict[str, List[str]] = {}
+        if not historico.empty:
+            rucs = historico["ruc"].tolist() if "ruc" in historico.columns else [""] * len(historico)
+            for proveedor_n, descripcion_n, categoria, ruc in zip(
+                historico["proveedor_norm"], historico["descripcion_norm"], historico["categoria"], rucs
+            ):
+                categorias_por_clave.setdefault(proveedor_n, {}).setdefault(descripcion_n, []).append(categoria)
+                ruc = _clave_ruc(ruc)
+                if ruc and proveedor_n not in proveedores_por_ruc.setdefault(ruc, []):
+                    proveedores_por_ruc[ruc].append(proveedor_n)
+
+        self.rangos: Dict[str, Tuple[int, int]] = {}
+        self.exactas: Dict[Tuple[str, str], int] = {}
+        descripciones, self.categorias = [], []
+        for proveedor_n, por_descripcion in categorias_por_clave.items():
+            desde = len(descripciones)
+            for descripcion_n, categorias in por_descripcion.items():
+                self.exactas[(proveedor_n, descripcion_n)] = len(descripciones)
+                descripciones.append(descripcion_n)
+                self.categorias.append(_categoria_mas_frecuente(categorias))
+            self.rangos[proveedor_n] = (desde, len(descripciones))
+        self.descripciones = IndiceTrigramas(descripciones)
+        self.nombres_proveedores = list(self.rangos)
+        self.proveedores = IndiceTrigramas(self.nombres_proveedores)
+        self.proveedores_por_ruc = proveedores_por_ruc
+        self.por_proveedor_parecido = 0
+
+    def proveedores_parecidos(self, proveedor_n: str, ruc: str = "") -> List[str]:
+        """
+        Otros proveedores del histórico que probablemente sean el mismo: primero los del
+        mismo RUC y después los de nombre parecido, de más a menos parecido.
+        """
+        parecidos = [p for p in self.proveedores_por_ruc.get(ruc, []) if p != proveedor_n] if ruc else []
+        posiciones, _ = self.proveedores.candidatos(proveedor_n, dice_minimo=DICE_MINIMO)
+        por_nombre = []
+        for posicion in posiciones.tolist():
+            nombre = self.nombres_proveedores[posicion]
+            valor = similitud_texto(nombre, proveedor_n)
+            if nombre != proveedor_n and valor >= self.umbral_proveedor and nombre not in parecidos:
+                por_nombre.append((-valor, posicion, nombre))
+        return parecidos + [nombre for _, _, nombre in sorted(por_nombre)]
+
+    def _buscar_en(self, proveedor_n: str, descripcion_n: str, umbral: float) -> Tuple[int, float]:
+        rango = self.rangos.get(proveedor_n)
+        if rango is None:
+            return -1, 0.0
+        exacta = self.exactas.get((proveedor_n, descripcion_n))
+        if exacta is not None:
+            return exacta, 1.0
+        return self.descripciones.mas_parecido(descripcion_n, umbral, rango[0], rango[1], DICE_MINIMO)
+
+    def buscar(self, proveedor_n: str, descripcion_n: str, ruc: str = "", umbral: float = UMBRAL_SIMILITUD):
+        """
+        Categoría para el ítem, o None si ni su proveedor ni uno parecido tienen una descripción parecida.
+        """
+        posicion, _ = self._buscar_en(proveedor_n, descripcion_n, umbral)
+        if posicion < 0 and self.buscar_parecidos:
+            mejor_similitud = 0.0
+            for parecido in self.proveedores_parecidos(proveedor_n, ruc):
+                candidata, valor = self._buscar_en(parecido, descripcion_n, umbral)
+                if candidata >= 0 and valor > mejor_similitud:
+                    posicion, mejor_similitud = candidata, valor
+            if posicion >= 0:
+                self.por_proveedor_parecido += 1
+        return self.categorias[posicion] if posicion >= 0 else None
+
+    def reportar(self) -> None:
+        if self.por_proveedor_parecido:
+            print(f"🔤 Reconocidos por un proveedor con el mismo RUC o nombre parecido: {self.por_proveedor_parecido}")
+        self.por_proveedor_parecido = 0
+
+
+def crear_indice_historico(historico: pd.DataFrame, motor: str = None):
+    """
+    Índice del histórico preparado según el motor: "secuencia" (SequenceMatcher dentro del
+    mismo proveedor, el comportamiento original) o "trigramas" (índice difuso con respaldo
+    por proveedores parecidos).
+    """
+    motor = motor or get_motor_red_de_pescadores()
+    if motor == "trigramas":
+        return IndiceHistoricoTrigramas(historico)
+    if motor != "secuencia":
+        raise ValueError(f"Motor de red de pescadores desconocido: {motor}")
+    return IndiceHistorico(historico)
+
+
+def _normalizar_columna(df: pd.DataFrame, columna: str) -> list:
+    if columna not in df.columns:
+        return [""] * len(df)
+    return normalizar_serie(df[columna]).tolist()
+
+
+# Índice de la corrida en curso, visible para los procesos del pool (heredado con fork)
+_indice_trabajador = None
+
+
+def _iniciar_trabajador(indice) -> None:
+    global _indice_trabajador
+    _indice_trabajador = indice
+
+
+def _buscar_fragmento(claves: List[Tuple[str, str, str]]) -> Tuple[list, int]:
+    """
+    Busca un fragmento de claves (proveedor, descripción, RUC) en el índice del proceso.
+
+    Returns:
+        (categorías en el orden de 'claves', cuántas se reconocieron por un proveedor parecido)
+    """
+    antes = _indice_trabajador.por_proveedor_parecido
+    encontradas = [_indice_trabajador.buscar(proveedor_n, descripcion_n, ruc) for proveedor_n, descripcion_n, ruc in claves]
+    return encontradas, _indice_trabajador.por_proveedor_parecido - antes
+
+
+def repartir_por_proveedor(claves: List[Tuple[str, str, str]], partes: int) -> List[List[int]]:
+    """
+    Reparte las posiciones de 'claves' en hasta 'partes' fragmentos sin partir ningún
+    proveedor (así cada proceso usa solo sus grupos del índice), equilibrando la cantidad
+    de ítems: los proveedores van del más grande al más chico al fragmento menos cargado.
+    El reparto depende solo de las claves, así que es el mismo en cada corrida.
+    """
+    por_proveedor: Dict[str, List[int]] = {}
+    for posicion, (proveedor_n, _, _) in enumerate(claves):
+        por_proveedor.setdefault(proveedor_n, []).append(posicion)
+    fragmentos = [[] for _ in range(partes)]
+    cargas = [0] * partes
+    for _, posiciones in sorted(por_proveedor.items(), key=lambda par: (-len(par[1]), par[0])):
+        menor = cargas.index(min(cargas))
+        fragmentos[menor] += posiciones
+        cargas[menor] += len(posiciones)
+    return [fragmento for fragmento in fragmentos if fragmento]
+
+
+def _buscar_en_paralelo(indice, claves: List[Tuple[str, str, str]], workers: int) -> list:
+    """
+    Busca las claves repartidas por proveedor en un ProcessPoolExecutor. Con fork (Linux)
+    los procesos heredan el índice ya armado sin copiarlo (copy-on-write; gc.freeze evita
+    que el recolector toque sus objetos y fuerce las copias); donde no hay fork (Windows)
+    cada proceso recibe una copia al iniciar, no una por fragmento.
+    """
+    global _indice_trabajador
+    fragmentos = repartir_por_proveedor(claves, workers * 4)
+    if "fork" in multiprocessing.get_all_start_methods():
+        _indice_trabajador = indice
+        opciones = {"mp_context": multiprocessing.get_context("fork")}
+    else:
+        opciones = {"initializer": _iniciar_trabajador, "initargs": (indice,)}
+    gc.freeze()
+    try:
+        with ProcessPoolExecutor(max_workers=workers, **opciones) as executor:
+            resultados = list(executor.map(_buscar_fragmento, [[claves[i] for i in fragmento] for fragmento in fragmentos]))
+    finally:
+        gc.unfreeze()
+        _indice_trabajador = None
+
+    encontradas = [None] * len(claves)
+    for fragmento, (categorias, por_parecido) in zip(fragmentos, resultados):
+        for posicion, categoria in zip(fragmento, categorias):
+            encontradas[posicion] = categoria
+        indice.por_proveedor_parecido += por_parecido
+    return encontradas
+
+
+def emparejar_con_historico(df_nuevos: pd.DataFrame, historico: pd.DataFrame, motor: str = None, indice=None,
+                            workers: int = None) -> pd.DataFrame:
+    """
+    Busca cada ítem nuevo en el histórico ya preparado y devuelve los ítems con 'categoria'
+    (la del histórico si hubo coincidencia) y 'verificado', como columnas alineadas.
+    El motor de búsqueda sale de MOTOR_RED_DE_PESCADORES si no se indica; con 'indice'
+    se usa uno ya armado (de crear_indice_historico) en lugar de armarlo con 'historico'.
+    Cada combinación distinta de proveedor, descripción y RUC se busca una sola vez; con
+    workers > 1 (WORKERS_RED) y al menos MINIMO_PARALELO combinaciones, la búsqueda se
+    reparte por proveedor entre procesos. El resultado es el mismo con cualquier cantidad de workers.
+    """
+    indice = indice if indice is not None else crear_indice_historico(historico, motor)
+    rucs = [_clave_ruc(ruc) for ruc in df_nuevos["ruc"]] if "ruc" in df_nuevos.columns else [""] * len(df_nuevos)
+    claves = list(zip(_normalizar_columna(df_nuevos, "proveedor"), _normalizar_columna(df_nuevos, "descripcion"), rucs))
+    distintas = list(dict.fromkeys(claves))
+
+    workers = get_workers_red() if workers is None else workers
+    if workers > 1 and len(distintas) >= MINIMO_PARALELO:
+        inicio = time.perf_counter()
+        categorias = _buscar_en_paralelo(indice, distintas, workers)
+        print(f"⏱️ {len(distintas)} ítems distintos buscados en {time.perf_counter() - inicio:.2f}s con {workers} workers.")
+    else:
+        categorias = [indice.buscar(proveedor_n, descripcion_n, ruc) for proveedor_n, descripcion_n, ruc in distintas]
+    por_clave = dict(zip(distintas, categorias))
+    encontradas = [por_clave[clave] for clave in claves]
+    indice.reportar()
+    verificados = np.array([categoria is not None for categoria in encontradas], dtype=bool)
+
+    df_resultado = df_nuevos.copy()
+    if verificados.any():
+        tenia_categoria = "categoria" in df_resultado.columns
+        categorias = df_resultado["categoria"].to_numpy(dtype=object, copy=True) if tenia_categoria else np.full(len(df_resultado), np.nan, dtype=object)
+        categorias[verificados] = [c for c, v in zip(encontradas, verificados) if v]
+        df_resultado["categoria"] = pd.Series(categorias, index=df_resultado.index).infer_objects()
+        if not tenia_categoria and not verificados[0]:
+            # Como al armar el DataFrame fila por fila: la columna nueva queda después de 'verificado'
+            df_resultado["verificado"] = verificados
+            return df_resultado[[c for c in df_resultado.columns if c != "categoria"] + ["categoria"]]
+    df_resultado["verificado"] = verificados
+    return df_resultado
+
+
 def aplicar_red_de_pescadores(df_nuevos: pd.DataFrame, historico_completo: pd.DataFrame) -> pd.DataFrame:
     """
-    Asigna categorías desde el histórico a nuevos registros si son suficientemente similares.
+    Asigna categorías desde el histórico a nuevos registros si son suficientemente similares
+    (misma descripción, o similitud >= UMBRAL_SIMILITUD con una del mismo proveedor).
     Los categorizados automáticamente se marcan como verificado = True.
     """
     print("🎣 Aplicando red de pescadores...")
 
     historico = preparar_historico_para_red(historico_completo)
-    resultados = []
-
-    for _, row in df_nuevos.iterrows():
-        proveedor_n = normalizar_texto(row.get("proveedor", ""))
-        descripcion_n = normalizar_texto(row.get("descripcion", ""))
-
-        posibles = historico[historico["proveedor_norm"] == proveedor_n].copy()
-        posibles["similitud"] = posibles["descripcion_norm"].apply(
-            lambda x: SequenceMatcher(None, x, descripcion_n).ratio()
-        )
-        posibles = posibles[posibles["similitud"] >= 0.70]
-
-        if not posibles.empty:
-            mejor = posibles.sort_values("similitud", ascending=False).iloc[0]
-            row["categoria"] = mejor["categoria"]
-            # row["origen"] = "por_historial"
-            row["verificado"] = True
-        else:
-            # row["origen"] = "nueva"
-            row["verificado"] = False
-
-        resultados.append(row)
-
-    df_resultado = pd.DataFrame(resultados)
+    df_resultado = emparejar_con_historico(df_nuevos, historico)
 
     df_verificados = df_resultado[df_resultado["verificado"] == True].copy()
     df_no_verificados = df_resultado[df_resultado["verificado"] == False].copy()
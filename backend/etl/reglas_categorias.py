@@ -0,0 +1,162 @@
+# etl/reglas_categorias.py
+import json
+import os
+from collections import Counter, deque
+from typing import Callable, Dict, List, Optional, Tuple
+
+from backend.etl.red_de_pescadores import normalizar_texto
+
+RUTA_TAXONOMIA = os.path.join(os.path.dirname(__file__), "taxonomia_categorias.json")
+
+
+def cargar_taxonomia(ruta: str = RUTA_TAXONOMIA) -> List[Dict]:
+    """
+    Lee la taxonomía de categorías: una entrada por categoría con su línea del prompt y sus reglas.
+    """
+    with open(ruta, "r", encoding="utf-8") as f:
+        return json.load(f)["categorias"]
+
+
+class AutomataAhoCorasick:
+    """
+    Autómata de Aho-Corasick: encuentra todas las apariciones de muchos patrones en un
+    texto con una sola pasada, sin importar cuántos patrones haya.
+    """
+
+    def __init__(self, patrones: List[str]):
+        self.transiciones: List[Dict[str, int]] = [{}]
+        self.fallos: List[int] = [0]
+        self.salidas: List[List[str]] = [[]]
+        for patron in patrones:
+            self._agregar(patron)
+        self._enlazar_fallos()
+
+    def _agregar(self, patron: str) -> None:
+        estado = 0
+        for caracter in patron:
+            siguiente = self.transiciones[estado].get(caracter)
+            if siguiente is None:
+                siguiente = len(self.transiciones)
+                self.transiciones[estado][caracter] = siguiente
+                self.transiciones.append({})
+                self.fallos.append(0)
+                self.salidas.append([])
+            estado = siguiente
+        self.salidas[estado].append(patron)
+
+    def _enlazar_fallos(self) -> None:
+        # Recorrido a lo ancho: el fallo de cada estado es el sufijo propio más largo que también es prefijo
+        cola = deque(self.transiciones[0].values())
+        while cola:
+            estado = cola.popleft()
+            for caracter, siguiente in self.transiciones[estado].items():
+                cola.append(siguiente)
+                fallo = self.fallos[estado]
+                while fallo and caracter not in self.transiciones[fallo]:
+                    fallo = self.fallos[fallo]
+                self.fallos[siguiente] = self.transiciones[fallo].get(caracter, 0)
+                self.salidas[siguiente] += self.salidas[self.fallos[siguiente]]
+
+    def buscar(self, texto: str) -> List[str]:
+        """
+        Devuelve los patrones que aparecen en 'texto' (uno por aparición).
+        """
+        encontrados = []
+        estado = 0
+        for caracter in texto:
+            while estado and caracter not in self.transiciones[estado]:
+                estado = self.fallos[estado]
+            estado = self.transiciones[estado].get(caracter, 0)
+            if self.salidas[estado]:
+                encontrados += self.salidas[estado]
+        return encontrados
+
+
+class ReglasCategorias:
+    """
+    Pre-clasificador determinístico: compila las reglas de la taxonomía (palabras clave por
+    categoría) en un autómata de Aho-Corasick y busca en el proveedor + descripción
+    normalizados. Las reglas solo cuentan como palabras completas. Un ítem se clasifica sin
+    IA cuando todas las reglas que coinciden apuntan a la misma categoría; si no coincide
+    ninguna, o coinciden reglas de categorías distintas, se manda a la IA.
+    """
+
+    def __init__(self, taxonomia: List[Dict] = None):
+        self.categoria_de_regla: Dict[str, str] = {}
+        for entrada in taxonomia if taxonomia is not None else cargar_taxonomia():
+            for regla in entrada.get("reglas", []):
+                regla = normalizar_texto(regla)
+                if regla:
+                    self.categoria_de_regla[regla] = entrada["categoria"]
+        # Los espacios alrededor hacen que solo coincidan palabras completas
+        self.automata = AutomataAhoCorasick([f" {regla} " for regla in self.categoria_de_regla])
+        self.consultas = 0
+        self.aciertos = 0
+        self.ambiguos = 0
+        self.aciertos_por_regla: Counter = Counter()
+
+    def categoria(self, item: Dict) -> Optional[str]:
+        """
+        Categoría del ítem según las reglas, o None si no hay reglas o son ambiguas.
+        """
+        texto = f" {normalizar_texto(item.get('proveedor'))} {normalizar_texto(item.get('descripcion'))} "
+        reglas = {patron.strip() for patron in self.automata.buscar(texto)}
+        categorias = {self.categoria_de_regla[regla] for regla in reglas}
+        self.consultas += 1
+        if len(categorias) > 1:
+            self.ambiguos += 1
+        if len(categorias) != 1:
+            return None
+        self.aciertos += 1
+        self.aciertos_por_regla.update(reglas)
+        return categorias.pop()
+
+    def aplicar(self, items: List[Dict]) -> Tuple[List[Dict], List[Dict]]:
+        """
+        Returns:
+            (resultados con 'rowid' y 'categoria' de los ítems resueltos por reglas, ítems pendientes)
+        """
+        resueltos, pendientes = [], []
+        for item in items:
+            categoria = self.categoria(item)
+            if categoria is None:
+                pendientes.append(item)
+            else:
+                resueltos.append({"rowid": item["rowid"], "categoria": categoria})
+        return resueltos, pendientes
+
+    def clasificar(self, items: List[Dict], clasificar_resto: Callable[[List[Dict]], List[Dict]]) -> List[Dict]:
+        """
+        Resuelve con reglas lo que se pueda y clasifica el resto con 'clasificar_resto'.
+        Devuelve los resultados en el orden de 'items' e informa la tasa de aciertos.
+        """
+        resueltos, pendientes = self.aplicar(items)
+        self.reportar()
+        nuevos = clasificar_resto(pendientes) if pendientes else []
+        por_rowid = {r["rowid"]: r for r in resueltos + nuevos}
+        return [por_rowid[item["rowid"]] for item in items if item["rowid"] in por_rowid]
+
+    def estadisticas(self) -> Dict:
+        return {
+            "consultas": self.consultas,
+            "aciertos": self.aciertos,
+            "ambiguos": self.ambiguos,
+            "tasa_aciertos": self.aciertos / self.consultas if self.consultas else 0.0,
+            "reglas_mas_usadas": self.aciertos_por_regla.most_common(5)
+        }
+
+    def reportar(self) -> Dict:
+        """
+        Imprime las estadísticas acumuladas de la corrida y reinicia los contadores.
+        """
+        stats = self.estadisticas()
+        if stats["aciertos"] or stats["ambiguos"]:
+            mas_usadas = ", ".join(f"{regla} ({n})" for regla, n in stats["reglas_mas_usadas"])
+            print(
+                f"📏 Reglas de categorías: {stats['aciertos']}/{stats['consultas']} ítems ({stats['tasa_aciertos']:.0%}) "
+                f"clasificados sin IA, {stats['ambiguos']} ambiguos enviados a la IA."
+                + (f" Más usadas: {mas_usadas}." if mas_usadas else "")
+            )
+        self.consultas = self.aciertos = self.ambiguos = 0
+        self.aciertos_por_regla = Counter()
+        return stats
@@ -108,12 +108,17 @@ def crear_tabla_si_no_existe(df: pd.DataFrame, nombre_tabla: str):
         conn.close()
 
 
-def subir_dataframe(df: pd.DataFrame, tabla_nombre: str) -> None:
+def subir_dataframe(df: pd.DataFrame, tabla_nombre: str, manifiesto=None) -> None:
     """
     Sube un DataFrame a Supabase. La tabla se nombra como {empresa}_{año}.
     Si no existe, se crea automáticamente. Si ya existe, se agrega la información.
     Muestra advertencia si ya existen registros del mismo mes y año.
+    Con un manifiesto (ManifiestoCFE), omite las filas de CFE ya subidos y marca como
+    subidos los CFE cuyas filas llegaron completas.
     """
+    if manifiesto is not None:
+        df = manifiesto.descartar_filas_subidas(df)
+
     print(f"⬆️ Subiendo {len(df)} ítems a Supabase...")
 
     if df.empty:
@@ -157,11 +162,13 @@ def subir_dataframe(df: pd.DataFrame, tabla_nombre: str) -> None:
     except Exception as e:
         print(f"ℹ️ No se pudo verificar existencia previa en {tabla_nombre}: {e}")
 
-    # Convertir fechas a string y manejar valores nulos
+    # Convertir fechas a string y manejar valores nulos (las categóricas pasan a texto plano)
+    df = df.astype({col: "object" for col in df.select_dtypes("category").columns})
     df["fecha"] = df["fecha"].dt.strftime("%Y-%m-%d")
     df = df.where(pd.notnull(df), None)
 
     # Subir en bloques de 100
+    subidas = len(df)
     for i in range(0, len(df), 100):
         bloque = df.iloc[i:i+100].to_dict(orient="records")
         try:
@@ -173,12 +180,45 @@ def subir_dataframe(df: pd.DataFrame, tabla_nombre: str) -> None:
             for fila in bloque:
                 print(fila)
             pd.DataFrame(bloque).to_csv(f"bloque_error_{i//100}.csv", index=False)
+            subidas = i
             break
 
-def obtener_historico(empresa: str, años: list[int]) -> pd.DataFrame:
+    if manifiesto is not None and "archivo" in df.columns:
+        manifiesto.marcar_filas_subidas(df["archivo"].tolist(), subidas)
+
+# PostgREST devuelve como mucho 1000 filas por pedido
+TAMANO_PAGINA = 1000
+# Códigos de PostgREST/Postgres para una tabla que no existe (p. ej. un año sin datos todavía)
+CODIGOS_TABLA_INEXISTENTE = ("42P01", "PGRST205")
+
+
+def _descargar_paginado(armar_consulta, tamano_pagina: int = TAMANO_PAGINA) -> list:
+    """
+    Trae todas las filas de una consulta de a páginas de 'tamano_pagina', ordenadas por id
+    para que las páginas no se salteen ni repitan filas. 'armar_consulta' devuelve la
+    consulta sin paginar (se arma una nueva por página). Termina con la primera página incompleta.
+    """
+    filas = []
+    while True:
+        pagina = armar_consulta().order("id").range(len(filas), len(filas) + tamano_pagina - 1).execute().data or []
+        filas += pagina
+        if len(pagina) < tamano_pagina:
+            return filas
+
+
+def _tabla_inexistente(error: Exception) -> bool:
+    return getattr(error, "code", None) in CODIGOS_TABLA_INEXISTENTE
+
+
+def obtener_historico(empresa: str, años: list[int], id_desde: dict = None,
+                      columnas: str = "proveedor, descripcion, categoria, verificado", estricto: bool = False) -> pd.DataFrame:
     """
     Descarga datos históricos verificados desde Supabase para aplicar la red de pescadores.
     Devuelve un DataFrame con proveedor, descripción, categoría y año.
+    Con 'id_desde' ({año: id}) solo trae, de esos años, las filas con id mayor (para
+    refrescar el histórico local sin bajar todo de nuevo). Las filas vienen ordenadas por id
+    dentro de cada año. Con 'estricto', un error al consultar una tabla se propaga en lugar
+    de saltear la tabla (las tablas que no existen se siguen salteando).
     """
     print("🧠 Descargando histórico desde Supabase...")
     
@@ -188,17 +228,23 @@ def obtener_historico(empresa: str, años: list[int]) -> pd.DataFrame:
         tabla = f"{empresa}_{año}"
         print(f"🔎 Consultando tabla {tabla}...")
 
+        def armar_consulta():
+            consulta = supabase.table(tabla) \
+                .select(columnas) \
+                .eq("verificado", True)
+            if id_desde and año in id_desde:
+                consulta = consulta.gt("id", id_desde[año])
+            return consulta
+
         try:
-            res = supabase.table(tabla) \
-                .select("proveedor, descripcion, categoria, verificado") \
-                .eq("verificado", True) \
-                .execute()
-            datos = res.data
+            datos = _descargar_paginado(armar_consulta)
             if datos:
                 df = pd.DataFrame(datos)
                 df["año"] = año
                 frames.append(df)
         except Exception as e:
+            if estricto and not _tabla_inexistente(e):
+                raise
             print(f"⚠️ No se pudo consultar la tabla {tabla}: {e}")
     
     if frames:
@@ -210,3 +256,24 @@ def obtener_historico(empresa: str, años: list[int]) -> pd.DataFrame:
         return pd.DataFrame()
 
 
+def obtener_cambios_historico(empresa: str, años: list[int], columna: str, desde: str, columnas: str,
+                              estricto: bool = False) -> pd.DataFrame:
+    """
+    Filas (verificadas o no) cuya columna de fecha de modificación 'columna' es >= 'desde',
+    para actualizar en el histórico local las que cambiaron de categoría o de verificado.
+    Con 'estricto', un error al consultar una tabla se propaga.
+    """
+    frames = []
+    for año in años:
+        tabla = f"{empresa}_{año}"
+        try:
+            datos = _descargar_paginado(lambda: supabase.table(tabla).select(columnas).gte(columna, desde))
+            if datos:
+                df = pd.DataFrame(datos)
+                df["año"] = año
+                frames.append(df)
+        except Exception as e:
+            if estricto and not _tabla_inexistente(e):
+                raise
+            print(f"⚠️ No se pudieron consultar los cambios de {tabla}: {e}")
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
@@ -0,0 +1,76 @@
+# etl/test_archivo_cfe.py
+import json
+import os
+
+import pandas as pd
+
+from backend.etl.archivo_cfe import ArchivoCFE
+from backend.etl.manifiesto import ManifiestoCFE
+from backend.etl.xml_parser import parsear_archivo_cfe, parsear_xmls_en_carpeta
+from backend.scripts.benchmark_xml_parser import construir_documentos
+
+
+def test_ida_y_vuelta(tmp_path):
+    archivo_cfe = ArchivoCFE(str(tmp_path), "redomon", "2025_01")
+    documentos = {f"{i}.xml": f"<CFE>{i} ñandú</CFE>".encode("utf-8") * (i + 1) for i in range(10)}
+    for archivo, contenido in documentos.items():
+        assert archivo_cfe.agregar(archivo, contenido)
+    assert not archivo_cfe.agregar("3.xml", documentos["3.xml"])
+
+    reabierto = ArchivoCFE(str(tmp_path), "redomon", "2025_01")
+    assert len(reabierto) == 10
+    assert dict(reabierto.iterar()) == documentos
+    assert list(reabierto.iterar(["7.xml", "2.xml", "falta.xml"])) == [("2.xml", documentos["2.xml"]), ("7.xml", documentos["7.xml"])]
+    assert reabierto.leer("falta.xml") is None
+
+
+def test_contenido_nuevo_se_vuelve_a_archivar(tmp_path):
+    archivo_cfe = ArchivoCFE(str(tmp_path), "redomon", "2025_01")
+    archivo_cfe.agregar("a.xml", b"<CFE>v1</CFE>")
+    assert archivo_cfe.agregar("a.xml", b"<CFE>v2</CFE>")
+    assert ArchivoCFE(str(tmp_path), "redomon", "2025_01").leer("a.xml") == b"<CFE>v2</CFE>"
+
+
+def test_indice_cortado(tmp_path):
+    archivo_cfe = ArchivoCFE(str(tmp_path), "redomon", "2025_01")
+    for i in range(3):
+        archivo_cfe.agregar(f"{i}.xml", f"<CFE>{i}</CFE>".encode())
+
+    # Escritura cortada: una línea a medias y una entrada que apunta más allá del pack
+    with open(archivo_cfe.ruta_indice, "a", encoding="utf-8") as f:
+        f.write(json.dumps({"archivo": "fuera.xml", "offset": os.path.getsize(archivo_cfe.ruta_pack), "longitud": 10}) + "\n")
+        f.write('{"archivo": "cortado.xml", "off')
+
+    reabierto = ArchivoCFE(str(tmp_path), "redomon", "2025_01")
+    assert sorted(reabierto.archivos()) == ["0.xml", "1.xml", "2.xml"]
+    assert reabierto.leer("1.xml") == b"<CFE>1</CFE>"
+
+
+def test_indice_sin_sha256(tmp_path):
+    archivo_cfe = ArchivoCFE(str(tmp_path), "redomon", "2025_01")
+    archivo_cfe.agregar("a.xml", b"<CFE>a</CFE>")
+    with open(archivo_cfe.ruta_indice, encoding="utf-8") as f:
+        entrada = json.loads(f.readline())
+    del entrada["sha256"]
+    with open(archivo_cfe.ruta_indice, "w", encoding="utf-8") as f:
+        f.write(json.dumps(entrada) + "\n")
+
+    reabierto = ArchivoCFE(str(tmp_path), "redomon", "2025_01")
+    assert not reabierto.agregar("a.xml", b"<CFE>a</CFE>")
+    assert reabierto.agregar("a.xml", b"<CFE>b</CFE>")
+
+
+def test_parser_archiva_y_se_puede_reparsear(tmp_path):
+    documentos = construir_documentos()[:20]
+    carpeta = tmp_path / "descargas"
+    carpeta.mkdir()
+    for archivo, contenido in documentos:
+        (carpeta / archivo).write_bytes(contenido)
+
+    archivo_cfe = ArchivoCFE(str(tmp_path / "archivo"), "redomon", "2025_01")
+    manifiesto = ManifiestoCFE(str(tmp_path / "manifiesto.db"), "redomon")
+    df = parsear_xmls_en_carpeta(str(carpeta), workers=2, manifiesto=manifiesto, archivo_cfe=archivo_cfe)
+    manifiesto.cerrar()
+
+    assert all(archivo_cfe.leer(archivo) == contenido for archivo, contenido in documentos)
+    pd.testing.assert_frame_equal(parsear_archivo_cfe(archivo_cfe, limpiar=False), df)
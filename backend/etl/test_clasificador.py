@@ -0,0 +1,112 @@
+# etl/test_clasificador.py
+import pytest
+
+from backend.etl.clasificador import (
+    CATEGORIAS,
+    clasificar_con_biseccion,
+    deduplicar_items,
+    expandir_resultados,
+    nuevos_contadores,
+    parsear_respuesta_clasificacion,
+    planificar_reintentos,
+    validar_resultados,
+)
+from backend.etl.clasificador_async import verificar_clasificacion_completa
+
+
+def _bloque(n: int):
+    return [{"rowid": i, "descripcion": f"item {i}"} for i in range(1, n + 1)]
+
+
+def test_deduplicar_y_expandir():
+    items = [
+        {"rowid": 1, "ruc": "210", "proveedor": "Ferretería Sur", "descripcion": "Tornillo  5MM"},
+        {"rowid": 2, "ruc": "210", "proveedor": "FERRETERIA SUR S.A.", "descripcion": "tornillo 5mm"},
+        {"rowid": 3, "ruc": "", "proveedor": "Ferretería Sur", "descripcion": "tornillo 5mm"},
+        {"rowid": 4, "ruc": None, "proveedor": "ferreteria sur", "descripcion": "Tornillo 5mm"},
+        {"rowid": 5, "ruc": "210", "proveedor": "Ferretería Sur", "descripcion": "Tuerca"},
+    ]
+    representantes, grupos = deduplicar_items(items)
+
+    assert [item["rowid"] for item in representantes] == [1, 3, 5]
+    assert grupos == {1: [1, 2], 3: [3, 4], 5: [5]}
+
+    resultados = [{"rowid": 5, "categoria": "Ferretería"}, {"rowid": 1, "categoria": "Insumos"}]
+    assert expandir_resultados(items, resultados, grupos) == [
+        {"rowid": 1, "categoria": "Insumos"},
+        {"rowid": 2, "categoria": "Insumos"},
+        {"rowid": 5, "categoria": "Ferretería"},
+    ]
+
+
+def test_validar_resultados():
+    bloque = _bloque(5)
+    respuesta = [
+        {"rowid": "1", "categoria": " Insumos "},
+        {"rowid": 1, "categoria": "Otra"},          # repetido: vale el primero
+        {"rowid": 2, "categoria": "error"},
+        {"rowid": 3, "categoria": ""},
+        {"rowid": 9, "categoria": "Inventado"},
+        {"rowid": "x", "categoria": "Insumos"},
+        "no es un dict",
+        {"rowid": 5, "categoria": "Combustible"},
+    ]
+    validos, faltantes = validar_resultados(bloque, respuesta)
+
+    assert validos == {1: "Insumos", 5: "Combustible"}
+    assert [item["rowid"] for item in faltantes] == [2, 3, 4]
+    assert validar_resultados(bloque, None) == ({}, bloque)
+
+
+def test_planificar_reintentos():
+    bloque = _bloque(4)
+    contadores = nuevos_contadores()
+
+    # Respuesta parcial: se piden solo las faltantes
+    assert planificar_reintentos(bloque, {1: "A", 2: "B"}, bloque[2:], 2, 400, contadores) == [(bloque[2:], 2)]
+    assert contadores["reintentos"] == 1 and contadores["tokens_desperdiciados"] == 200
+
+    # Nada válido: bisección
+    assert planificar_reintentos(bloque, {}, bloque, 2, 400, contadores) == [(bloque[:2], 2), (bloque[2:], 2)]
+    assert contadores["bisecciones"] == 1
+
+    # Ítem suelto: se reintenta hasta agotar los intentos
+    assert planificar_reintentos(bloque[:1], {}, bloque[:1], 2, 10, contadores) == [(bloque[:1], 1)]
+    assert planificar_reintentos(bloque[:1], {}, bloque[:1], 1, 10, contadores) == []
+    assert contadores["sin_clasificar"] == 1
+    assert planificar_reintentos(bloque, {1: "A"}, [], 2, 10, contadores) == []
+
+
+def test_clasificar_con_biseccion_aisla_el_item_problematico():
+    pedidos = []
+
+    def intentar(bloque):
+        pedidos.append([item["rowid"] for item in bloque])
+        # El ítem 3 rompe cualquier respuesta que lo incluya
+        if any(item["rowid"] == 3 for item in bloque):
+            return None, 100
+        return [{"rowid": item["rowid"], "categoria": "Insumos"} for item in bloque], 100
+
+    contadores = nuevos_contadores()
+    resultados = clasificar_con_biseccion(_bloque(4), intentar, contadores, intentos=2)
+
+    assert resultados == [{"rowid": i, "categoria": "error" if i == 3 else "Insumos"} for i in range(1, 5)]
+    assert contadores["sin_clasificar"] == 1
+    assert contadores["pedidos"] == len(pedidos)
+
+
+def test_verificar_clasificacion_completa():
+    resultados = [{"rowid": i, "categoria": "error" if i <= 2 else "Insumos"} for i in range(1, 21)]
+
+    assert verificar_clasificacion_completa(resultados, max_proporcion=0.1) == 2
+    assert verificar_clasificacion_completa(resultados[2:], max_proporcion=0.1) == 0
+    with pytest.raises(RuntimeError):
+        verificar_clasificacion_completa(resultados[:10], max_proporcion=0.1)
+
+
+def test_parsear_respuesta_en_modo_indices():
+    salida = '{"c": [[1, 0], [2, 1], [3, true], [true, 0], [4, %d], [5], "x", [6, -1]]}' % len(CATEGORIAS)
+    assert parsear_respuesta_clasificacion(salida, modo="indices") == [
+        {"rowid": 1, "categoria": CATEGORIAS[0]},
+        {"rowid": 2, "categoria": CATEGORIAS[1]},
+    ]
@@ -0,0 +1,75 @@
+# etl/test_cola_trabajos.py
+import time
+
+import pytest
+
+from backend.etl.cola_trabajos import ColaTrabajos, TrabajadorCola
+
+
+@pytest.fixture
+def ruta(tmp_path):
+    return str(tmp_path / "cola.db")
+
+
+def test_encolar_es_idempotente(ruta):
+    cola = ColaTrabajos(ruta)
+    assert cola.encolar("clasificacion", "2025_01", [("a", {"n": 1}), ("b", {"n": 2})]) == 2
+    assert cola.encolar("clasificacion", "2025_01", [("a", {"n": 1}), ("c", {"n": 3})]) == 1
+    assert cola.estado("clasificacion") == {"pendiente": 3, "en_proceso": 0, "hecho": 0, "fallido": 0}
+    cola.cerrar()
+
+
+def test_lease_vencido_lo_retoma_otro_trabajador(ruta):
+    cola = ColaTrabajos(ruta, lease=0.2)
+    cola.encolar("clasificacion", "2025_01", [("a", {"n": 1})])
+
+    trabajo = cola.reclamar("clasificacion", "uno")
+    assert trabajo["carga"] == {"n": 1} and trabajo["intentos"] == 1
+    assert cola.reclamar("clasificacion", "dos") is None
+    assert cola.latido(trabajo["id"], "uno")
+
+    time.sleep(0.3)
+    retomado = cola.reclamar("clasificacion", "dos")
+    assert retomado["id"] == trabajo["id"] and retomado["intentos"] == 2
+
+    # El primer trabajador perdió el trabajo: ni su latido ni su confirmación cuentan
+    assert not cola.latido(trabajo["id"], "uno")
+    assert not cola.confirmar(trabajo["id"], "uno", "viejo")
+    assert cola.confirmar(retomado["id"], "dos", "nuevo")
+    assert cola.resultados("clasificacion", "2025_01") == ["nuevo"]
+    cola.cerrar()
+
+
+def test_max_intentos(ruta):
+    cola = ColaTrabajos(ruta, max_intentos=2)
+    cola.encolar("clasificacion", "2025_01", [("a", {})])
+
+    for intento in (1, 2):
+        trabajo = cola.reclamar("clasificacion", "uno")
+        assert trabajo["intentos"] == intento
+        cola.fallar(trabajo["id"], "uno", "timeout")
+    assert cola.reclamar("clasificacion", "uno") is None
+    assert cola.estado("clasificacion")["fallido"] == 1
+
+    assert cola.reintentar_fallidos("clasificacion") == 1
+    assert cola.reclamar("clasificacion", "uno")["intentos"] == 1
+    cola.cerrar()
+
+
+def test_trabajador_procesa_la_cola(ruta):
+    cola = ColaTrabajos(ruta, max_intentos=2)
+    cola.encolar("embeddings", "2025_01", [(str(n), {"n": n}) for n in range(5)])
+
+    def procesar(carga):
+        if carga["n"] == 3:
+            raise ValueError("roto")
+        return carga["n"] * 10
+
+    trabajador = TrabajadorCola(cola, "embeddings", procesar, nombre="prueba")
+    trabajador.ejecutar()
+
+    assert (trabajador.procesados, trabajador.fallidos) == (4, 2)
+    assert cola.resultados("embeddings", "2025_01") == [0, 10, 20, 40]
+    assert cola.resultados("embeddings", "2025_01", claves=["4", "3"]) == [40]
+    assert cola.estado("embeddings", "2025_01")["fallido"] == 1
+    cola.cerrar()
@@ -0,0 +1,51 @@
+# etl/test_etapas.py
+import time
+
+import pytest
+
+from backend.etl.etapas import ejecutar_etapas
+
+
+def test_conserva_el_orden_y_descarta_los_none():
+    etapas = [
+        ("doble", lambda n: n * 2),
+        ("pares", lambda n: None if n % 4 == 0 else n),
+        ("texto", str),
+    ]
+    assert ejecutar_etapas(range(10), etapas, tamano_cola=1) == ["2", "6", "10", "14", "18"]
+
+
+def test_las_etapas_se_superponen():
+    def lenta(n):
+        time.sleep(0.05)
+        return n
+
+    def fuente():
+        for n in range(6):
+            time.sleep(0.05)
+            yield n
+
+    inicio = time.perf_counter()
+    resultados = ejecutar_etapas(fuente(), [("a", lenta), ("b", lenta), ("c", lenta)])
+    # En serie serían 4 etapas x 6 elementos x 0.05s = 1.2s; superpuestas, unos 0.45s
+    assert resultados == list(range(6))
+    assert time.perf_counter() - inicio < 0.9
+
+
+def test_un_error_se_relanza_sin_colgar_el_pipeline():
+    producidos = []
+
+    def fuente():
+        for n in range(1000):
+            producidos.append(n)
+            yield n
+
+    def falla(n):
+        if n == 3:
+            raise ValueError("lote roto")
+        return n
+
+    with pytest.raises(ValueError, match="lote roto"):
+        ejecutar_etapas(fuente(), [("uno", lambda n: n), ("falla", falla), ("fin", lambda n: n)], tamano_cola=1)
+    # La fuente deja de producir poco después del error
+    assert len(producidos) < 1000
@@ -0,0 +1,109 @@
+# etl/test_manifiesto.py
+import os
+
+import pandas as pd
+import pytest
+
+from backend.etl.archivo_cfe import ArchivoCFE
+from backend.etl.manifiesto import ManifiestoCFE, identificar_cfe
+from backend.etl.xml_parser import iterar_xmls_en_carpeta, parsear_xmls_en_carpeta
+from backend.scripts.benchmark_xml_parser import construir_documentos
+
+
+@pytest.fixture
+def manifiesto(tmp_path):
+    manifiesto = ManifiestoCFE(str(tmp_path / "manifiesto.db"), "redomon")
+    yield manifiesto
+    manifiesto.cerrar()
+
+
+@pytest.fixture(scope="module")
+def documentos():
+    return construir_documentos()[:20]
+
+
+def _escribir(carpeta, documentos) -> str:
+    os.makedirs(carpeta, exist_ok=True)
+    for archivo, contenido in documentos:
+        with open(os.path.join(carpeta, archivo), "wb") as f:
+            f.write(contenido)
+    return str(carpeta)
+
+
+def test_identificar_cfe_por_campos_o_por_hash():
+    contenido = b"<ns0:RUCEmisor>210</ns0:RUCEmisor><TipoCFE>111</TipoCFE><ns0:Serie> A </ns0:Serie><ns0:Nro>7</ns0:Nro>"
+    assert identificar_cfe(contenido)["clave"] == "210-111-A-7"
+
+    sin_numero = identificar_cfe(b"<RUCEmisor>210</RUCEmisor><TipoCFE>111</TipoCFE><Serie>A</Serie>")
+    assert sin_numero["clave"] == f"sha256:{sin_numero['hash']}"
+
+
+def test_saltea_cfe_ya_subidos(tmp_path, manifiesto, documentos):
+    base = parsear_xmls_en_carpeta(_escribir(tmp_path / "primera", documentos), manifiesto=manifiesto)
+    subidos = [archivo for archivo, _ in documentos[:5]]
+    manifiesto.marcar_subidos(subidos)
+
+    # Los mismos CFE vuelven a descargarse (con otro nombre de archivo para los ya subidos)
+    segunda = [(f"otra_{a}" if a in subidos else a, c) for a, c in documentos]
+    for workers in (1, 2):
+        carpeta = _escribir(tmp_path / f"segunda{workers}", segunda)
+        df = parsear_xmls_en_carpeta(carpeta, workers=workers, manifiesto=manifiesto)
+        esperado = base[~base["archivo"].isin(subidos)].reset_index(drop=True)
+        esperado["rowid"] = esperado.index + 1
+        pd.testing.assert_frame_equal(df, esperado)
+        assert os.listdir(carpeta) == []
+
+    df = pd.concat(iterar_xmls_en_carpeta(_escribir(tmp_path / "stream", segunda), manifiesto=manifiesto))
+    assert set(df["archivo"]) == set(esperado["archivo"])
+
+
+def test_subidos_no_se_parsean_ni_se_archivan(tmp_path, manifiesto, documentos):
+    # Un XML que no parsea: si se intentara parsear quedaría en la carpeta con un error
+    roto = b"<RUCEmisor>210</RUCEmisor><TipoCFE>111</TipoCFE><Serie>A</Serie><Nro>1</Nro><sin cierre"
+    manifiesto.registrar_parseados([{**identificar_cfe(roto), "archivo": "roto.xml"}])
+    manifiesto.marcar_subidos(["roto.xml"])
+
+    for workers in (1, 2):
+        archivo_cfe = ArchivoCFE(str(tmp_path / "archivo"), "redomon", f"w{workers}")
+        carpeta = _escribir(tmp_path / f"w{workers}", documentos[:4] + [(f"de_nuevo_{workers}.xml", roto)])
+        df = parsear_xmls_en_carpeta(carpeta, workers=workers, manifiesto=manifiesto, archivo_cfe=archivo_cfe)
+        assert os.listdir(carpeta) == []
+        assert sorted(archivo_cfe.archivos()) == sorted(a for a, _ in documentos[:4])
+        assert list(df["rowid"]) == list(range(1, len(df) + 1))
+
+
+def test_streaming_con_lotes_chicos_sube_todas_las_filas(tmp_path, manifiesto):
+    varios_items = [(a, c) for a, c in construir_documentos() if c.count(b"<ns0:Item>") > 2][:3]
+    base = parsear_xmls_en_carpeta(_escribir(tmp_path / "base", varios_items))
+
+    subidas = []
+    for lote in iterar_xmls_en_carpeta(_escribir(tmp_path / "stream", varios_items), tamano_lote=1, manifiesto=manifiesto):
+        # Lo mismo que hace subir_dataframe con cada lote
+        lote = manifiesto.descartar_filas_subidas(lote)
+        subidas.append(lote)
+        manifiesto.marcar_filas_subidas(lote["archivo"].tolist(), len(lote))
+
+    assert len(subidas) == len(varios_items)
+    pd.testing.assert_frame_equal(pd.concat(subidas, ignore_index=True), base)
+
+
+def test_marca_subido_solo_con_todas_sus_filas(manifiesto):
+    manifiesto.registrar_parseados([
+        {"clave": clave, "hash": f"h{clave}", "archivo": f"{clave}.xml"} for clave in "abc"
+    ])
+    # Se cortó la subida en la fila 3: 'b' tiene una fila subida y otra no
+    manifiesto.marcar_filas_subidas(["a.xml", "a.xml", "b.xml", "b.xml", "c.xml"], 3)
+
+    assert manifiesto.archivos_subidos(["a.xml", "b.xml", "c.xml"]) == {"a.xml"}
+    df = pd.DataFrame({"archivo": ["a.xml", "b.xml", "c.xml"], "monto_item": [1, 2, 3]})
+    assert list(manifiesto.descartar_filas_subidas(df)["archivo"]) == ["b.xml", "c.xml"]
+
+
+def test_registrar_parseados_no_pisa_subidos(manifiesto):
+    manifiesto.registrar_parseados([{"clave": "a", "hash": "h1", "archivo": "a.xml"}])
+    manifiesto.marcar_subidos(["a.xml"])
+    manifiesto.registrar_parseados([{"clave": "a", "hash": "h2", "archivo": "a2.xml"}])
+
+    assert manifiesto.ya_subido({"clave": "a", "hash": "otro"})
+    assert manifiesto.ya_subido({"clave": "otra", "hash": "h1"})
+    assert not manifiesto.ya_subido({"clave": "otra", "hash": "h2"})
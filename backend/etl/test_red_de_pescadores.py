@@ -0,0 +1,103 @@
+# etl/test_red_de_pescadores.py
+import numpy as np
+import pandas as pd
+import pytest
+
+from backend.etl import red_de_pescadores
+from backend.etl.red_de_pescadores import (
+    IndiceHistorico,
+    IndiceHistoricoTrigramas,
+    emparejar_con_historico,
+    preparar_historico_para_red,
+    repartir_por_proveedor,
+)
+from backend.scripts.benchmark_red_de_pescadores import emparejar_anterior, leer_nuevos
+from backend.scripts.entrenar_modelo_local import leer_archivos
+
+MOTORES = {
+    "secuencia": IndiceHistorico,
+    "trigramas": lambda historico: IndiceHistoricoTrigramas(historico, buscar_parecidos=False),
+}
+
+
+@pytest.fixture(scope="module")
+def redomon():
+    historico = preparar_historico_para_red(leer_archivos(["data/redomon/febrero_2025.json", "data/redomon/marzo_2025.json"]))
+    return leer_nuevos(["data/redomon/enero_2025.json"]), historico
+
+
+@pytest.fixture
+def sintetico():
+    historico = preparar_historico_para_red(pd.DataFrame([
+        # Misma similitud con categorías distintas: decide el desempate de sort_values
+        {"proveedor": "Ferretería Sur", "descripcion": "tornillo 5mm", "categoria": "Insumos", "verificado": True},
+        {"proveedor": "FERRETERIA SUR", "descripcion": "tornillo 6mm", "categoria": "Herramientas", "verificado": True},
+        {"proveedor": "Ferreteria Sur", "descripcion": "tornillo 7mm", "categoria": "Insumos", "verificado": True},
+        # Misma descripción con dos categorías: no toma el camino exacto
+        {"proveedor": "Ferretería Sur", "descripcion": "Martillo", "categoria": "Herramientas", "verificado": True},
+        {"proveedor": "Ferretería Sur", "descripcion": "martillo", "categoria": "Insumos", "verificado": True},
+        # Categoría vacía en el histórico
+        {"proveedor": "Ancap", "descripcion": "Nafta súper", "categoria": None, "verificado": True},
+        {"proveedor": "Ancap", "descripcion": "Gasoil", "categoria": "Combustible", "verificado": True},
+        {"proveedor": "Ancap", "descripcion": "Lubricante", "categoria": "Mantenimiento", "verificado": False},
+    ]))
+    nuevos = pd.DataFrame({
+        "rowid": range(1, 9),
+        "proveedor": ["Ferreteria sur", "Ferretería Sur", "Ferretería Sur", "ANCAP", "Ancap", "Ancap", "Otro", None],
+        "descripcion": ["tornillo 8mm", "MARTILLO", "destornillador", "nafta super", "gas oil", "lubricante", "tornillo 5mm", "x"],
+        "ruc": ["210", "210", "", 211.0, None, "211", "", ""],
+    })
+    return nuevos, historico
+
+
+def test_secuencia_igual_que_el_algoritmo_anterior(sintetico, redomon):
+    for nuevos, historico in (sintetico, redomon):
+        esperado = emparejar_anterior(nuevos, historico)
+        actual = emparejar_con_historico(nuevos, historico, motor="secuencia", workers=1)
+        assert actual.to_csv(index=False) == esperado.to_csv(index=False)
+
+
+def _categorias(resultado: pd.DataFrame) -> pd.Series:
+    return resultado["categoria"].where(resultado["verificado"])
+
+
+def test_trigramas_igual_que_secuencia(redomon):
+    nuevos, historico = redomon
+    secuencia = _categorias(emparejar_anterior(nuevos, historico))
+    trigramas = _categorias(emparejar_con_historico(nuevos, historico, indice=MOTORES["trigramas"](historico), workers=1))
+
+    assert secuencia.notna().sum() > 100
+    pd.testing.assert_series_equal(trigramas.reset_index(drop=True), secuencia.reset_index(drop=True))
+
+
+def test_trigramas_busca_en_proveedores_parecidos(sintetico):
+    nuevos, historico = sintetico
+    nuevos = nuevos.assign(proveedor=["Ferreteria Sur SA", "Ferreteria Sur SRL", "x", "ANCAP SA", "ANCAPP", "z", "w", "v"])
+    indice = IndiceHistoricoTrigramas(historico, umbral_proveedor=0.8)
+    resultado = emparejar_con_historico(nuevos, historico, indice=indice, workers=1)
+
+    # "ancap sa" queda por debajo del umbral de proveedor; "ancapp" no
+    assert list(resultado["verificado"]) == [True, True, False, False, True, False, False, False]
+    assert resultado["categoria"].iloc[4] == "Combustible"
+    assert not emparejar_con_historico(nuevos, historico, indice=MOTORES["trigramas"](historico), workers=1)["verificado"].any()
+
+
+def test_repartir_por_proveedor():
+    claves = [(p, str(i), "") for i, p in enumerate("aaaaabbbccdefg")]
+    fragmentos = repartir_por_proveedor(claves, 3)
+
+    assert sorted(sum(fragmentos, [])) == list(range(len(claves)))
+    for fragmento in fragmentos:
+        proveedores = {claves[i][0] for i in fragmento}
+        assert all(all(claves[i][0] not in proveedores for i in otro) for otro in fragmentos if otro is not fragmento)
+    assert repartir_por_proveedor(claves, 3) == fragmentos
+
+
+@pytest.mark.parametrize("motor", list(MOTORES))
+def test_en_paralelo_igual_que_en_serie(monkeypatch, sintetico, redomon, motor):
+    monkeypatch.setattr(red_de_pescadores, "MINIMO_PARALELO", 1)
+    for nuevos, historico in (sintetico, redomon):
+        serie = emparejar_con_historico(nuevos, historico, indice=MOTORES[motor](historico), workers=1)
+        paralelo = emparejar_con_historico(nuevos, historico, indice=MOTORES[motor](historico), workers=2)
+        assert paralelo.to_csv(index=False) == serie.to_csv(index=False)
+        assert np.array_equal(paralelo["verificado"], serie["verificado"])
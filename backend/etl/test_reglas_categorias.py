@@ -0,0 +1,70 @@
+# etl/test_reglas_categorias.py
+import random
+from collections import Counter
+
+from backend.etl.reglas_categorias import AutomataAhoCorasick, ReglasCategorias
+
+TAXONOMIA = [
+    {"categoria": "Combustible", "reglas": ["nafta", "gasoil", "Estación de servicio"]},
+    {"categoria": "Peajes", "reglas": ["peaje"]},
+    {"categoria": "Papelería", "reglas": ["papel", "lápiz"]},
+    {"categoria": "Sin reglas", "reglas": []},
+]
+
+
+def _item(descripcion, proveedor="", rowid=1):
+    return {"rowid": rowid, "proveedor": proveedor, "descripcion": descripcion}
+
+
+def test_automata_encuentra_todas_las_apariciones():
+    automata = AutomataAhoCorasick(["he", "she", "his", "hers"])
+    assert Counter(automata.buscar("ushers")) == Counter(["she", "he", "hers"])
+
+    azar = random.Random(0)
+    patrones = ["".join(azar.choice("ab") for _ in range(azar.randint(1, 4))) for _ in range(15)]
+    automata = AutomataAhoCorasick(patrones)
+    for _ in range(50):
+        texto = "".join(azar.choice("ab") for _ in range(30))
+        esperado = Counter(
+            p for p in set(patrones) for i in range(len(texto)) if texto.startswith(p, i) for _ in range(patrones.count(p))
+        )
+        assert Counter(automata.buscar(texto)) == esperado
+
+
+def test_reglas_solo_palabras_completas():
+    reglas = ReglasCategorias(TAXONOMIA)
+
+    assert reglas.categoria(_item("NAFTA súper 95")) == "Combustible"
+    assert reglas.categoria(_item("Naftalina en bolitas")) is None
+    assert reglas.categoria(_item("papeleria varios")) is None
+    assert reglas.categoria(_item("Hoja de papel A4")) == "Papelería"
+    # Reglas de varias palabras, con tildes, en el proveedor
+    assert reglas.categoria(_item("Varios", proveedor="ESTACION DE SERVICIO EL PASO")) == "Combustible"
+
+
+def test_reglas_en_conflicto_van_a_la_ia():
+    reglas = ReglasCategorias(TAXONOMIA)
+
+    # Varias reglas de la misma categoría: se resuelve
+    assert reglas.categoria(_item("gasoil y nafta")) == "Combustible"
+    # Reglas de categorías distintas: ambiguo
+    assert reglas.categoria(_item("nafta y peaje")) is None
+    assert (reglas.consultas, reglas.aciertos, reglas.ambiguos) == (2, 1, 1)
+
+    items = [_item("lápiz negro", rowid=1), _item("peaje ruta 5 y papel", rowid=2), _item("servicio técnico", rowid=3)]
+    resueltos, pendientes = reglas.aplicar(items)
+    assert resueltos == [{"rowid": 1, "categoria": "Papelería"}]
+    assert [item["rowid"] for item in pendientes] == [2, 3]
+
+
+def test_clasificar_respeta_el_orden():
+    reglas = ReglasCategorias(TAXONOMIA)
+    items = [_item("servicio", rowid=1), _item("peaje", rowid=2), _item("otro", rowid=3)]
+    enviados = []
+
+    def clasificar_resto(pendientes):
+        enviados.extend(item["rowid"] for item in pendientes)
+        return [{"rowid": item["rowid"], "categoria": "IA"} for item in pendientes]
+
+    assert [r["categoria"] for r in reglas.clasificar(items, clasificar_resto)] == ["IA", "Peajes", "IA"]
+    assert enviados == [1, 3]
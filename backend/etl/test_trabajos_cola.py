@@ -0,0 +1,46 @@
+# etl/test_trabajos_cola.py
+from types import SimpleNamespace
+
+import httpx
+from openai import RateLimitError
+
+from backend.etl import clasificador, trabajos_cola
+from backend.etl.limitador import LimitadorTasa
+
+
+def _respuesta(contenido: str):
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=contenido))],
+        usage=SimpleNamespace(total_tokens=50, prompt_tokens=40, completion_tokens=10),
+    )
+
+
+def test_limitador_reparte_el_cupo_entre_trabajadores(monkeypatch):
+    monkeypatch.setenv("RPM_IA", "500")
+    monkeypatch.setenv("TPM_IA", "200000")
+    monkeypatch.setattr(trabajos_cola, "_limitador", None)
+
+    limitador = trabajos_cola.limitador_del_proceso(4)
+    assert (limitador.rpm, limitador.tpm) == (125, 50000)
+    assert trabajos_cola.limitador_del_proceso() is limitador
+
+
+def test_429_se_reintenta_con_pausa(monkeypatch):
+    pedidos = []
+
+    def crear(**kwargs):
+        pedidos.append(kwargs)
+        if len(pedidos) == 1:
+            respuesta = httpx.Response(429, headers={"retry-after": "0.01"}, request=httpx.Request("POST", "https://api.openai.com"))
+            raise RateLimitError("rate limit", response=respuesta, body=None)
+        return _respuesta('[{"rowid": 1, "categoria": "Insumos"}]')
+
+    monkeypatch.setattr(clasificador.openai.chat.completions, "create", crear)
+    limitador = LimitadorTasa(600, 100000)
+    items = [{"rowid": 1, "proveedor": "Ferretería", "descripcion": "tornillos"}]
+
+    resultado, tokens = clasificador._intentar_lote_con_ia(items, modo="nombres", limitador=limitador)
+
+    assert resultado == [{"rowid": 1, "categoria": "Insumos"}] and tokens == 50
+    assert len(pedidos) == 2
+    assert limitador._pausa_hasta > 0
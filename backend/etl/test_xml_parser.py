@@ -0,0 +1,122 @@
+# etl/test_xml_parser.py
+import io
+import os
+import re
+
+import pandas as pd
+import pytest
+
+from backend.etl.xml_parser import (
+    iterar_registros_xml,
+    iterar_xmls_en_carpeta,
+    limpiar_contenido_xml,
+    limpiar_xml_en_memoria,
+    parsear_xmls_en_carpeta,
+    parsear_zips_en_carpeta,
+    tipar_columnas,
+)
+from backend.scripts.benchmark_xml_parser import construir_documentos
+
+
+def limpiar_con_regex(contenido: str) -> str:
+    """
+    Limpieza original de limpiar_xmls_en_carpeta (regex DOTALL sobre todo el documento).
+    """
+    contenido = contenido.strip().replace("\ufeff", "")
+    if "<Adenda>" in contenido:
+        match_cfe = re.search(r"<([a-zA-Z0-9:]*CFE)(\s[^>]*)?>.*?</\1>", contenido, re.DOTALL)
+        return match_cfe.group(0) if match_cfe else contenido
+    return f"<FacturaCompleta>\n{contenido}\n</FacturaCompleta>"
+
+
+@pytest.fixture(scope="module")
+def documentos():
+    return construir_documentos()
+
+
+def _escribir(carpeta, documentos) -> str:
+    os.makedirs(carpeta, exist_ok=True)
+    for archivo, contenido in documentos:
+        with open(os.path.join(carpeta, archivo), "wb") as f:
+            f.write(contenido)
+    return str(carpeta)
+
+
+@pytest.mark.parametrize("contenido", [
+    '<CFE_Adenda><ns0:CFE xmlns:ns0="x" version="1.0"><ns0:TipoCFE>111</ns0:TipoCFE></ns0:CFE><Adenda>a</Adenda></CFE_Adenda>',
+    "\ufeff  <CFE_Adenda><CFE>\n<Item>1</Item>\n</CFE><Adenda>texto</Adenda></CFE_Adenda>\n",
+    "<CFE_Adenda><ns0:CFE><ns0:eTck>sin cierre<Adenda></Adenda></CFE_Adenda>",
+    "<CFE_Adenda><a:CFE>abierto <b:CFE x='1'>ok</b:CFE><Adenda/></CFE_Adenda><Adenda></Adenda>",
+    "<CFE_Adenda><ns0:eFact>sin CFE</ns0:eFact><Adenda>x</Adenda></CFE_Adenda>",
+    "<ns0:CFE><ns0:Item>sin adenda</ns0:Item></ns0:CFE>",
+    "\ufeff<?xml version='1.0'?><CFE/>",
+])
+def test_limpiar_contenido_xml_igual_que_regex(contenido):
+    assert limpiar_contenido_xml(contenido) == limpiar_con_regex(contenido)
+
+
+def test_limpiar_contenido_xml_igual_que_regex_en_documentos(documentos):
+    for _, contenido in documentos[:50]:
+        crudo = "\ufeff" + contenido.decode("utf-8").replace("</ns0:CFE>", "</ns0:CFE><Adenda>x</Adenda>")
+        assert limpiar_contenido_xml(crudo) == limpiar_con_regex(crudo)
+
+
+def test_modos_de_parseo_devuelven_las_mismas_filas(tmp_path, documentos):
+    base = parsear_xmls_en_carpeta(_escribir(tmp_path / "serial", documentos))
+    assert len(base) == sum(len(iterar_registros_xml(io.BytesIO(c), a)) for a, c in documentos)
+    assert list(base["rowid"]) == list(range(1, len(base) + 1))
+
+    variantes = {
+        "workers": dict(workers=2),
+        "lxml": dict(motor="lxml"),
+        "lxml + workers": dict(motor="lxml", workers=2),
+    }
+    for nombre, opciones in variantes.items():
+        df = parsear_xmls_en_carpeta(_escribir(tmp_path / nombre, documentos), **opciones)
+        pd.testing.assert_frame_equal(df, base, obj=nombre)
+
+    esperado = tipar_columnas(base)
+    for workers in (1, 2):
+        df = parsear_xmls_en_carpeta(_escribir(tmp_path / f"columnar{workers}", documentos), workers=workers, columnar=True)
+        pd.testing.assert_frame_equal(df.astype(str), esperado.astype(str), obj=f"columnar {workers}")
+        assert isinstance(df["proveedor"].dtype, pd.CategoricalDtype)
+
+    for motor in ("etree", "lxml"):
+        lotes = list(iterar_xmls_en_carpeta(_escribir(tmp_path / f"iterparse_{motor}", documentos), tamano_lote=100, motor=motor))
+        assert all(len(lote) >= 100 for lote in lotes[:-1])
+        # Ningún CFE queda repartido entre dos lotes
+        archivos_por_lote = [set(lote["archivo"]) for lote in lotes]
+        assert sum(map(len, archivos_por_lote)) == len(set().union(*archivos_por_lote))
+        pd.testing.assert_frame_equal(pd.concat(lotes, ignore_index=True), base, obj=f"iterparse {motor}")
+
+
+def test_limpiar_en_memoria_igual_que_limpiar_antes(tmp_path, documentos):
+    crudos = [(a, b"\xef\xbb\xbf" + c.replace(b"</ns0:CFE>", b"</ns0:CFE><Adenda>x</Adenda>")) for a, c in documentos[:30]]
+    limpios = [(a, limpiar_xml_en_memoria(c)) for a, c in crudos]
+
+    base = parsear_xmls_en_carpeta(_escribir(tmp_path / "limpios", limpios))
+    pd.testing.assert_frame_equal(parsear_xmls_en_carpeta(_escribir(tmp_path / "crudos", crudos), limpiar=True), base)
+    pd.testing.assert_frame_equal(pd.concat(iterar_xmls_en_carpeta(_escribir(tmp_path / "stream", crudos), limpiar=True)), base)
+
+
+def test_borra_solo_los_archivos_parseados(tmp_path, documentos):
+    carpeta = _escribir(tmp_path, documentos[:3] + [("roto.xml", b"<no cierra")])
+    df = parsear_xmls_en_carpeta(carpeta)
+    assert os.listdir(carpeta) == ["roto.xml"]
+    assert set(df["archivo"]) == {a for a, _ in documentos[:3]}
+
+
+@pytest.mark.parametrize("columnar", [False, True])
+def test_sin_archivos_devuelve_dataframe_vacio(tmp_path, documentos, columnar):
+    con_items = parsear_xmls_en_carpeta(_escribir(tmp_path / "con_items", documentos[:2]), columnar=columnar)
+    vacios = [
+        parsear_xmls_en_carpeta(_escribir(tmp_path / "vacia", []), columnar=columnar),
+        parsear_xmls_en_carpeta(_escribir(tmp_path / "rotos", [("roto.xml", b"<no cierra")]), columnar=columnar),
+        parsear_zips_en_carpeta(_escribir(tmp_path / "sin_zips", []), columnar=columnar),
+    ]
+    for df in vacios:
+        assert isinstance(df, pd.DataFrame) and df.empty
+        assert list(df.columns) == list(con_items.columns)
+        assert df["rowid"].dtype == con_items["rowid"].dtype
+        if columnar:
+            assert isinstance(df["proveedor"].dtype, pd.CategoricalDtype) and df["monto_item"].dtype == "float64"
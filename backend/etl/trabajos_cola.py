@@ -0,0 +1,135 @@
+# etl/trabajos_cola.py
+import hashlib
+import multiprocessing
+import time
+from typing import Dict, List, Tuple
+
+from backend.config import get_cola_trabajos_path, get_lease_cola, get_rpm_ia, get_tpm_ia, get_trabajadores_cola
+from backend.etl.clasificador import clasificar_lote
+from backend.etl.cola_trabajos import ColaTrabajos, TrabajadorCola
+from backend.etl.limitador import LimitadorTasa
+
+COLA_CLASIFICACION = "clasificacion"
+COLA_EMBEDDINGS = "embeddings"
+# Lo que viaja en la cola de cada ítem: lo que usan las reglas, la cache y la IA
+CAMPOS_TRABAJO = ("rowid", "proveedor", "descripcion", "ruc")
+
+# Limitador de pedidos a OpenAI del proceso trabajador (ver limitador_del_proceso)
+_limitador = None
+
+
+def obtener_cola() -> ColaTrabajos:
+    return ColaTrabajos(get_cola_trabajos_path(), lease=get_lease_cola())
+
+
+def clave_trabajo(lote: str, claves: List) -> str:
+    """
+    Clave estable de un trabajo: el lote y un hash de lo que contiene, para que volver a
+    encolar la misma corrida no duplique trabajos.
+    """
+    return f"{lote}:{hashlib.sha1(','.join(map(str, claves)).encode('utf-8')).hexdigest()[:16]}"
+
+
+def limitador_del_proceso(procesos: int = None) -> LimitadorTasa:
+    """
+    Limitador compartido por todos los trabajos de este proceso. RPM_IA y TPM_IA son el
+    cupo de la cuenta: se reparten en partes iguales entre los 'procesos' trabajadores
+    (por defecto TRABAJADORES_COLA), así sumar trabajadores no multiplica los pedidos.
+    """
+    global _limitador
+    if _limitador is None or procesos is not None:
+        procesos = max(1, get_trabajadores_cola() if procesos is None else procesos)
+        _limitador = LimitadorTasa(max(1, get_rpm_ia() // procesos), max(1, get_tpm_ia() // procesos))
+    return _limitador
+
+
+def procesar_clasificacion(carga: Dict) -> List[Dict]:
+    return clasificar_lote(carga["items"], modo=carga.get("modo"), limitador=limitador_del_proceso())
+
+
+def procesar_embeddings(carga: Dict) -> int:
+    # Import diferido: embeddings.py crea el cliente de Supabase al importarse
+    from backend.embeddings import actualizar_embeddings_por_ids
+    return actualizar_embeddings_por_ids(carga["tabla"], carga["ids"])
+
+
+PROCESADORES = {
+    COLA_CLASIFICACION: procesar_clasificacion,
+    COLA_EMBEDDINGS: procesar_embeddings,
+}
+
+
+def ejecutar_trabajador(nombre_cola: str, esperar_nuevos: bool = False, procesos: int = None) -> None:
+    """
+    Corre un trabajador de la cola hasta vaciarla (punto de entrada de cada proceso).
+    'procesos' es cuántos trabajadores se lanzaron juntos y comparten el cupo de OpenAI.
+    """
+    limitador_del_proceso(procesos)
+    cola = obtener_cola()
+    try:
+        TrabajadorCola(cola, nombre_cola, PROCESADORES[nombre_cola]).ejecutar(esperar_nuevos)
+    finally:
+        cola.cerrar()
+
+
+def lanzar_trabajadores(nombre_cola: str, cantidad: int, esperar_nuevos: bool = False) -> List[multiprocessing.Process]:
+    procesos = [
+        multiprocessing.Process(target=ejecutar_trabajador, args=(nombre_cola, esperar_nuevos, cantidad), daemon=not esperar_nuevos)
+        for _ in range(cantidad)
+    ]
+    for proceso in procesos:
+        proceso.start()
+    return procesos
+
+
+def encolar_clasificacion(cola: ColaTrabajos, items: List[Dict], lote: str, tamano: int = 100, modo: str = None) -> Tuple[int, List[str]]:
+    """
+    Encola los ítems en trabajos de 'tamano' ítems. La clave de cada trabajo sale del
+    contenido del bloque, así que un 'lote' reutilizado con otros ítems no toma resultados viejos.
+    'modo' (salida de la IA) viaja en la carga; sin él cada trabajador usa SALIDA_IA.
+
+    Returns:
+        (cantidad de trabajos nuevos, claves de los trabajos de estos ítems)
+    """
+    trabajos = []
+    for i in range(0, len(items), tamano):
+        bloque = [{campo: item.get(campo) for campo in CAMPOS_TRABAJO} for item in items[i:i + tamano]]
+        trabajos.append((clave_trabajo(lote, ["|".join(map(str, item.values())) for item in bloque]), {"items": bloque, "modo": modo}))
+    return cola.encolar(COLA_CLASIFICACION, lote, trabajos), [clave for clave, _ in trabajos]
+
+
+def clasificar_items_con_cola(items: List[Dict], lote: str, tamano: int = 100, trabajadores: int = None,
+                              intervalo: float = 2.0, modo: str = None) -> List[Dict]:
+    """
+    Clasifica los ítems repartiéndolos en la cola de trabajos: encola bloques de 'tamano'
+    ítems, lanza 'trabajadores' procesos locales (TRABAJADORES_COLA; con 0 se esperan
+    trabajadores externos, p. ej. en otras máquinas con la misma base) y junta los
+    resultados cuando el lote termina. Si la corrida se corta, volver a llamar con el mismo
+    'lote' solo procesa los bloques que no se habían confirmado.
+
+    Returns:
+        Lista de dicts con 'rowid' y 'categoria', en el orden de 'items' ('error' si un bloque falló).
+    """
+    cola = obtener_cola()
+    nuevos, claves = encolar_clasificacion(cola, items, lote, tamano, modo)
+    estado = cola.estado(COLA_CLASIFICACION, lote)
+    print(f"📥 Cola '{lote}': {nuevos} trabajos nuevos, {estado['hecho']} ya hechos, {estado['pendiente']} pendientes.")
+
+    trabajadores = get_trabajadores_cola() if trabajadores is None else trabajadores
+    procesos = lanzar_trabajadores(COLA_CLASIFICACION, trabajadores) if estado["pendiente"] or estado["en_proceso"] else []
+    inicio = time.monotonic()
+    while True:
+        estado = cola.estado(COLA_CLASIFICACION, lote)
+        if not estado["pendiente"] and not estado["en_proceso"]:
+            break
+        if procesos and not any(p.is_alive() for p in procesos):
+            # Los locales terminaron pero quedan trabajos de un proceso caído: se relanza uno
+            procesos = lanzar_trabajadores(COLA_CLASIFICACION, 1)
+        time.sleep(intervalo)
+    for proceso in procesos:
+        proceso.join()
+
+    categorias = {r["rowid"]: r["categoria"] for resultado in cola.resultados(COLA_CLASIFICACION, lote, claves) for r in resultado}
+    cola.cerrar()
+    print(f"✅ Cola '{lote}': {estado['hecho']} trabajos hechos, {estado['fallido']} fallidos en {time.monotonic() - inicio:.1f}s.")
+    return [{"rowid": item["rowid"], "categoria": categorias.get(item["rowid"], "error")} for item in items]
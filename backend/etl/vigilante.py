@@ -0,0 +1,151 @@
+# etl/vigilante.py
+import os
+import queue
+import threading
+from typing import Dict, Iterator, List, Tuple
+
+import pandas as pd
+
+from backend.etl.archivo_cfe import ArchivoCFE
+from backend.etl.manifiesto import ManifiestoCFE
+from backend.etl.xml_parser import parsear_xmls_en_carpeta, parsear_zips_en_carpeta
+
+
+class VigilanteCarpeta:
+    """
+    Vigila una carpeta de descarga (p. ej. 'cliente_{id}_{empresa}') y parsea los XML/ZIP
+    a medida que aparecen, mientras la descarga sigue en curso. Cada tanda de filas nuevas
+    se pone como DataFrame en 'cola' (con rowid correlativo para toda la vigilancia); al
+    detener se pone None como marca de fin.
+
+    Funciona por sondeo, sin dependencias extra: un archivo se procesa cuando su tamaño y
+    fecha de modificación no cambiaron entre dos pasadas, y los temporales del navegador
+    (.crdownload, .tmp) se ignoran por extensión. Se puede probar sin Datalogic copiando
+    archivos a una carpeta temporal y llamando a procesar_pendientes().
+    """
+
+    def __init__(self, carpeta: str, cola: queue.Queue = None, intervalo: float = 1.0,
+                 limpiar: bool = True, motor: str = "etree", manifiesto: ManifiestoCFE = None,
+                 columnar: bool = False, archivo_cfe: ArchivoCFE = None):
+        self.carpeta = carpeta
+        self.cola = cola if cola is not None else queue.Queue()
+        self.intervalo = intervalo
+        self.limpiar = limpiar
+        self.motor = motor
+        self.manifiesto = manifiesto
+        self.columnar = columnar
+        self.archivo_cfe = archivo_cfe
+
+        self.archivos_procesados = 0
+        self.filas_encoladas = 0
+        self._firmas: Dict[str, Tuple[int, int]] = {}
+        self._intentados: Dict[str, Tuple[int, int]] = {}
+        self._siguiente_rowid = 1
+        self._detener = threading.Event()
+        self._hilo = None
+        os.makedirs(carpeta, exist_ok=True)
+
+    def _leer_firmas(self) -> Dict[str, Tuple[int, int]]:
+        """
+        Devuelve nombre → (tamaño, mtime) de los XML/ZIP presentes en la carpeta.
+        """
+        firmas = {}
+        for nombre in sorted(os.listdir(self.carpeta)):
+            if os.path.splitext(nombre)[1].lower() not in (".xml", ".zip"):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.carpeta, nombre))
+            except FileNotFoundError:
+                continue
+            firmas[nombre] = (stat.st_size, stat.st_mtime_ns)
+        return firmas
+
+    def _archivos_estables(self) -> Tuple[List[str], List[str]]:
+        """
+        Devuelve (xmls, zips) que no cambiaron desde la pasada anterior y no se intentaron
+        ya con ese mismo contenido (los que fallan quedan en la carpeta y no se reintentan).
+        """
+        firmas = self._leer_firmas()
+        xmls, zips = [], []
+        for nombre, firma in firmas.items():
+            if firma[0] == 0 or self._firmas.get(nombre) != firma or self._intentados.get(nombre) == firma:
+                continue
+            (zips if nombre.lower().endswith(".zip") else xmls).append(nombre)
+            self._intentados[nombre] = firma
+
+        self._firmas = firmas
+        return xmls, zips
+
+    def procesar_pendientes(self) -> int:
+        """
+        Hace una pasada: parsea los archivos estables y encola sus filas.
+
+        Returns:
+            Cantidad de filas encoladas en esta pasada.
+        """
+        xmls, zips = self._archivos_estables()
+        lotes = []
+        if zips:
+            lotes.append(parsear_zips_en_carpeta(self.carpeta, limpiar=self.limpiar, motor=self.motor, manifiesto=self.manifiesto, columnar=self.columnar, archivo_cfe=self.archivo_cfe, zips=zips))
+        if xmls:
+            lotes.append(parsear_xmls_en_carpeta(self.carpeta, limpiar=self.limpiar, motor=self.motor, manifiesto=self.manifiesto, columnar=self.columnar, archivo_cfe=self.archivo_cfe, archivos=xmls))
+        self.archivos_procesados += len(xmls) + len(zips)
+
+        encoladas = 0
+        for df in lotes:
+            if not isinstance(df, pd.DataFrame) or df.empty:
+                continue
+            df["rowid"] = range(self._siguiente_rowid, self._siguiente_rowid + len(df))
+            self._siguiente_rowid += len(df)
+            self.cola.put(df)
+            encoladas += len(df)
+
+        self.filas_encoladas += encoladas
+        return encoladas
+
+    def _bucle(self) -> None:
+        while not self._detener.wait(self.intervalo):
+            try:
+                self.procesar_pendientes()
+            except Exception as e:
+                print(f"❌ Error vigilando {self.carpeta}: {e}")
+
+    def iniciar(self) -> "VigilanteCarpeta":
+        """
+        Arranca la vigilancia en un hilo de fondo.
+        """
+        self._detener.clear()
+        self._hilo = threading.Thread(target=self._bucle, name=f"vigilante-{os.path.basename(self.carpeta)}", daemon=True)
+        self._hilo.start()
+        print(f"👀 Vigilando {self.carpeta} cada {self.intervalo}s...")
+        return self
+
+    def detener(self) -> None:
+        """
+        Detiene el hilo, procesa lo que haya quedado en la carpeta y encola la marca de fin
+        (None). La marca se encola aunque falle la última pasada, para que quien consume
+        lotes() desde otro hilo no quede esperando para siempre.
+        """
+        self._detener.set()
+        if self._hilo is not None:
+            self._hilo.join()
+            self._hilo = None
+
+        try:
+            # Con la descarga terminada todo lo presente es estable: se toman las firmas
+            # actuales y se procesa en la misma pasada
+            self._firmas = self._leer_firmas()
+            self.procesar_pendientes()
+        finally:
+            self.cola.put(None)
+        print(f"✅ Vigilancia de {self.carpeta} terminada: {self.archivos_procesados} archivos, {self.filas_encoladas} ítems.")
+
+    def lotes(self) -> Iterator[pd.DataFrame]:
+        """
+        Consume la cola hasta la marca de fin, devolviendo cada DataFrame encolado.
+        """
+        while True:
+            df = self.cola.get()
+            if df is None:
+                return
+            yield df
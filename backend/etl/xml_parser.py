@@ -1,13 +1,75 @@
 # etl/xml_parser.py
+import io
 import os
+import numpy as np
 import pandas as pd
 import zipfile
 import tempfile
 import shutil
 import xml.etree.ElementTree as ET
+from lxml import etree
 import re
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from tqdm import tqdm
-from typing import List, Dict
+from typing import List, Dict, Iterator, Tuple
+from backend.etl.manifiesto import ManifiestoCFE, identificar_cfe
+from backend.etl.archivo_cfe import ArchivoCFE, comprimir_documento
+
+NS = {"dgicfe": "http://cfe.dgi.gub.uy"}
+_DGICFE = "{http://cfe.dgi.gub.uy}"
+
+# Campos de cabecera del CFE: (clave, etiqueta dgicfe, valor por defecto)
+CAMPOS_ENCABEZADO = [
+    ("fecha", "FchEmis", ""),
+    ("proveedor", "RznSoc", ""),
+    ("ruc", "RUCEmisor", ""),
+    ("nombre_comercial", "NomComercial", ""),
+    ("giro", "GiroEmis", ""),
+    ("telefono", "Telefono", ""),
+    ("sucursal", "EmiSucursal", ""),
+    ("codigo_sucursal", "CdgDGISucur", ""),
+    ("direccion", "DomFiscal", ""),
+    ("ciudad", "Ciudad", ""),
+    ("departamento", "Departamento", ""),
+    ("vencimiento", "FecVenc", ""),
+    ("tipo_moneda", "TpoMoneda", "UYU"),
+    ("tipo_cambio", "TpoCambio", "1"),
+]
+
+# Campos de cada dgicfe:Item: (clave, etiqueta dgicfe, valor por defecto)
+CAMPOS_ITEM = [
+    ("descripcion", "NomItem", ""),
+    ("cantidad", "Cantidad", "1"),
+    ("precio_unitario", "PrecioUnitario", "0"),
+    ("monto_item", "MontoItem", "0"),
+]
+
+# Columnas de cabecera (repetidas en cada ítem del CFE) que el modo columnar guarda como
+# categóricas, y columnas numéricas que guarda como float64
+COLUMNAS_CATEGORICAS = [
+    "fecha", "proveedor", "ruc", "nombre_comercial", "giro", "telefono", "sucursal",
+    "codigo_sucursal", "direccion", "ciudad", "departamento", "moneda", "archivo", "vencimiento"
+]
+COLUMNAS_NUMERICAS = ["cantidad", "precio_unitario", "monto_item", "tipo_cambio", "monto_uyu"]
+
+# Motores de parseo disponibles: "etree" (ElementTree + findtext por campo) o
+# "lxml" (un solo recorrido del árbol para cabecera e ítems)
+MOTORES_XML = ("etree", "lxml")
+
+_ETIQUETAS_ENCABEZADO = {_DGICFE + etiqueta: campo for campo, etiqueta, _ in CAMPOS_ENCABEZADO}
+_ETIQUETAS_ITEM = {_DGICFE + etiqueta: campo for campo, etiqueta, _ in CAMPOS_ITEM}
+_ETIQUETA_ITEM = _DGICFE + "Item"
+_ETIQUETAS_LXML = tuple(_ETIQUETAS_ENCABEZADO) + (_ETIQUETA_ITEM,) + tuple(_ETIQUETAS_ITEM)
+_PARSER_LXML = etree.XMLParser(resolve_entities=False, no_network=True)
+
+COLUMNAS_REGISTRO = [
+    "fecha", "proveedor", "ruc", "nombre_comercial", "giro", "telefono", "sucursal",
+    "codigo_sucursal", "direccion", "ciudad", "departamento", "descripcion", "cantidad",
+    "precio_unitario", "monto_item", "moneda", "tipo_cambio", "monto_uyu", "archivo", "vencimiento"
+]
 
 def descomprimir_archivos_zip_en(carpeta_destino: str) -> None:
     """
@@ -40,6 +102,40 @@ def descomprimir_archivos_zip_en(carpeta_destino: str) -> None:
     if not zip_encontrados:
         print("ℹ️ No se encontraron archivos .zip para descomprimir.")
 
+_APERTURA_CFE = re.compile(r"<([a-zA-Z0-9:]*CFE)(\s[^>]*)?>")
+
+
+def limpiar_contenido_xml(contenido: str) -> str:
+    """
+    Limpia el texto de un XML en memoria: quita el BOM y, si trae Adenda, se queda solo con
+    el bloque CFE; si no, encapsula el contenido en <FacturaCompleta>.
+    El bloque CFE se ubica buscando la etiqueta de apertura y luego el primer cierre
+    correspondiente, sin una regex DOTALL con backtracking sobre todo el documento.
+    """
+    contenido = contenido.strip().replace("\ufeff", "")
+
+    if "<Adenda>" not in contenido:
+        return f"<FacturaCompleta>\n{contenido}\n</FacturaCompleta>"
+
+    apertura = _APERTURA_CFE.search(contenido)
+    while apertura:
+        cierre = f"</{apertura.group(1)}>"
+        fin = contenido.find(cierre, apertura.end())
+        if fin != -1:
+            return contenido[apertura.start():fin + len(cierre)]
+        apertura = _APERTURA_CFE.search(contenido, apertura.start() + 1)
+
+    return contenido
+
+
+def limpiar_xml_en_memoria(contenido: bytes) -> bytes:
+    """
+    Versión en bytes de limpiar_contenido_xml: recibe el archivo crudo y devuelve
+    el XML limpio listo para el parser, sin escribir nada en disco.
+    """
+    return limpiar_contenido_xml(contenido.decode("utf-8")).encode("utf-8")
+
+
 def limpiar_xmls_en_carpeta(carpeta_descargas: str) -> None:
     """
     Limpia todos los XML en la carpeta: elimina caracteres especiales y encapsula correctamente el contenido.
@@ -49,97 +145,656 @@ def limpiar_xmls_en_carpeta(carpeta_descargas: str) -> None:
             ruta_original = os.path.join(carpeta_descargas, nombre_archivo)
 
             with open(ruta_original, "r", encoding="utf-8") as f:
-                contenido = f.read().strip()
-
-            contenido = contenido.replace("\ufeff", "")
+                contenido = f.read()
 
-            if "<Adenda>" in contenido:
-                match_cfe = re.search(r"<([a-zA-Z0-9:]*CFE)(\s[^>]*)?>.*?</\1>", contenido, re.DOTALL)
-                contenido_limpio = match_cfe.group(0) if match_cfe else contenido
-            else:
-                contenido_limpio = f"<FacturaCompleta>\n{contenido}\n</FacturaCompleta>"
+            contenido_limpio = limpiar_contenido_xml(contenido)
 
             with open(ruta_original, "w", encoding="utf-8") as f:
                 f.write(contenido_limpio)
 
 
-def parsear_xmls_en_carpeta(carpeta_descargas: str) -> List[Dict]:
+def _validar_motor(motor: str) -> None:
+    if motor not in MOTORES_XML:
+        raise ValueError(f"❌ Motor XML desconocido: {motor}. Opciones: {', '.join(MOTORES_XML)}")
+
+
+def _leer_archivo_xml(fuente, limpiar: bool = False, motor: str = "etree") -> Tuple[Dict[str, str], List[Dict[str, str]]]:
+    """
+    Lee cabecera e ítems de un XML desde una ruta o un archivo binario abierto (por ejemplo
+    un miembro de ZIP). Con limpiar=True lo lee crudo, lo limpia en memoria y le pasa los
+    bytes al parser sin reescribir el archivo.
+    """
+    if limpiar:
+        if isinstance(fuente, str):
+            with open(fuente, "rb") as f:
+                contenido = f.read()
+        else:
+            contenido = fuente.read()
+        fuente = io.BytesIO(limpiar_xml_en_memoria(contenido))
+
+    if motor == "lxml":
+        return _leer_cfe_lxml(etree.parse(fuente, _PARSER_LXML).getroot())
+    return _leer_cfe_etree(ET.parse(fuente).getroot())
+
+
+def _parsear_archivo_xml(fuente, archivo: str, limpiar: bool = False, motor: str = "etree") -> List[Dict]:
+    """
+    Parsea un XML (ver _leer_archivo_xml) y devuelve sus registros.
+    """
+    return _armar_registros(*_leer_archivo_xml(fuente, limpiar, motor), archivo)
+
+
+def _parsear_bloque_de_archivos(carpeta_descargas: str, archivos: List[str], limpiar: bool = False, motor: str = "etree", columnar: bool = False,
+                                identificar: bool = False, archivar: bool = False, subidos: set = None) -> Dict:
+    """
+    Parsea un bloque de archivos XML (en el proceso actual o en un worker del pool).
+    Elimina los archivos XML ya parseados. Con identificar=True calcula la identidad de
+    cada CFE (ver identificar_cfe) y con archivar=True lo comprime para el ArchivoCFE,
+    ambos con los mismos bytes que se parsean, sin releer el archivo. Los CFE cuya clave
+    o hash está en 'subidos' se borran sin parsearlos ni comprimirlos.
+
+    Returns:
+        Dict con 'registros' (lista de dicts, o BufferColumnar si columnar=True, en el orden
+        de 'archivos'), 'identidades' (archivo → identidad de cada archivo parseado),
+        'comprimidos' (archivo → comprimir_documento de cada archivo leído), 'parseados'
+        (archivos parseados sin error), 'omitidos' (cuántos estaban en 'subidos'), 'pid',
+        'archivos' y 'segundos'.
+    """
+    inicio = time.perf_counter()
+    registros = BufferColumnar() if columnar else []
+    identidades = {}
+    comprimidos = {}
+    parseados = []
+    omitidos = 0
+    subidos = subidos or set()
+
+    for archivo in archivos:
+        ruta = os.path.join(carpeta_descargas, archivo)
+        try:
+            fuente = ruta
+            if identificar or archivar:
+                with open(ruta, "rb") as f:
+                    contenido = f.read()
+                sha256 = None
+                if identificar:
+                    identidad = identificar_cfe(contenido)
+                    if identidad["clave"] in subidos or identidad["hash"] in subidos:
+                        os.remove(ruta)
+                        omitidos += 1
+                        continue
+                    identidades[archivo] = {**identidad, "archivo": archivo}
+                    sha256 = identidad["hash"]
+                if archivar:
+                    comprimidos[archivo] = comprimir_documento(contenido, sha256)
+                fuente = io.BytesIO(contenido)
+            encabezado, items = _leer_archivo_xml(fuente, limpiar, motor)
+            if columnar:
+                registros.agregar(encabezado, items, archivo)
+            else:
+                registros.extend(_armar_registros(encabezado, items, archivo))
+
+            # ✅ Eliminar solo si se parseó correctamente
+            os.remove(ruta)
+            parseados.append(archivo)
+
+        except Exception as e:
+            print(f"❌ Error procesando {archivo}: {e}")
+
+    return {
+        "registros": registros,
+        "identidades": identidades,
+        "comprimidos": comprimidos,
+        "parseados": parseados,
+        "omitidos": omitidos,
+        "pid": os.getpid(),
+        "archivos": len(archivos),
+        "segundos": time.perf_counter() - inicio
+    }
+
+
+def _reportar_throughput_por_worker(resultados: List[Dict]) -> None:
+    """
+    Imprime archivos e ítems por segundo de cada proceso del pool.
+    """
+    por_worker = {}
+    for r in resultados:
+        acum = por_worker.setdefault(r["pid"], {"archivos": 0, "items": 0, "segundos": 0.0})
+        acum["archivos"] += r["archivos"]
+        acum["items"] += len(r["registros"])
+        acum["segundos"] += r["segundos"]
+
+    for pid, acum in sorted(por_worker.items()):
+        segundos = acum["segundos"] or 1e-9
+        print(
+            f"⚙️ Worker {pid}: {acum['archivos']} archivos, {acum['items']} ítems en {acum['segundos']:.2f}s "
+            f"({acum['archivos'] / segundos:.1f} archivos/s, {acum['items'] / segundos:.1f} ítems/s)"
+        )
+
+
+def parsear_xmls_en_carpeta(carpeta_descargas: str, workers: int = 1, limpiar: bool = False, motor: str = "etree", manifiesto: ManifiestoCFE = None, columnar: bool = False, archivo_cfe: ArchivoCFE = None, archivos: List[str] = None) -> pd.DataFrame:
     """
     Parsea los archivos XML en la carpeta, extrayendo ítems de facturas con metadatos completos.
-    Devuelve una lista de diccionarios listos para subir a Supabase.
+    Devuelve un DataFrame (con 'rowid' desde 1) listo para subir a Supabase; vacío, con las
+    mismas columnas, si no hay XML o ninguno tiene ítems nuevos.
     Elimina los archivos XML ya parseados
+
+    Con workers > 1 reparte los archivos en bloques entre un ProcessPoolExecutor. Los bloques
+    se unen en el mismo orden que el recorrido serial, así que las filas y el 'rowid'
+    son idénticos a los de workers=1.
+
+    Con limpiar=True cada XML se limpia en memoria antes de parsearlo (no hace falta
+    llamar antes a limpiar_xmls_en_carpeta).
+
+    'motor' elige el backend de parseo (ver MOTORES_XML); todos devuelven las mismas filas.
+
+    Con un manifiesto, la identidad de cada CFE sale de los bytes del archivo (cada uno se
+    lee una sola vez): los que ya se subieron en corridas anteriores se borran sin
+    parsearlos y los demás parseados se registran en él.
+
+    Con columnar=True los ítems se acumulan por columna (ver BufferColumnar) y el
+    DataFrame sale con categóricas para la cabecera y float64 para los montos.
+
+    Con un archivo_cfe, cada XML crudo leído (menos los de CFE ya subidos) se guarda en el
+    pack comprimido, para poder reprocesarlo después con parsear_archivo_cfe: lo comprime
+    el mismo worker que lo parsea y el proceso principal solo lo escribe al final.
+
+    Si se pasa 'archivos', solo se parsean esos nombres de la carpeta.
     """
+    _validar_motor(motor)
     print("📂 Cargando XMLs desde carpeta local...")
-    ns = {"dgicfe": "http://cfe.dgi.gub.uy"}
+    registros = BufferColumnar() if columnar else []
+    archivos_xml = [f for f in (os.listdir(carpeta_descargas) if archivos is None else archivos) if f.lower().endswith(".xml")]
+    identificar = manifiesto is not None
+    archivar = archivo_cfe is not None
+    subidos = manifiesto.identidades_subidas() if manifiesto is not None else None
+
+    if not archivos_xml:
+        print("⚠️ No se encontraron archivos XML.")
+        return _dataframe_vacio(columnar)
+
+    if workers and workers > 1:
+        # Varios bloques por worker para balancear carga entre archivos grandes y chicos
+        tamano_bloque = max(1, -(-len(archivos_xml) // (workers * 4)))
+        bloques = [archivos_xml[i:i + tamano_bloque] for i in range(0, len(archivos_xml), tamano_bloque)]
+
+        inicio = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            resultados = list(executor.map(partial(_parsear_bloque_de_archivos, carpeta_descargas, limpiar=limpiar, motor=motor, columnar=columnar,
+                                                   identificar=identificar, archivar=archivar, subidos=subidos), bloques))
+        duracion = time.perf_counter() - inicio
+
+        for resultado in resultados:
+            if columnar:
+                registros.extender(resultado["registros"])
+            else:
+                registros.extend(resultado["registros"])
+
+        _reportar_throughput_por_worker(resultados)
+        print(f"⏱️ {len(archivos_xml)} archivos parseados en {duracion:.2f}s con {workers} workers.")
+    else:
+        resultados = [_parsear_bloque_de_archivos(carpeta_descargas, archivos_xml, limpiar, motor, columnar, identificar, archivar, subidos)]
+        registros = resultados[0]["registros"]
+
+    omitidos = sum(resultado["omitidos"] for resultado in resultados)
+    if manifiesto is not None:
+        parseados = {archivo for resultado in resultados for archivo in resultado["parseados"]}
+        manifiesto.registrar_parseados([
+            identidad for resultado in resultados for archivo, identidad in resultado["identidades"].items() if archivo in parseados
+        ])
+        if omitidos:
+            print(f"⏭️ {omitidos} CFE ya procesados en corridas anteriores, se omiten.")
+
+    if archivo_cfe is not None:
+        for resultado in resultados:
+            for archivo, documento in resultado["comprimidos"].items():
+                archivo_cfe.agregar_comprimido(archivo, documento)
+
+    if not len(registros):
+        df_nuevos = _dataframe_vacio(columnar)
+    elif columnar:
+        df_nuevos = registros.a_dataframe()
+    else:
+        df_nuevos = pd.DataFrame(registros, columns=COLUMNAS_REGISTRO)
+        df_nuevos["rowid"] = df_nuevos.index + 1
+
+    print(f"✅ {len(df_nuevos)} gastos nuevos extraídos de {len(archivos_xml) - omitidos} archivos XML.")
+    return df_nuevos
+
+
+def parsear_zips_en_carpeta(carpeta_descargas: str, limpiar: bool = True, motor: str = "etree", manifiesto: ManifiestoCFE = None, columnar: bool = False, archivo_cfe: ArchivoCFE = None, zips: List[str] = None) -> pd.DataFrame:
+    """
+    Parsea los XML directamente desde los ZIP descargados de Datalogic, leyendo cada miembro
+    como stream sin extraer nada a disco. La columna 'archivo' es el nombre del miembro
+    (sin carpetas internas), igual que al descomprimir con descomprimir_archivos_zip_en.
+    Elimina cada ZIP ya parseado; los miembros que fallan se extraen a la carpeta para
+    poder revisarlos o reprocesarlos con parsear_xmls_en_carpeta.
+    Con un manifiesto, los CFE ya subidos se saltean y los parseados se registran en él.
+    Con columnar=True el resultado sale tipado como en parsear_xmls_en_carpeta.
+    Con un archivo_cfe, cada miembro crudo se guarda en el pack comprimido.
+    Si se pasa 'zips', solo se procesan esos archivos de la carpeta.
+    Si no hay ZIP o no tienen ítems nuevos, devuelve un DataFrame vacío con las mismas columnas.
+    """
+    _validar_motor(motor)
+    print("📂 Cargando XMLs desde archivos ZIP...")
+    registros = BufferColumnar() if columnar else []
+    total_archivos = 0
+    zips = [f for f in (os.listdir(carpeta_descargas) if zips is None else zips) if f.lower().endswith(".zip")]
+
+    if not zips:
+        print("ℹ️ No se encontraron archivos .zip para parsear.")
+        return _dataframe_vacio(columnar)
+
+    for nombre_zip in zips:
+        ruta_zip = os.path.join(carpeta_descargas, nombre_zip)
+        parseados = []
+        try:
+            with zipfile.ZipFile(ruta_zip, "r") as zip_ref:
+                for info in zip_ref.infolist():
+                    if info.is_dir() or not info.filename.lower().endswith(".xml"):
+                        continue
+
+                    archivo = os.path.basename(info.filename)
+                    total_archivos += 1
+                    try:
+                        with zip_ref.open(info) as f:
+                            if manifiesto is None and archivo_cfe is None:
+                                encabezado, items = _leer_archivo_xml(f, limpiar, motor)
+                            else:
+                                contenido = f.read()
+                                if manifiesto is not None:
+                                    identidad = identificar_cfe(contenido)
+                                    if manifiesto.ya_subido(identidad):
+                                        continue
+                                if archivo_cfe is not None:
+                                    archivo_cfe.agregar(archivo, contenido)
+                                encabezado, items = _leer_archivo_xml(io.BytesIO(contenido), limpiar, motor)
+                                if manifiesto is not None:
+                                    parseados.append({**identidad, "archivo": archivo})
+
+                        if columnar:
+                            registros.agregar(encabezado, items, archivo)
+                        else:
+                            registros.extend(_armar_registros(encabezado, items, archivo))
+                    except Exception as e:
+                        print(f"❌ Error procesando {archivo} en {nombre_zip}: {e}")
+                        with open(os.path.join(carpeta_descargas, archivo), "wb") as destino:
+                            destino.write(zip_ref.read(info))
+
+            if manifiesto is not None:
+                manifiesto.registrar_parseados(parseados)
+            os.remove(ruta_zip)
+        except Exception as e:
+            print(f"❌ Error al leer {nombre_zip}: {e}")
+
+    print(f"✅ {len(registros)} gastos nuevos extraídos de {total_archivos} archivos XML en {len(zips)} ZIP.")
+
+    if not len(registros):
+        return _dataframe_vacio(columnar)
+    if columnar:
+        return registros.a_dataframe()
+
+    df_nuevos = pd.DataFrame(registros, columns=COLUMNAS_REGISTRO)
+    df_nuevos["rowid"] = df_nuevos.index + 1
+
+    return df_nuevos
+
+
+def parsear_archivo_cfe(archivo_cfe: ArchivoCFE, archivos: List[str] = None, limpiar: bool = True, motor: str = "etree", columnar: bool = False) -> pd.DataFrame:
+    """
+    Vuelve a parsear documentos guardados en un ArchivoCFE (el mes entero, o solo los
+    'archivos' indicados) sin volver a Datalogic. Sirve para rellenar campos nuevos o
+    reprocesar después de un cambio en el parser. No modifica el pack.
+    """
+    _validar_motor(motor)
+    print(f"📦 Releyendo {len(archivos) if archivos is not None else len(archivo_cfe)} CFE desde {archivo_cfe.ruta_pack}...")
+    registros = BufferColumnar() if columnar else []
+    total_archivos = 0
+
+    for archivo, contenido in archivo_cfe.iterar(archivos):
+        total_archivos += 1
+        try:
+            encabezado, items = _leer_archivo_xml(io.BytesIO(contenido), limpiar, motor)
+            if columnar:
+                registros.agregar(encabezado, items, archivo)
+            else:
+                registros.extend(_armar_registros(encabezado, items, archivo))
+        except Exception as e:
+            print(f"❌ Error procesando {archivo}: {e}")
+
+    print(f"✅ {len(registros)} ítems extraídos de {total_archivos} CFE archivados.")
+
+    if columnar:
+        return registros.a_dataframe()
+
+    df = pd.DataFrame(registros, columns=COLUMNAS_REGISTRO)
+    df["rowid"] = df.index + 1
+    return df
+
+
+def _armar_registros(encabezado: Dict[str, str], items: List[Dict[str, str]], archivo: str) -> List[Dict]:
+    """
+    Arma los registros (uno por ítem) a partir de los textos crudos de cabecera e ítems de un CFE.
+    """
+    tipo_moneda = encabezado["tipo_moneda"]
+    tipo_cambio = float(encabezado["tipo_cambio"]) if encabezado["tipo_cambio"] else 1.0
+
     registros = []
+    for item in items:
+        cantidad = float(item["cantidad"])
+        precio_unitario = float(item["precio_unitario"])
+        monto_item = float(item["monto_item"])
+        monto_uyu = monto_item * tipo_cambio if tipo_moneda != "UYU" else monto_item
+
+        registros.append({
+            "fecha": encabezado["fecha"],
+            "proveedor": encabezado["proveedor"],
+            "ruc": encabezado["ruc"],
+            "nombre_comercial": encabezado["nombre_comercial"],
+            "giro": encabezado["giro"],
+            "telefono": encabezado["telefono"],
+            "sucursal": encabezado["sucursal"],
+            "codigo_sucursal": encabezado["codigo_sucursal"],
+            "direccion": encabezado["direccion"],
+            "ciudad": encabezado["ciudad"],
+            "departamento": encabezado["departamento"],
+            "descripcion": item["descripcion"],
+            "cantidad": cantidad,
+            "precio_unitario": precio_unitario,
+            "monto_item": monto_item,
+            "moneda": tipo_moneda,
+            "tipo_cambio": tipo_cambio,
+            "monto_uyu": monto_uyu,
+            "archivo": archivo,
+            "vencimiento": encabezado["vencimiento"]
+        })
+    return registros
+
+
+class BufferColumnar:
+    """
+    Acumula ítems directamente por columna en vez de un dict por ítem: las columnas de
+    cabecera se codifican como diccionario (código int32 por ítem + valores únicos) y las
+    numéricas van a arrays float64. a_dataframe devuelve las mismas filas que
+    parsear_xmls_en_carpeta, con categóricas y float64 en vez de columnas object.
+    """
+
+    def __init__(self):
+        self.codigos = {col: array("i") for col in COLUMNAS_CATEGORICAS}
+        self.categorias = {col: {} for col in COLUMNAS_CATEGORICAS}
+        self.numeros = {col: array("d") for col in COLUMNAS_NUMERICAS}
+        self.descripciones = []
+
+    def __len__(self) -> int:
+        return len(self.descripciones)
+
+    def _codigo(self, columna: str, valor: str) -> int:
+        categorias = self.categorias[columna]
+        codigo = categorias.get(valor)
+        if codigo is None:
+            codigo = categorias[valor] = len(categorias)
+        return codigo
+
+    def agregar(self, encabezado: Dict[str, str], items: List[Dict[str, str]], archivo: str) -> None:
+        """
+        Agrega los ítems de un CFE (mismos cálculos que _armar_registros).
+        """
+        tipo_moneda = encabezado["tipo_moneda"]
+        tipo_cambio = float(encabezado["tipo_cambio"]) if encabezado["tipo_cambio"] else 1.0
+
+        # Convertir todo antes de tocar los buffers, así un ítem inválido no deja el CFE a medias
+        numeros = []
+        for item in items:
+            monto_item = float(item["monto_item"])
+            numeros.append((
+                float(item["cantidad"]),
+                float(item["precio_unitario"]),
+                monto_item,
+                tipo_cambio,
+                monto_item * tipo_cambio if tipo_moneda != "UYU" else monto_item
+            ))
+
+        n = len(items)
+        cabecera = {col: encabezado[col] for col in COLUMNAS_CATEGORICAS if col in encabezado}
+        cabecera["moneda"] = tipo_moneda
+        cabecera["archivo"] = archivo
+        for col in COLUMNAS_CATEGORICAS:
+            self.codigos[col].extend([self._codigo(col, cabecera[col])] * n)
+        for col, valores in zip(COLUMNAS_NUMERICAS, zip(*numeros)):
+            self.numeros[col].extend(valores)
+        self.descripciones.extend(item["descripcion"] for item in items)
+
+    def extender(self, otro: "BufferColumnar") -> None:
+        """
+        Agrega al final los ítems de otro buffer (por ejemplo el de un worker), recodificando
+        sus categorías contra las de este.
+        """
+        for col in COLUMNAS_CATEGORICAS:
+            remapeo = [self._codigo(col, valor) for valor in otro.categorias[col]]
+            self.codigos[col].extend(remapeo[codigo] for codigo in otro.codigos[col])
+        for col in COLUMNAS_NUMERICAS:
+            self.numeros[col].extend(otro.numeros[col])
+        self.descripciones.extend(otro.descripciones)
+
+    def a_dataframe(self) -> pd.DataFrame:
+        """
+        Arma el DataFrame con las columnas en el orden de COLUMNAS_REGISTRO y 'rowid' desde 1.
+        """
+        columnas = {}
+        for col in COLUMNAS_REGISTRO:
+            if col in self.codigos:
+                columnas[col] = pd.Categorical.from_codes(
+                    np.array(self.codigos[col], dtype=np.int32), categories=list(self.categorias[col])
+                )
+            elif col in self.numeros:
+                columnas[col] = np.array(self.numeros[col], dtype=np.float64)
+            else:
+                columnas[col] = self.descripciones
+        df = pd.DataFrame(columnas)
+        df["rowid"] = df.index + 1
+        return df
+
+
+def tipar_columnas(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Convierte un DataFrame de registros a los tipos del modo columnar
+    (categóricas para la cabecera, float64 para los montos).
+    """
+    tipos = {col: "category" for col in COLUMNAS_CATEGORICAS if col in df.columns}
+    tipos.update({col: "float64" for col in COLUMNAS_NUMERICAS if col in df.columns})
+    return df.astype(tipos)
+
+
+def _dataframe_vacio(columnar: bool = False) -> pd.DataFrame:
+    """
+    Resultado sin ítems, con las mismas columnas (y tipos, si columnar) que uno con ítems.
+    """
+    df = pd.DataFrame(columns=COLUMNAS_REGISTRO).assign(rowid=pd.Series(dtype="int64"))
+    return tipar_columnas(df) if columnar else df
+
+
+def _leer_cfe_etree(root) -> Tuple[Dict[str, str], List[Dict[str, str]]]:
+    """
+    Lee los textos de cabecera e ítems de un CFE ya parseado, buscando cada campo con findtext.
+    """
+    encabezado = {
+        campo: root.findtext(f".//dgicfe:{etiqueta}", defecto, namespaces=NS)
+        for campo, etiqueta, defecto in CAMPOS_ENCABEZADO
+    }
+    items = [
+        {campo: item.findtext(f"dgicfe:{etiqueta}", defecto, namespaces=NS) for campo, etiqueta, defecto in CAMPOS_ITEM}
+        for item in root.findall(".//dgicfe:Item", namespaces=NS)
+    ]
+    return encabezado, items
+
+
+def _leer_cfe_lxml(root) -> Tuple[Dict[str, str], List[Dict[str, str]]]:
+    """
+    Lee cabecera e ítems de un CFE parseado con lxml en un solo recorrido: root.iter filtra
+    en C las etiquetas de cabecera, los dgicfe:Item y sus campos, en orden de documento.
+    Equivale a _leer_cfe_etree (primera aparición de cada campo de cabecera y campos
+    de ítem como hijos directos).
+    """
+    encabezado = {}
+    campos_por_item = {}
+
+    for elem in root.iter(*_ETIQUETAS_LXML):
+        if elem is root:
+            continue
+        tag = elem.tag
+        if tag == _ETIQUETA_ITEM:
+            campos_por_item[elem] = {}
+        elif tag in _ETIQUETAS_ITEM:
+            campos = campos_por_item.get(elem.getparent())
+            if campos is not None:
+                campos.setdefault(_ETIQUETAS_ITEM[tag], elem.text or "")
+        else:
+            encabezado.setdefault(_ETIQUETAS_ENCABEZADO[tag], elem.text or "")
+
+    for campo, _, defecto in CAMPOS_ENCABEZADO:
+        encabezado.setdefault(campo, defecto)
+    items = [
+        {campo: campos.get(campo, defecto) for campo, _, defecto in CAMPOS_ITEM}
+        for campos in campos_por_item.values()
+    ]
+    return encabezado, items
+
+
+def _leer_cfe_iterparse(fuente, motor: str = "etree") -> Tuple[Dict[str, str], List[Dict[str, str]]]:
+    """
+    Lee cabecera e ítems de un CFE con iterparse, liberando cada elemento apenas se leyó.
+    Mantiene la semántica de findtext: se toma la primera aparición de cada campo de cabecera
+    y los campos de cada ítem son hijos directos de dgicfe:Item.
+    """
+    iterparse = etree.iterparse if motor == "lxml" else ET.iterparse
+
+    encabezado = {}
+    items = []
+    item_actual = None
+    profundidad = 0
+    profundidad_item = None
+
+    for evento, elem in iterparse(fuente, events=("start", "end")):
+        if evento == "start":
+            if elem.tag == _ETIQUETA_ITEM and item_actual is None and profundidad > 0:
+                item_actual = {}
+                profundidad_item = profundidad
+            profundidad += 1
+            continue
+
+        profundidad -= 1
+        if profundidad == 0:
+            break
+
+        tag = elem.tag
+        if item_actual is not None and profundidad == profundidad_item + 1 and tag in _ETIQUETAS_ITEM:
+            item_actual.setdefault(_ETIQUETAS_ITEM[tag], elem.text or "")
+        if tag in _ETIQUETAS_ENCABEZADO:
+            encabezado.setdefault(_ETIQUETAS_ENCABEZADO[tag], elem.text or "")
+        if item_actual is not None and profundidad == profundidad_item:
+            items.append({campo: item_actual.get(campo, defecto) for campo, _, defecto in CAMPOS_ITEM})
+            item_actual = None
+            profundidad_item = None
+        if item_actual is None:
+            elem.clear()
+
+    for campo, _, defecto in CAMPOS_ENCABEZADO:
+        encabezado.setdefault(campo, defecto)
+
+    return encabezado, items
+
+
+def iterar_registros_xml(fuente, archivo: str, motor: str = "etree") -> List[Dict]:
+    """
+    Parsea un CFE con iterparse, liberando cada elemento apenas se leyó.
+
+    Args:
+        fuente: Ruta o archivo binario abierto con el XML.
+        archivo: Nombre del archivo, se guarda en la columna 'archivo'.
+        motor: "etree" usa ElementTree.iterparse y "lxml" lxml.etree.iterparse.
+
+    Returns:
+        Lista de registros del documento (vacía si no tiene ítems).
+    """
+    return _armar_registros(*_leer_cfe_iterparse(fuente, motor), archivo)
+
+
+def iterar_xmls_en_carpeta(carpeta_descargas: str, tamano_lote: int = 5000, limpiar: bool = False, motor: str = "etree", manifiesto: ManifiestoCFE = None, columnar: bool = False, archivo_cfe: ArchivoCFE = None) -> Iterator[pd.DataFrame]:
+    """
+    Versión en streaming de parsear_xmls_en_carpeta: recorre los XML con iterparse y
+    devuelve los ítems en DataFrames de al menos 'tamano_lote' filas (el último puede
+    tener menos), así la memoria queda acotada sin importar cuántos archivos tenga el mes.
+    Un lote nunca parte un CFE: se supera 'tamano_lote' lo necesario para completarlo.
+    El 'rowid' es correlativo entre lotes, igual que en parsear_xmls_en_carpeta.
+    Con limpiar=True cada XML se limpia en memoria antes de parsearlo.
+    Con un manifiesto, los CFE ya subidos se saltean y los parseados se registran en él
+    a medida que se emite cada lote.
+    Con columnar=True cada lote sale tipado (ver tipar_columnas).
+    Con un archivo_cfe, cada XML crudo se guarda en el pack comprimido antes de parsearlo.
+    Elimina los archivos XML ya parseados.
+    """
+    _validar_motor(motor)
+    print("📂 Cargando XMLs desde carpeta local (streaming)...")
     archivos_xml = [f for f in os.listdir(carpeta_descargas) if f.lower().endswith(".xml")]
 
     if not archivos_xml:
         print("⚠️ No se encontraron archivos XML.")
-        return []
+        return
+
+    buffer = []
+    parseados = []
+    total = 0
+    omitidos = 0
+
+    def _emitir(registros: List[Dict]) -> pd.DataFrame:
+        df = pd.DataFrame(registros, columns=COLUMNAS_REGISTRO)
+        df["rowid"] = range(total - len(registros) + 1, total + 1)
+        return tipar_columnas(df) if columnar else df
+
+    def _registrar_parseados() -> None:
+        if manifiesto is not None and parseados:
+            manifiesto.registrar_parseados(parseados)
+            parseados.clear()
 
     for archivo in archivos_xml:
         ruta = os.path.join(carpeta_descargas, archivo)
         try:
-            tree = ET.parse(ruta)
-            root = tree.getroot()
-
-            # Datos del emisor
-            fecha = root.findtext(".//dgicfe:FchEmis", "", namespaces=ns)
-            proveedor = root.findtext(".//dgicfe:RznSoc", "", namespaces=ns)
-            ruc = root.findtext(".//dgicfe:RUCEmisor", "", namespaces=ns)
-            nombre_comercial = root.findtext(".//dgicfe:NomComercial", "", namespaces=ns)
-            giro = root.findtext(".//dgicfe:GiroEmis", "", namespaces=ns)
-            telefono = root.findtext(".//dgicfe:Telefono", "", namespaces=ns)
-            sucursal = root.findtext(".//dgicfe:EmiSucursal", "", namespaces=ns)
-            codigo_sucursal = root.findtext(".//dgicfe:CdgDGISucur", "", namespaces=ns)
-            direccion = root.findtext(".//dgicfe:DomFiscal", "", namespaces=ns)
-            ciudad = root.findtext(".//dgicfe:Ciudad", "", namespaces=ns)
-            departamento = root.findtext(".//dgicfe:Departamento", "", namespaces=ns)
-            vencimiento = root.findtext(".//dgicfe:FecVenc", "", namespaces=ns)
-            tipo_moneda = root.findtext(".//dgicfe:TpoMoneda", "UYU", namespaces=ns)
-            tipo_cambio_str = root.findtext(".//dgicfe:TpoCambio", "1", namespaces=ns)
-            tipo_cambio = float(tipo_cambio_str) if tipo_cambio_str else 1.0
-
-            for item in root.findall(".//dgicfe:Item", namespaces=ns):
-                descripcion = item.findtext("dgicfe:NomItem", "", namespaces=ns)
-                cantidad = float(item.findtext("dgicfe:Cantidad", "1", namespaces=ns))
-                precio_unitario = float(item.findtext("dgicfe:PrecioUnitario", "0", namespaces=ns))
-                monto_item = float(item.findtext("dgicfe:MontoItem", "0", namespaces=ns))
-                monto_uyu = monto_item * tipo_cambio if tipo_moneda != "UYU" else monto_item
-
-                registros.append({
-                    "fecha": fecha,
-                    "proveedor": proveedor,
-                    "ruc": ruc,
-                    "nombre_comercial": nombre_comercial,
-                    "giro": giro,
-                    "telefono": telefono,
-                    "sucursal": sucursal,
-                    "codigo_sucursal": codigo_sucursal,
-                    "direccion": direccion,
-                    "ciudad": ciudad,
-                    "departamento": departamento,
-                    "descripcion": descripcion,
-                    "cantidad": cantidad,
-                    "precio_unitario": precio_unitario,
-                    "monto_item": monto_item,
-                    "moneda": tipo_moneda,
-                    "tipo_cambio": tipo_cambio,
-                    "monto_uyu": monto_uyu,
-                    "archivo": archivo,
-                    "vencimiento": vencimiento
-                })
+            if limpiar or manifiesto is not None or archivo_cfe is not None:
+                with open(ruta, "rb") as f:
+                    contenido = f.read()
+                if manifiesto is not None:
+                    identidad = identificar_cfe(contenido)
+                    if manifiesto.ya_subido(identidad):
+                        os.remove(ruta)
+                        omitidos += 1
+                        continue
+                if archivo_cfe is not None:
+                    archivo_cfe.agregar(archivo, contenido)
+                fuente = io.BytesIO(limpiar_xml_en_memoria(contenido) if limpiar else contenido)
+            else:
+                fuente = ruta
+            buffer.extend(iterar_registros_xml(fuente, archivo, motor))
 
             # ✅ Eliminar solo si se parseó correctamente
             os.remove(ruta)
-
+            if manifiesto is not None:
+                parseados.append({**identidad, "archivo": archivo})
         except Exception as e:
             print(f"❌ Error procesando {archivo}: {e}")
 
-    print(f"✅ {len(registros)} gastos nuevos extraídos de {len(archivos_xml)} archivos XML.")
+        # Los lotes se cortan solo entre CFE: si un documento quedara repartido en dos lotes,
+        # al subir el primero el manifiesto lo marcaría subido y se descartaría el resto
+        if len(buffer) >= tamano_lote:
+            lote, buffer = buffer, []
+            total += len(lote)
+            _registrar_parseados()
+            yield _emitir(lote)
 
-    df_nuevos = pd.DataFrame(registros)
-    df_nuevos["rowid"] = df_nuevos.index + 1
+    if buffer:
+        total += len(buffer)
+        yield _emitir(buffer)
+    _registrar_parseados()
+
+    if omitidos:
+        print(f"⏭️ {omitidos} CFE ya procesados en corridas anteriores, se omiten.")
+    print(f"✅ {total} gastos nuevos extraídos de {len(archivos_xml)} archivos XML.")
 
-    return df_nuevos
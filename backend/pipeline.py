@@ -1,13 +1,22 @@
 from backend.utils import obtener_rango_de_fechas_por_mes, MESES_ES
-from backend.etl.xml_parser import limpiar_xmls_en_carpeta, parsear_xmls_en_carpeta
-from backend.etl.clasificador import clasificar_items_por_lotes, clasificar_lote, dividir_en_bloques
+from backend.etl.xml_parser import limpiar_xmls_en_carpeta, parsear_xmls_en_carpeta, iterar_xmls_en_carpeta, parsear_zips_en_carpeta
+from backend.etl.clasificador import clasificar_items_por_lotes, clasificar_lote, dividir_en_bloques, obtener_reglas_categorias
+from backend.etl.clasificador_async import clasificar_items_concurrente, verificar_clasificacion_completa
+from backend.etl.clasificador_batch import clasificar_items_batch
+from backend.etl.clasificador_cascada import clasificar_items_cascada
+from backend.etl.modelo_local import obtener_modelo_local
+from backend.etl.trabajos_cola import clasificar_items_con_cola
 from backend.etl.supabase_client import subir_dataframe
 from backend.etl.exportadores import exportar_json_mes_desde_supabase, exportar_xls_dgi_a_json
 from backend.etl.comparacion_dgi import comparar_datalogic_vs_dgi, procesar_comparacion_dgi
-from backend.config import get_db_path, get_datalogic_credentials, get_carpeta_descarga, get_carpeta_procesados
+from backend.config import get_db_path, get_datalogic_credentials, get_carpeta_descarga, get_carpeta_procesados, get_workers_parseo, get_motor_xml, get_manifiesto_path, get_parseo_columnar, get_carpeta_archivo_cfe, get_intervalo_vigilancia, get_clasificacion_batch, get_clasificacion_cascada, get_clasificacion_cola, get_modo_salida_ia, get_tamano_cola_etapas
 from backend.etl.datalogic_downloader import descargar_xml_cfe, descargar_y_descomprimir
-from backend.etl.supabase_client import obtener_historico
+from backend.etl.historico_local import obtener_historico_red
 from backend.etl.red_de_pescadores import normalizar_texto, aplicar_red_de_pescadores
+from backend.etl.manifiesto import ManifiestoCFE
+from backend.etl.archivo_cfe import ArchivoCFE
+from backend.etl.vigilante import VigilanteCarpeta
+from backend.etl.etapas import ejecutar_etapas
 
 import pandas as pd
 import os
@@ -18,91 +27,193 @@ descargo los datos de datalogic, los limpio, los parseo, y separo los que puedo
 red de pescadores y los que debo clasificar con IA
 '''
 
-def probar_red_de_pescadores():
+def clasificar_con_ia(registros: list, nombre_trabajo: str, empresa: str = None) -> list:
+    """
+    Clasifica los registros: primero con las reglas de palabras clave de la taxonomía,
+    después con el modelo local de la empresa (solo lo que supere UMBRAL_MODELO_LOCAL) y
+    lo que quede con IA: con la Batch API si CLASIFICACION_BATCH está activo (retomable por
+    'nombre_trabajo'), repartida en la cola de trabajos entre procesos si CLASIFICACION_COLA
+    está activo (también retomable por 'nombre_trabajo'), con la cascada de modelos si CLASIFICACION_CASCADA está activo
+    (umbral por 'empresa'), o en línea con pedidos concurrentes.
+    La IA responde con la salida estructurada por índices salvo que SALIDA_IA diga otra cosa.
+    """
+    modo = get_modo_salida_ia("indices")
+
+    def clasificar_resto(pendientes: list) -> list:
+        if get_clasificacion_batch():
+            return clasificar_items_batch(pendientes, nombre_trabajo, modo=modo)
+        if get_clasificacion_cola():
+            return clasificar_items_con_cola(pendientes, nombre_trabajo, modo=modo)
+        if get_clasificacion_cascada():
+            return clasificar_items_cascada(pendientes, empresa=empresa, modo=modo)
+        return clasificar_items_concurrente(pendientes, modo=modo)
+
+    def clasificar_sin_reglas(pendientes: list) -> list:
+        modelo = obtener_modelo_local(empresa)
+        return modelo.clasificar(pendientes, clasificar_resto) if modelo is not None else clasificar_resto(pendientes)
+
+    reglas = obtener_reglas_categorias()
+    resultados = reglas.clasificar(registros, clasificar_sin_reglas) if reglas is not None else clasificar_sin_reglas(registros)
+    verificar_clasificacion_completa(resultados)
+    return resultados
+
+def clasificar_y_unir(df_verificados: pd.DataFrame, df_no_verificados: pd.DataFrame, nombre_trabajo: str, empresa_datalogic: str, empresa: str = None) -> pd.DataFrame:
+    """
+    Clasifica con IA los ítems que la red de pescadores no verificó y los une con los
+    verificados en el DataFrame listo para subir_dataframe.
+    """
+    # Classify unverified items with AI
+    if not df_no_verificados.empty:
+        print(f"🤖 Clasificando {len(df_no_verificados)} ítems nuevos con IA...")
+        df_no_verificados_dict = df_no_verificados.to_dict(orient="records")
+        resultados = clasificar_con_ia(df_no_verificados_dict, nombre_trabajo, empresa)
+        
+        df_clasificacion = pd.DataFrame(resultados)
+        
+        # Merge with controlled suffixes to avoid categoria_x/y
+        df_no_verificados = df_no_verificados.merge(
+            df_clasificacion, on="rowid", how="left", suffixes=("", "_clasificada")
+        )
+        
+        # Use classified category if present
+        if "categoria_clasificada" in df_no_verificados.columns:
+            df_no_verificados["categoria"] = df_no_verificados["categoria_clasificada"].fillna(df_no_verificados["categoria"])
+            df_no_verificados.drop(columns=["categoria_clasificada"], inplace=True)
+    
+    # Ensure columns match before concatenating
+    columnas_comunes = list(set(df_verificados.columns) & set(df_no_verificados.columns))
+    
+    # Filter only common columns
+    df_verificados = df_verificados[columnas_comunes]
+    df_no_verificados = df_no_verificados[columnas_comunes]
+    
+    # Combine verified and AI-classified unverified items
+    df_final = pd.concat([df_verificados, df_no_verificados], ignore_index=True)
+    
+    # Ensure date is in correct format
+    df_final["fecha"] = pd.to_datetime(df_final["fecha"], errors="coerce")
+    
+    # Remove any columns that might cause conflicts
+    columnas_a_eliminar = ["rowid", "id"]
+    for col in columnas_a_eliminar:
+        if col in df_final.columns:
+            df_final = df_final.drop(columns=[col])
+    
+    print(f"📊 Total de registros a subir para {empresa_datalogic}: {len(df_final)}")
+    print(f"📊 Registros verificados: {len(df_verificados)}")
+    print(f"📊 Registros no verificados: {len(df_no_verificados)}")
+    return df_final
+
+def procesar_nuevos_con_red_de_pescadores(df_nuevos: pd.DataFrame, historico: pd.DataFrame, tabla_nombre: str, mes: str, empresa_datalogic: str, manifiesto: ManifiestoCFE = None, empresa: str = None) -> None:
+    """
+    Aplica la red de pescadores a un DataFrame de ítems nuevos, clasifica con IA los no
+    verificados y sube el resultado a Supabase. 'empresa' es el nombre de la empresa en
+    Supabase (el de las tablas y el histórico), con el que se buscan su modelo local y sus umbrales.
+    El trabajo de clasificación se nombra por tabla, mes y cliente, así un trabajo retomable
+    no se reutiliza entre meses.
+    """
+    # Apply fisherman's net classification
+    df_verificados, df_no_verificados = aplicar_red_de_pescadores(df_nuevos, historico)
+    df_final = clasificar_y_unir(df_verificados, df_no_verificados, f"{tabla_nombre}_{MESES_ES[mes]:02d}_{empresa_datalogic}", empresa_datalogic, empresa)
+    
+    # Upload data for this client
+    subir_dataframe(df_final, tabla_nombre, manifiesto=manifiesto)
+
+
+def probar_red_de_pescadores(tamano_lote: int = None, desde_zip: bool = False, vigilar: bool = False):
+    """
+    Si se indica tamano_lote, los XML de cada cliente se parsean en streaming y cada lote
+    de ítems pasa por la red de pescadores, la IA y Supabase por separado, con memoria
+    acotada sin importar el tamaño del mes. Parseo, red, IA y subida corren como etapas
+    superpuestas (ver ejecutar_etapas): mientras la IA clasifica un lote, el siguiente ya
+    se está parseando y emparejando.
+    Con desde_zip=True los ZIP descargados no se descomprimen: los XML se parsean
+    directamente desde el archivo.
+    Cada cliente usa un manifiesto local de CFE, así que los documentos ya subidos en
+    corridas anteriores no se vuelven a parsear ni a subir, y los XML crudos quedan
+    archivados en un pack comprimido por empresa y mes (ver ArchivoCFE).
+    Con vigilar=True cada carpeta de cliente se vigila durante la descarga y los XML/ZIP
+    se parsean apenas terminan de bajar (ver VigilanteCarpeta), así el parseo se solapa
+    con la descarga.
+    """
     carpeta_base = get_carpeta_descarga()
     creds_list = get_datalogic_credentials()
+    rango = obtener_rango_de_fechas_por_mes()
+    mes, anio = rango[0], rango[1]
+    
+    clientes = []
+    for creds in creds_list:
+        empresa_datalogic = creds["empresa"]
+        carpeta_cliente = os.path.join(carpeta_base, f"cliente_{creds['client_id']}_{empresa_datalogic}")
+        manifiesto = ManifiestoCFE(get_manifiesto_path(), empresa_datalogic)
+        archivo_cfe = ArchivoCFE(get_carpeta_archivo_cfe(), empresa_datalogic, f"{anio}_{MESES_ES[mes]:02d}")
+        vigilante = None
+        if vigilar:
+            vigilante = VigilanteCarpeta(carpeta_cliente, intervalo=get_intervalo_vigilancia(), limpiar=True, motor=get_motor_xml(), manifiesto=manifiesto, columnar=get_parseo_columnar(), archivo_cfe=archivo_cfe).iniciar()
+        clientes.append((creds, carpeta_cliente, manifiesto, archivo_cfe, vigilante))
     
-    # Download and decompress files for all clients
-    mes, anio, empresa = descargar_y_descomprimir(carpeta_base, creds_list)
+    # Download and decompress files for all clients (in watch mode ZIPs are parsed as they land)
+    try:
+        mes, anio, empresa = descargar_y_descomprimir(carpeta_base, creds_list, descomprimir=not (desde_zip or vigilar), rango=rango)
+    finally:
+        for _, _, _, _, vigilante in clientes:
+            if vigilante is not None:
+                vigilante.detener()
     
     # Process each client's data
-    for creds in creds_list:
+    for creds, carpeta_cliente, manifiesto, archivo_cfe, vigilante in clientes:
         client_id = creds["client_id"]
         empresa_datalogic = creds["empresa"]
-        carpeta_cliente = os.path.join(carpeta_base, f"cliente_{client_id}_{empresa_datalogic}")
         
         print(f"\n\n🔄 Procesando datos para cliente {client_id} - {empresa_datalogic} \n\n")
         
         try:
-            # Clean XMLs in client's folder
-            limpiar_xmls_en_carpeta(carpeta_cliente)
-            
-            # Parse XMLs into DataFrame
-            df_nuevos = parsear_xmls_en_carpeta(carpeta_cliente)
+            # Clean (in memory) and parse XMLs into DataFrame (or DataFrame chunks in streaming mode)
+            if vigilante is not None:
+                lotes_nuevos = vigilante.lotes()
+            elif desde_zip:
+                lotes_nuevos = [parsear_zips_en_carpeta(carpeta_cliente, motor=get_motor_xml(), manifiesto=manifiesto, columnar=get_parseo_columnar(), archivo_cfe=archivo_cfe)]
+            elif tamano_lote:
+                lotes_nuevos = iterar_xmls_en_carpeta(carpeta_cliente, tamano_lote, limpiar=True, motor=get_motor_xml(), manifiesto=manifiesto, columnar=get_parseo_columnar(), archivo_cfe=archivo_cfe)
+            else:
+                lotes_nuevos = [parsear_xmls_en_carpeta(carpeta_cliente, workers=get_workers_parseo(), limpiar=True, motor=get_motor_xml(), manifiesto=manifiesto, columnar=get_parseo_columnar(), archivo_cfe=archivo_cfe)]
             
-            if df_nuevos.empty:
-                print(f"ℹ️ No hay nuevos datos para procesar para el cliente {client_id}")
-                continue
-                
-            # Get historical data for this client
-            historico = obtener_historico(empresa=empresa, años=[2025])
-            
-            # Apply fisherman's net classification
-            df_verificados, df_no_verificados = aplicar_red_de_pescadores(df_nuevos, historico)
+            # Create table name specific to this client
+            tabla_nombre = f"{empresa}_{anio}"
+            nombre_trabajo = f"{tabla_nombre}_{MESES_ES[mes]:02d}_{empresa_datalogic}"
+            historico = None
             
-            # Classify unverified items with AI
-            if not df_no_verificados.empty:
-                print(f"🤖 Clasificando {len(df_no_verificados)} ítems nuevos con IA...")
-                resultados = []
-                df_no_verificados_dict = df_no_verificados.to_dict(orient="records")
-                for lote in tqdm(dividir_en_bloques(df_no_verificados_dict, 100)):
-                    resultados += clasificar_lote(lote)
-                
-                df_clasificacion = pd.DataFrame(resultados)
-                
-                # Merge with controlled suffixes to avoid categoria_x/y
-                df_no_verificados = df_no_verificados.merge(
-                    df_clasificacion, on="rowid", how="left", suffixes=("", "_clasificada")
-                )
+            # Parse, match, classify and upload overlap: while the AI classifies a chunk,
+            # the next one is already being parsed and matched
+            def emparejar(df_nuevos):
+                nonlocal historico
+                if df_nuevos.empty:
+                    print(f"ℹ️ No hay nuevos datos para procesar para el cliente {client_id}")
+                    return None
                 
-                # Use classified category if present
-                if "categoria_clasificada" in df_no_verificados.columns:
-                    df_no_verificados["categoria"] = df_no_verificados["categoria_clasificada"].fillna(df_no_verificados["categoria"])
-                    df_no_verificados.drop(columns=["categoria_clasificada"], inplace=True)
-            
-            # Ensure columns match before concatenating
-            columnas_comunes = list(set(df_verificados.columns) & set(df_no_verificados.columns))
-            
-            # Filter only common columns
-            df_verificados = df_verificados[columnas_comunes]
-            df_no_verificados = df_no_verificados[columnas_comunes]
+                # Get historical data for this client
+                if historico is None:
+                    historico = obtener_historico_red(empresa=empresa, años=[2025])
+                return aplicar_red_de_pescadores(df_nuevos, historico)
             
-            # Combine verified and AI-classified unverified items
-            df_final = pd.concat([df_verificados, df_no_verificados], ignore_index=True)
+            def clasificar(separados):
+                df_verificados, df_no_verificados = separados
+                return clasificar_y_unir(df_verificados, df_no_verificados, nombre_trabajo, empresa_datalogic, empresa)
             
-            # Ensure date is in correct format
-            df_final["fecha"] = pd.to_datetime(df_final["fecha"], errors="coerce")
+            def subir(df_final):
+                subir_dataframe(df_final, tabla_nombre, manifiesto=manifiesto)
+                return len(df_final)
             
-            # Remove any columns that might cause conflicts
-            columnas_a_eliminar = ["rowid", "id"]
-            for col in columnas_a_eliminar:
-                if col in df_final.columns:
-                    df_final = df_final.drop(columns=[col])
+            ejecutar_etapas(lotes_nuevos, [("red de pescadores", emparejar), ("IA", clasificar), ("subida", subir)], tamano_cola=get_tamano_cola_etapas())
             
-            # Create table name specific to this client
-            tabla_nombre = f"{empresa}_{anio}"
-            
-            print(f"📊 Total de registros a subir para {empresa_datalogic}: {len(df_final)}")
-            print(f"📊 Registros verificados: {len(df_verificados)}")
-            print(f"📊 Registros no verificados: {len(df_no_verificados)}")
-            
-            # Upload data for this client
-            subir_dataframe(df_final, tabla_nombre)
-            print(f"✅ Datos procesados y subidos para cliente {client_id} - {empresa_datalogic}")
+            if historico is not None:
+                print(f"✅ Datos procesados y subidos para cliente {client_id} - {empresa_datalogic}")
             
         except Exception as e:
             print(f"❌ Error procesando datos para cliente {client_id} - {empresa_datalogic}: {str(e)}")
             continue
+        finally:
+            manifiesto.cerrar()
     
     print("🎉 Proceso completo para todos los clientes.")
     return
@@ -117,16 +228,18 @@ def ejecutar_pipeline_completo_para_mes():
        
     mes, anio, empresa = descargar_y_descomprimir(carpeta, creds)
     tabla_nombre = f"{empresa}_{anio}"
+    manifiesto = ManifiestoCFE(get_manifiesto_path(), empresa)
+    archivo_cfe = ArchivoCFE(get_carpeta_archivo_cfe(), empresa, f"{anio}_{MESES_ES[mes]:02d}")
 
-    limpiar_xmls_en_carpeta(carpeta)
-
-    registros = parsear_xmls_en_carpeta(carpeta)
+    registros = parsear_xmls_en_carpeta(carpeta, workers=get_workers_parseo(), limpiar=True, motor=get_motor_xml(), manifiesto=manifiesto, columnar=get_parseo_columnar(), archivo_cfe=archivo_cfe)
+    if registros.empty:
+        print("ℹ️ No hay nuevos datos para procesar.")
+        manifiesto.cerrar()
+        return
 
     print(f"🤖 Clasificando {len(registros)} ítems nuevos con IA...")
-    resultados = []
     registros_dict = registros.to_dict(orient="records")
-    for lote in tqdm(dividir_en_bloques(registros_dict, 100)):
-        resultados += clasificar_lote(lote)
+    resultados = clasificar_con_ia(registros_dict, f"{empresa}_{anio}_{MESES_ES[mes]:02d}", empresa)
 
     df_clasificacion = pd.DataFrame(resultados)
     df_final = registros.merge(df_clasificacion, on="rowid", how="left")
@@ -134,7 +247,8 @@ def ejecutar_pipeline_completo_para_mes():
     print(f"✅ Total ítems clasificados: {len(df_final)}")
     print(df_final[["fecha", "proveedor", "descripcion", "monto_item", "categoria"]].head())
 
-    subir_dataframe(df_final, tabla_nombre)
+    subir_dataframe(df_final, tabla_nombre, manifiesto=manifiesto)
+    manifiesto.cerrar()
     return    
 
 ###################################################################################################
@@ -0,0 +1,84 @@
+# scripts/benchmark_clasificacion.py
+"""
+Compara, sin llamar a la API, cuántos pedidos y tokens de entrada cuesta clasificar un mes
+con el formato anterior (bloques fijos de 100 ítems con el JSON indentado de todas las
+columnas) y con el actual (proyección compacta de los campos útiles, bloques armados por
+presupuesto de tokens y deduplicación). También compara los tokens de salida de responder
+con nombres de categoría o con pares [rowid, índice] (usando las categorías del CSV como
+respuesta). Los tokens se cuentan con tiktoken si está instalado; si no, con la
+aproximación de 4 caracteres por token.
+
+Uso:
+    python -m backend.scripts.benchmark_clasificacion --csv data/items_clasificados_enero.csv
+"""
+import argparse
+import json
+
+import pandas as pd
+
+from backend.etl.clasificador import (
+    CATEGORIAS, PROMPT_CLASIFICACION, armar_mensajes_clasificacion, deduplicar_items, dividir_en_bloques, empaquetar_por_tokens
+)
+from backend.etl.limitador import _CODIFICADOR, estimar_tokens, estimar_tokens_mensajes
+
+
+def _mensajes_formato_anterior(bloque: list) -> list:
+    """
+    Reproduce el pedido anterior: todo en el mensaje user, con el JSON indentado de cada ítem.
+    """
+    return [
+        {"role": "system", "content": "Tu siguiente output devuelve solamente el formato JSON. Sin texto adicional"},
+        {"role": "user", "content": PROMPT_CLASIFICACION + "\nDatos:\n" + json.dumps(bloque, ensure_ascii=False, indent=2)}
+    ]
+
+
+def _medir(nombre: str, bloques: list, armar_mensajes, total_items: int) -> dict:
+    tokens = sum(estimar_tokens_mensajes(armar_mensajes(b)) for b in bloques)
+    return {
+        "formato": nombre,
+        "pedidos": len(bloques),
+        "items_enviados": sum(len(b) for b in bloques),
+        "tokens_entrada": tokens,
+        "tokens_por_item": round(tokens / total_items, 1)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de tokens y pedidos de clasificación")
+    parser.add_argument("--csv", default="data/items_clasificados_enero.csv")
+    parser.add_argument("--presupuesto", type=int, default=4000, help="Tokens de datos por pedido")
+    parser.add_argument("--max-items", type=int, default=200)
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.csv, encoding="utf-8-sig", dtype={"ruc": str})
+    categorias = df["categoria"].tolist() if "categoria" in df.columns else []
+    items = json.loads(df.drop(columns=["categoria"], errors="ignore").to_json(orient="records", force_ascii=False))
+    representantes, _ = deduplicar_items(items)
+
+    filas = [
+        _medir("anterior (100 fijos, JSON completo)", dividir_en_bloques(items, 100), _mensajes_formato_anterior, len(items)),
+        _medir("compacto + presupuesto", empaquetar_por_tokens(items, args.presupuesto, args.max_items), armar_mensajes_clasificacion, len(items)),
+        _medir("compacto + presupuesto + dedup", empaquetar_por_tokens(representantes, args.presupuesto, args.max_items), armar_mensajes_clasificacion, len(items)),
+    ]
+
+    print(f"📊 {len(items)} ítems de {args.csv} (tokens contados con {'tiktoken' if _CODIFICADOR else '≈4 caracteres/token'})")
+    print(pd.DataFrame(filas).to_string(index=False))
+    base = filas[0]["tokens_entrada"]
+    for fila in filas[1:]:
+        print(f"   {fila['formato']}: {1 - fila['tokens_entrada'] / base:.0%} menos tokens, {filas[0]['pedidos'] - fila['pedidos']} pedidos menos")
+
+    conocidas = [(item["rowid"], c) for item, c in zip(items, categorias) if c in CATEGORIAS]
+    if conocidas:
+        salida_nombres = estimar_tokens(json.dumps([{"rowid": r, "categoria": c} for r, c in conocidas], ensure_ascii=False))
+        salida_indices = estimar_tokens(json.dumps({"c": [[r, CATEGORIAS.index(c)] for r, c in conocidas]}))
+        print(f"📤 Salida para {len(conocidas)} ítems: nombres {salida_nombres} tokens ({salida_nombres / len(conocidas):.1f}/ítem), "
+              f"índices {salida_indices} tokens ({salida_indices / len(conocidas):.1f}/ítem), "
+              f"{1 - salida_indices / salida_nombres:.0%} menos.")
+
+    prefijo = estimar_tokens(PROMPT_CLASIFICACION)
+    print(f"🧷 Prefijo fijo (mensaje system): {prefijo} tokens, idéntico en todos los pedidos "
+          f"(OpenAI cachea prefijos de 1024 tokens o más).")
+
+
+if __name__ == "__main__":
+    main()
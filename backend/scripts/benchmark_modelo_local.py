@@ -0,0 +1,47 @@
+# scripts/benchmark_modelo_local.py
+"""
+Mide exactitud y latencia del modelo local: lo entrena con unos archivos de ítems ya
+clasificados y lo evalúa contra otros (por defecto, febrero y marzo contra los CSV de
+data/). Para cada umbral de probabilidad muestra qué parte de los ítems se clasificaría
+sin IA (cobertura) y con qué exactitud, para elegir UMBRAL_MODELO_LOCAL.
+
+Uso:
+    python -m backend.scripts.benchmark_modelo_local
+    python -m backend.scripts.benchmark_modelo_local --entrenamiento data/redomon/enero_2025.json --prueba data/redomon/marzo_2025.json
+"""
+import argparse
+import time
+
+import pandas as pd
+
+from backend.etl.modelo_local import ModeloLocal, evaluar_modelo
+from backend.scripts.entrenar_modelo_local import leer_archivos
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de exactitud y latencia del modelo local")
+    parser.add_argument("--entrenamiento", nargs="+", default=["data/redomon/febrero_2025.json", "data/redomon/marzo_2025.json"])
+    parser.add_argument("--prueba", nargs="+", default=["data/items_clasificados_enero.csv", "data/resultados/red_de_pescadores_resultado.csv"])
+    parser.add_argument("--umbrales", type=float, nargs="+", default=[0.5, 0.7, 0.8, 0.9, 0.95])
+    args = parser.parse_args()
+
+    entrenamiento = leer_archivos(args.entrenamiento).dropna(subset=["categoria"])
+    inicio = time.perf_counter()
+    modelo = ModeloLocal.entrenar(entrenamiento[["proveedor", "descripcion"]].to_dict(orient="records"), entrenamiento["categoria"].tolist())
+    print(f"🧮 Entrenado con {len(entrenamiento)} ítems ({modelo.metadatos['ejemplos_unicos']} únicos, "
+          f"{len(modelo.categorias)} categorías) en {time.perf_counter() - inicio:.2f}s")
+
+    for ruta in args.prueba:
+        prueba = pd.read_csv(ruta, encoding="utf-8-sig", dtype={"ruc": str}) if ruta.endswith(".csv") else leer_archivos([ruta])
+        prueba = prueba.dropna(subset=["categoria"])
+        metricas = evaluar_modelo(modelo, prueba[["proveedor", "descripcion"]].to_dict(orient="records"),
+                                  prueba["categoria"].tolist(), tuple(args.umbrales))
+        print(f"\n📊 {ruta}: {metricas['items']} ítems, exactitud {metricas['exactitud']:.1%}, "
+              f"{metricas['microsegundos_por_item']:.0f} µs por ítem")
+        print(pd.DataFrame(metricas["por_umbral"]).to_string(index=False, formatters={
+            "cobertura": "{:.0%}".format, "exactitud": lambda v: "-" if v is None or v != v else f"{v:.1%}"
+        }))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+# scripts/benchmark_normalizacion.py
+"""
+Compara la normalización de texto anterior (siete re.sub por valor, aplicada fila por
+fila) con la actual (tabla de traducción, memo de textos repetidos y normalización por
+columna) sobre las columnas proveedor y descripcion de archivos de ítems. Verifica que el
+resultado sea idéntico y muestra filas por segundo de cada una. Con --exhaustivo también
+compara todos los caracteres Unicode.
+
+Uso:
+    python -m backend.scripts.benchmark_normalizacion
+    python -m backend.scripts.benchmark_normalizacion --archivos data/redomon/*.json --repetir 50 --exhaustivo
+"""
+import argparse
+import re
+import sys
+import time
+
+import pandas as pd
+
+from backend.etl.red_de_pescadores import _normalizar_cadena, normalizar_serie, normalizar_texto
+from backend.scripts.benchmark_red_de_pescadores import leer_nuevos
+
+
+def normalizar_texto_anterior(texto: str) -> str:
+    """
+    normalizar_texto anterior, tal cual, para comparar.
+    """
+    if not isinstance(texto, str):
+        return ''
+    texto = texto.lower()
+    texto = re.sub(r'[áàäâ]', 'a', texto)
+    texto = re.sub(r'[éèëê]', 'e', texto)
+    texto = re.sub(r'[íìïî]', 'i', texto)
+    texto = re.sub(r'[óòöô]', 'o', texto)
+    texto = re.sub(r'[úùüû]', 'u', texto)
+    texto = re.sub(r'[^a-z0-9\s]', '', texto)
+    texto = re.sub(r'\s+', ' ', texto).strip()
+    return texto
+
+
+def comparar_unicode() -> int:
+    """
+    Compara ambas versiones con cada carácter Unicode en distintos contextos. Devuelve las diferencias.
+    """
+    diferencias = 0
+    for codigo in range(sys.maxunicode + 1):
+        caracter = chr(codigo)
+        for texto in (caracter, f"a{caracter}b", f" {caracter.upper()} x", caracter * 3):
+            if normalizar_texto_anterior(texto) != normalizar_texto(texto):
+                diferencias += 1
+    return diferencias
+
+
+def _filas_por_segundo(funcion, serie: pd.Series):
+    inicio = time.perf_counter()
+    resultado = funcion(serie)
+    return resultado, len(serie) / (time.perf_counter() - inicio)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de normalización de texto (re.sub vs tabla + memo por columna)")
+    parser.add_argument("--archivos", nargs="+", default=["data/redomon/enero_2025.json", "data/redomon/febrero_2025.json", "data/redomon/marzo_2025.json"])
+    parser.add_argument("--repetir", type=int, default=20, help="Multiplica las filas para medir con columnas más largas")
+    parser.add_argument("--exhaustivo", action="store_true", help="Compara también todos los caracteres Unicode")
+    args = parser.parse_args()
+
+    df = pd.concat([leer_nuevos(args.archivos)] * args.repetir, ignore_index=True)
+    filas = []
+    identico = True
+    for columna in ("proveedor", "descripcion"):
+        serie = df[columna]
+        anterior, fps_anterior = _filas_por_segundo(lambda s: s.apply(normalizar_texto_anterior), serie)
+        _normalizar_cadena.cache_clear()
+        fila_a_fila, fps_fila = _filas_por_segundo(lambda s: s.apply(normalizar_texto), serie)
+        _normalizar_cadena.cache_clear()
+        columna_fria, fps_fria = _filas_por_segundo(normalizar_serie, serie)
+        columna_caliente, fps_caliente = _filas_por_segundo(normalizar_serie, serie)
+        identico &= all(anterior.equals(r) for r in (fila_a_fila, columna_fria, columna_caliente))
+        filas.append({
+            "campo": columna,
+            "distintos": serie.nunique(),
+            "anterior (re.sub)": f"{fps_anterior:,.0f}",
+            "tabla fila a fila": f"{fps_fila:,.0f}",
+            "columna": f"{fps_fria:,.0f}",
+            "columna, memo lleno": f"{fps_caliente:,.0f}",
+            "mejora": f"{fps_fria / fps_anterior:.1f}x"
+        })
+
+    print(f"📊 Filas por segundo sobre {len(df)} filas de {len(args.archivos)} archivos:")
+    print(pd.DataFrame(filas).to_string(index=False))
+    print("✅ Resultado idéntico al anterior." if identico else "❌ El resultado difiere del anterior.")
+    if args.exhaustivo:
+        diferencias = comparar_unicode()
+        print(f"🔤 Todos los caracteres Unicode: {diferencias} diferencias.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+# scripts/benchmark_red_de_pescadores.py
+"""
+Compara la red de pescadores anterior (por cada ítem nuevo filtra todo el histórico y
+calcula SequenceMatcher contra cada fila del proveedor) con la actual (índice por
+proveedor con descripciones únicas y camino exacto), verifica que el resultado sea
+idéntico y muestra el tiempo de cada una. Con --repetir se multiplica el histórico y los
+ítems nuevos para simular meses más grandes; con --workers también se mide la búsqueda
+repartida entre procesos y se verifica que dé lo mismo que en un solo proceso.
+
+Uso:
+    python -m backend.scripts.benchmark_red_de_pescadores
+    python -m backend.scripts.benchmark_red_de_pescadores --historico data/redomon/febrero_2025.json data/redomon/marzo_2025.json --nuevos data/redomon/enero_2025.json --repetir 10
+    python -m backend.scripts.benchmark_red_de_pescadores --workers 4
+"""
+import argparse
+import json
+import time
+from difflib import SequenceMatcher
+
+import pandas as pd
+
+from backend.etl.red_de_pescadores import emparejar_con_historico, normalizar_texto, preparar_historico_para_red
+from backend.scripts.entrenar_modelo_local import leer_archivos
+
+
+def emparejar_anterior(df_nuevos: pd.DataFrame, historico: pd.DataFrame) -> pd.DataFrame:
+    """
+    Algoritmo anterior de aplicar_red_de_pescadores, tal cual, para comparar.
+    """
+    resultados = []
+    for _, row in df_nuevos.iterrows():
+        proveedor_n = normalizar_texto(row.get("proveedor", ""))
+        descripcion_n = normalizar_texto(row.get("descripcion", ""))
+
+        posibles = historico[historico["proveedor_norm"] == proveedor_n].copy()
+        posibles["similitud"] = posibles["descripcion_norm"].apply(
+            lambda x: SequenceMatcher(None, x, descripcion_n).ratio()
+        )
+        posibles = posibles[posibles["similitud"] >= 0.70]
+
+        if not posibles.empty:
+            mejor = posibles.sort_values("similitud", ascending=False).iloc[0]
+            row["categoria"] = mejor["categoria"]
+            row["verificado"] = True
+        else:
+            row["verificado"] = False
+
+        resultados.append(row)
+    return pd.DataFrame(resultados)
+
+
+def leer_nuevos(rutas: list) -> pd.DataFrame:
+    """
+    Lee los ítems nuevos (JSON o CSV) sin su categoría ni la marca de verificado.
+    """
+    frames = []
+    for ruta in rutas:
+        if ruta.lower().endswith(".csv"):
+            frames.append(pd.read_csv(ruta, encoding="utf-8-sig", dtype={"ruc": str}))
+        else:
+            with open(ruta, "r", encoding="utf-8") as f:
+                frames.append(pd.DataFrame(json.load(f)))
+    return pd.concat(frames, ignore_index=True).drop(columns=["categoria", "verificado"], errors="ignore")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de la red de pescadores (anterior vs índice por proveedor)")
+    parser.add_argument("--historico", nargs="+", default=["data/redomon/febrero_2025.json", "data/redomon/marzo_2025.json"])
+    parser.add_argument("--nuevos", nargs="+", default=["data/redomon/enero_2025.json"])
+    parser.add_argument("--repetir", type=int, default=1, help="Multiplica histórico e ítems nuevos")
+    parser.add_argument("--workers", type=int, default=1, help="Procesos para medir también la búsqueda en paralelo")
+    args = parser.parse_args()
+
+    historico = preparar_historico_para_red(pd.concat([leer_archivos(args.historico)] * args.repetir, ignore_index=True))
+    nuevos = pd.concat([leer_nuevos(args.nuevos)] * args.repetir, ignore_index=True)
+    print(f"📊 {len(nuevos)} ítems nuevos contra {len(historico)} filas verificadas del histórico")
+
+    inicio = time.perf_counter()
+    anterior = emparejar_anterior(nuevos, historico)
+    segundos_anterior = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    actual = emparejar_con_historico(nuevos, historico, workers=1)
+    segundos_actual = time.perf_counter() - inicio
+
+    identico = anterior.to_csv(index=False) == actual.to_csv(index=False)
+    print(f"   anterior: {segundos_anterior:.3f}s ({segundos_anterior / len(nuevos) * 1e6:.0f} µs por ítem)")
+    print(f"   índice:   {segundos_actual:.3f}s ({segundos_actual / len(nuevos) * 1e6:.0f} µs por ítem), "
+          f"{segundos_anterior / segundos_actual:.1f}x más rápido")
+    print(f"   {actual['verificado'].sum()} verificados por historial; "
+          + ("✅ resultado idéntico al anterior." if identico else "❌ el resultado difiere del anterior."))
+
+    if args.workers > 1:
+        inicio = time.perf_counter()
+        paralelo = emparejar_con_historico(nuevos, historico, workers=args.workers)
+        segundos_paralelo = time.perf_counter() - inicio
+        identico = paralelo.to_csv(index=False) == actual.to_csv(index=False)
+        print(f"   {args.workers} workers: {segundos_paralelo:.3f}s, {segundos_actual / segundos_paralelo:.1f}x respecto de un proceso; "
+              + ("✅ resultado idéntico." if identico else "❌ el resultado difiere."))
+
+
+if __name__ == "__main__":
+    main()
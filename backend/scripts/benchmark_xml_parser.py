@@ -0,0 +1,96 @@
+# scripts/benchmark_xml_parser.py
+"""
+Micro-benchmark de los motores de parseo de CFE (ElementTree + findtext vs lxml en un solo
+recorrido vs iterparse en streaming). Reconstruye los XML a partir de los ítems de
+data/redomon/*.json (un CFE por archivo) y verifica que todos los motores devuelvan lo mismo.
+
+Uso:
+    python -m backend.scripts.benchmark_xml_parser --repeticiones 20
+"""
+import argparse
+import glob
+import io
+import json
+import time
+from collections import OrderedDict
+from xml.sax.saxutils import escape
+
+from backend.etl.xml_parser import _parsear_archivo_xml, iterar_registros_xml, limpiar_xml_en_memoria
+
+PLANTILLA_CFE = """<?xml version="1.0" encoding="UTF-8"?>
+<CFE_Adenda><ns0:CFE xmlns:ns0="http://cfe.dgi.gub.uy" version="1.0"><ns0:eFact><ns0:Encabezado><ns0:IdDoc><ns0:TipoCFE>111</ns0:TipoCFE><ns0:Serie>A</ns0:Serie><ns0:Nro>{nro}</ns0:Nro><ns0:FchEmis>{fecha}</ns0:FchEmis><ns0:FecVenc>{fecha}</ns0:FecVenc></ns0:IdDoc><ns0:Emisor><ns0:RUCEmisor>{ruc}</ns0:RUCEmisor><ns0:RznSoc>{proveedor}</ns0:RznSoc><ns0:NomComercial>{nombre_comercial}</ns0:NomComercial><ns0:GiroEmis>{giro}</ns0:GiroEmis><ns0:Telefono>{telefono}</ns0:Telefono><ns0:EmiSucursal>{sucursal}</ns0:EmiSucursal><ns0:CdgDGISucur>{codigo_sucursal}</ns0:CdgDGISucur><ns0:DomFiscal>{direccion}</ns0:DomFiscal><ns0:Ciudad>{ciudad}</ns0:Ciudad><ns0:Departamento>{departamento}</ns0:Departamento></ns0:Emisor><ns0:Totales><ns0:TpoMoneda>{moneda}</ns0:TpoMoneda><ns0:TpoCambio>{tipo_cambio}</ns0:TpoCambio></ns0:Totales></ns0:Encabezado><ns0:Detalle>{items}</ns0:Detalle></ns0:eFact></ns0:CFE><Adenda>{adenda}</Adenda></CFE_Adenda>"""
+
+PLANTILLA_ITEM = "<ns0:Item><ns0:NroLinDet>{linea}</ns0:NroLinDet><ns0:NomItem>{descripcion}</ns0:NomItem><ns0:Cantidad>{cantidad}</ns0:Cantidad><ns0:UniMed>N/A</ns0:UniMed><ns0:PrecioUnitario>{precio_unitario}</ns0:PrecioUnitario><ns0:MontoItem>{monto_item}</ns0:MontoItem></ns0:Item>"
+
+
+def _texto(valor) -> str:
+    return escape("" if valor is None else str(valor))
+
+
+def construir_documentos(patron: str = "data/redomon/*.json") -> list:
+    """
+    Agrupa los ítems de los JSON por archivo y arma un CFE (bytes ya limpios) por grupo.
+    """
+    por_archivo = OrderedDict()
+    for ruta in sorted(glob.glob(patron)):
+        with open(ruta, encoding="utf-8") as f:
+            for fila in json.load(f):
+                por_archivo.setdefault(fila["archivo"], []).append(fila)
+
+    documentos = []
+    for nro, (archivo, filas) in enumerate(por_archivo.items()):
+        cabecera = filas[0]
+        items = "".join(
+            PLANTILLA_ITEM.format(linea=i + 1, **{k: _texto(fila[k]) for k in ("descripcion", "cantidad", "precio_unitario", "monto_item")})
+            for i, fila in enumerate(filas)
+        )
+        xml = PLANTILLA_CFE.format(
+            nro=nro,
+            items=items,
+            adenda="x" * 200,
+            **{k: _texto(cabecera.get(k)) for k in (
+                "fecha", "ruc", "proveedor", "nombre_comercial", "giro", "telefono", "sucursal",
+                "codigo_sucursal", "direccion", "ciudad", "departamento", "moneda", "tipo_cambio"
+            )}
+        )
+        documentos.append((archivo, limpiar_xml_en_memoria(xml.encode("utf-8"))))
+    return documentos
+
+
+MOTORES = {
+    "etree (findtext)": lambda contenido, archivo: _parsear_archivo_xml(io.BytesIO(contenido), archivo, motor="etree"),
+    "lxml (un recorrido)": lambda contenido, archivo: _parsear_archivo_xml(io.BytesIO(contenido), archivo, motor="lxml"),
+    "iterparse (streaming)": lambda contenido, archivo: iterar_registros_xml(io.BytesIO(contenido), archivo),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de motores de parseo de CFE")
+    parser.add_argument("--repeticiones", type=int, default=20)
+    parser.add_argument("--datos", default="data/redomon/*.json")
+    args = parser.parse_args()
+
+    documentos = construir_documentos(args.datos)
+    total_items = sum(len(MOTORES["etree (findtext)"](c, a)) for a, c in documentos)
+    print(f"📄 {len(documentos)} CFE reconstruidos ({total_items} ítems), {args.repeticiones} repeticiones\n")
+
+    referencia = [MOTORES["etree (findtext)"](c, a) for a, c in documentos]
+    base = None
+    for nombre, motor in MOTORES.items():
+        resultado = [motor(c, a) for a, c in documentos]
+        if resultado != referencia:
+            raise AssertionError(f"❌ {nombre} no devuelve los mismos registros que etree")
+
+        inicio = time.perf_counter()
+        for _ in range(args.repeticiones):
+            for archivo, contenido in documentos:
+                motor(contenido, archivo)
+        duracion = time.perf_counter() - inicio
+
+        docs_por_seg = len(documentos) * args.repeticiones / duracion
+        base = base or docs_por_seg
+        print(f"⏱️ {nombre:<24} {docs_por_seg:>10.0f} CFE/s  ({docs_por_seg / base:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+# scripts/entrenar_modelo_local.py
+"""
+Reentrena el modelo local de clasificación de una empresa con su histórico verificado
+(Supabase, o archivos JSON/CSV exportados) y lo guarda como una versión nueva en
+CARPETA_MODELOS_LOCALES/<empresa>/. También lista las versiones y permite volver a una anterior.
+
+Uso:
+    python -m backend.scripts.entrenar_modelo_local --empresa redomon --años 2024 2025
+    python -m backend.scripts.entrenar_modelo_local --empresa redomon --archivos data/redomon/*.json
+    python -m backend.scripts.entrenar_modelo_local --empresa redomon --listar
+    python -m backend.scripts.entrenar_modelo_local --empresa redomon --activar 20250601_120000_ab12cd34
+"""
+import argparse
+import glob
+import json
+import os
+
+import pandas as pd
+
+from backend.config import get_carpeta_modelos_locales
+from backend.etl.modelo_local import activar_version, entrenar_modelo_empresa
+
+
+def leer_archivos(rutas: list) -> pd.DataFrame:
+    """
+    Lee ítems clasificados de archivos JSON (lista de registros) o CSV. Si traen la columna
+    'verificado' se usan solo los verificados.
+    """
+    frames = []
+    for ruta in rutas:
+        if ruta.lower().endswith(".csv"):
+            frames.append(pd.read_csv(ruta, encoding="utf-8-sig", dtype={"ruc": str}))
+        else:
+            with open(ruta, "r", encoding="utf-8") as f:
+                frames.append(pd.DataFrame(json.load(f)))
+    df = pd.concat(frames, ignore_index=True)
+    if "verificado" in df.columns:
+        df = df[df["verificado"] == True]
+    return df
+
+
+def listar_versiones(carpeta: str) -> None:
+    actual = None
+    if os.path.exists(os.path.join(carpeta, "actual.json")):
+        with open(os.path.join(carpeta, "actual.json"), "r", encoding="utf-8") as f:
+            actual = json.load(f)["version"]
+    for ruta in sorted(glob.glob(os.path.join(carpeta, "*.json"))):
+        if os.path.basename(ruta) == "actual.json":
+            continue
+        with open(ruta, "r", encoding="utf-8") as f:
+            datos = json.load(f)
+        validacion = datos.get("validacion") or {}
+        exactitud = f"{validacion['exactitud']:.1%}" if validacion.get("exactitud") is not None else "-"
+        marca = "👉" if datos["version"] == actual else "  "
+        print(f"{marca} {datos['version']}: {datos['ejemplos']} ejemplos, {len(datos['categorias'])} categorías, exactitud de validación {exactitud}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Entrenamiento y versiones del modelo local de clasificación")
+    parser.add_argument("--empresa", required=True)
+    parser.add_argument("--años", type=int, nargs="+", default=[2025], help="Años del histórico en Supabase")
+    parser.add_argument("--archivos", nargs="+", default=None, help="Entrenar con JSON/CSV exportados en lugar de Supabase")
+    parser.add_argument("--no-activar", action="store_true", help="Guardar la versión sin ponerla en uso")
+    parser.add_argument("--listar", action="store_true", help="Listar las versiones guardadas")
+    parser.add_argument("--activar", default=None, metavar="VERSION", help="Poner en uso una versión ya guardada")
+    args = parser.parse_args()
+
+    carpeta = os.path.join(get_carpeta_modelos_locales(), args.empresa)
+    if args.listar:
+        listar_versiones(carpeta)
+        return
+    if args.activar:
+        activar_version(carpeta, args.activar)
+        print(f"✅ Versión {args.activar} activada para {args.empresa}.")
+        return
+
+    if args.archivos:
+        historico = leer_archivos(args.archivos)
+    else:
+        from backend.etl.supabase_client import obtener_historico
+        historico = obtener_historico(empresa=args.empresa, años=args.años)
+    if historico.empty:
+        print("⚠️ No hay histórico verificado para entrenar.")
+        return
+    entrenar_modelo_empresa(historico, args.empresa, carpeta, activar=not args.no_activar)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+# scripts/evaluar_reglas.py
+"""
+Mide las reglas de palabras clave de la taxonomía (etl/taxonomia_categorias.json) contra
+un CSV ya clasificado: qué porcentaje de ítems resuelven sin IA, cuántos quedan ambiguos,
+con qué precisión respecto de la categoría del CSV y cuánto tarda cada ítem. Sirve para
+revisar una regla nueva antes de agregarla.
+
+Uso:
+    python -m backend.scripts.evaluar_reglas --csv data/items_clasificados_enero.csv
+"""
+import argparse
+import json
+import time
+
+import pandas as pd
+
+from backend.etl.reglas_categorias import ReglasCategorias, cargar_taxonomia
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cobertura y precisión de las reglas de categorías")
+    parser.add_argument("--csv", default="data/items_clasificados_enero.csv")
+    parser.add_argument("--taxonomia", default=None, help="Ruta a otra taxonomía (por defecto la del paquete)")
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.csv, encoding="utf-8-sig", dtype={"ruc": str})
+    items = json.loads(df.to_json(orient="records", force_ascii=False))
+    reglas = ReglasCategorias(cargar_taxonomia(args.taxonomia) if args.taxonomia else None)
+
+    inicio = time.perf_counter()
+    resueltos, _ = reglas.aplicar(items)
+    segundos = time.perf_counter() - inicio
+    reglas.reportar()
+
+    esperadas = {item["rowid"]: item.get("categoria") for item in items}
+    errores = [r for r in resueltos if esperadas.get(r["rowid"]) != r["categoria"]]
+    if resueltos:
+        print(f"🎯 Precisión frente al CSV: {1 - len(errores) / len(resueltos):.1%} ({len(errores)} distintos)")
+    print(f"⏱️ {segundos / len(items) * 1e6:.1f} µs por ítem")
+    if errores:
+        por_rowid = {item["rowid"]: item for item in items}
+        print(pd.DataFrame([
+            {"proveedor": por_rowid[r["rowid"]].get("proveedor"), "descripcion": por_rowid[r["rowid"]].get("descripcion"),
+             "csv": esperadas[r["rowid"]], "reglas": r["categoria"]}
+            for r in errores
+        ]).drop_duplicates().to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+# scripts/openai_falso.py
+"""
+Servidor local que imita /v1/chat/completions de OpenAI para probar la clasificación sin
+gastar tokens ni depender de la red. Responde a cada ítem del pedido (por su rowid) con
+una categoría fija, y puede simular latencia, respuestas 429, JSON roto, filas perdidas y
+un ítem "veneno" que rompe cualquier respuesta que lo incluya (para probar la bisección).
+Si el pedido trae logprobs=True devuelve logprobs por token, con una fracción de ítems
+"dudosos" (baja probabilidad en la categoría) para probar la cascada de modelos.
+También imita /v1/files y /v1/batches: el batch se resuelve al crearlo y pasa por
+validating → in_progress → completed en consultas sucesivas, para probar el sondeo.
+
+Uso:
+    python -m backend.scripts.openai_falso --puerto 8765 --latencia 0.5 --tasa-429 0.1
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1 OPENAI_API_KEY=falsa python -m backend.pipeline
+"""
+import argparse
+import itertools
+import json
+import math
+import random
+import re
+import threading
+import time
+from email.parser import BytesParser
+from email.policy import default as politica_email
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_PATRON_ROWID = re.compile(r'"rowid"\s*:\s*(\d+)')
+_PATRON_LINEA = re.compile(r"^(\d+)\t", re.MULTILINE)
+
+
+class ManejadorOpenAIFalso(BaseHTTPRequestHandler):
+    latencia = 0.0
+    tasa_429 = 0.0
+    tasa_json_roto = 0.0
+    tasa_filas_perdidas = 0.0
+    veneno = None
+    tasa_dudosos = 0.0
+    categoria = "Gastos Varios"
+    indice_categoria = 5  # posición de "Gastos Varios" en CATEGORIAS, para la salida estructurada
+    pedidos = 0
+    en_vuelo = 0
+    max_en_vuelo = 0
+    archivos = {}
+    batches = {}
+    _ids = itertools.count(1)
+    _lock = threading.Lock()
+
+    def log_message(self, formato, *args):
+        pass
+
+    def _responder(self, estado: int, cuerpo: dict, encabezados: dict = None) -> None:
+        datos = json.dumps(cuerpo, ensure_ascii=False).encode("utf-8")
+        self.send_response(estado)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(datos)))
+        for clave, valor in (encabezados or {}).items():
+            self.send_header(clave, valor)
+        self.end_headers()
+        self.wfile.write(datos)
+
+    def do_GET(self):
+        cls = type(self)
+        partes = self.path.rstrip("/").split("/")
+        if "batches" in partes and partes[-1] in cls.batches:
+            batch = cls.batches[partes[-1]]
+            # Avanza un estado por consulta: validating → in_progress → completed
+            siguiente = {"validating": "in_progress", "in_progress": "completed"}.get(batch["status"])
+            respuesta = dict(batch)
+            if siguiente:
+                batch["status"] = siguiente
+            if respuesta["status"] != "completed":
+                respuesta["output_file_id"] = None
+            self._responder(200, respuesta)
+        elif partes[-1] == "content" and partes[-2] in cls.archivos:
+            datos = cls.archivos[partes[-2]]
+            self.send_response(200)
+            self.send_header("Content-Type", "application/octet-stream")
+            self.send_header("Content-Length", str(len(datos)))
+            self.end_headers()
+            self.wfile.write(datos)
+        else:
+            self._responder(404, {"error": {"message": f"ruta no soportada: {self.path}"}})
+
+    def _guardar_archivo(self, datos: bytes, proposito: str) -> dict:
+        cls = type(self)
+        id_archivo = f"file-falso-{next(cls._ids)}"
+        cls.archivos[id_archivo] = datos
+        return {"id": id_archivo, "object": "file", "bytes": len(datos), "created_at": int(time.time()),
+                "filename": f"{id_archivo}.jsonl", "purpose": proposito, "status": "processed"}
+
+    def _subir_archivo(self, crudo: bytes) -> None:
+        mensaje = BytesParser(policy=politica_email).parsebytes(
+            b"Content-Type: " + self.headers["Content-Type"].encode() + b"\r\n\r\n" + crudo
+        )
+        datos = b""
+        for parte in mensaje.iter_parts():
+            if parte.get_param("name", header="content-disposition") == "file":
+                datos = parte.get_payload(decode=True)
+        self._responder(200, self._guardar_archivo(datos, "batch"))
+
+    def _crear_batch(self, cuerpo: dict) -> None:
+        cls = type(self)
+        salida = []
+        for linea in cls.archivos[cuerpo["input_file_id"]].decode("utf-8").splitlines():
+            if not linea.strip():
+                continue
+            pedido = json.loads(linea)
+            salida.append(json.dumps({
+                "id": f"batch_req_{len(salida)}",
+                "custom_id": pedido["custom_id"],
+                "response": {"status_code": 200, "request_id": f"req_{len(salida)}", "body": self._completar(pedido["body"])},
+                "error": None
+            }, ensure_ascii=False))
+        archivo_salida = self._guardar_archivo(("\n".join(salida) + "\n").encode("utf-8"), "batch_output")
+        id_batch = f"batch_falso_{next(cls._ids)}"
+        cls.batches[id_batch] = {
+            "id": id_batch, "object": "batch", "endpoint": cuerpo["endpoint"], "input_file_id": cuerpo["input_file_id"],
+            "completion_window": cuerpo["completion_window"], "status": "validating", "created_at": int(time.time()),
+            "output_file_id": archivo_salida["id"], "error_file_id": None,
+            "request_counts": {"total": len(salida), "completed": len(salida), "failed": 0}
+        }
+        self._responder(200, cls.batches[id_batch])
+
+    def do_POST(self):
+        crudo = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.path.endswith("/files"):
+            self._subir_archivo(crudo)
+            return
+        cuerpo = json.loads(crudo or b"{}")
+        if self.path.endswith("/batches"):
+            self._crear_batch(cuerpo)
+            return
+        if not self.path.endswith("/chat/completions"):
+            self._responder(404, {"error": {"message": f"ruta no soportada: {self.path}"}})
+            return
+
+        cls = type(self)
+        with cls._lock:
+            cls.pedidos += 1
+            cls.en_vuelo += 1
+            cls.max_en_vuelo = max(cls.max_en_vuelo, cls.en_vuelo)
+        try:
+            if random.random() < cls.tasa_429:
+                self._responder(429, {"error": {"message": "Rate limit reached", "type": "requests"}}, {"retry-after": "1"})
+                return
+            time.sleep(cls.latencia)
+            self._responder(200, self._completar(cuerpo))
+        finally:
+            with cls._lock:
+                cls.en_vuelo -= 1
+
+    def _logprob_categoria(self) -> float:
+        return math.log(0.4) if random.random() < self.tasa_dudosos else math.log(0.99)
+
+    def _completar(self, cuerpo: dict) -> dict:
+        datos = cuerpo["messages"][-1]["content"].split("Datos:")[-1]
+        # Acepta ítems en JSON ("rowid": n) o compactados (una línea por ítem, rowid primero)
+        rowids = _PATRON_ROWID.findall(datos) or _PATRON_LINEA.findall(datos)
+        rowids = list(dict.fromkeys(int(r) for r in rowids))
+        rowids = [r for r in rowids if random.random() >= self.tasa_filas_perdidas]
+        # La respuesta se arma por piezas (texto, logprob): la categoría de cada ítem es una pieza
+        if cuerpo.get("response_format", {}).get("type") == "json_schema":
+            piezas = [('{"c":[', 0.0)]
+            for i, r in enumerate(rowids):
+                piezas += [("," if i else "", 0.0), (f"[{r},", 0.0), (str(self.indice_categoria), self._logprob_categoria()), ("]", 0.0)]
+            piezas.append(("]}", 0.0))
+        else:
+            piezas = [("[", 0.0)]
+            for i, r in enumerate(rowids):
+                piezas += [(", " if i else "", 0.0), (f'{{"rowid": {r}, "categoria": "', 0.0), (self.categoria, self._logprob_categoria()), ('"}', 0.0)]
+            piezas.append(("]", 0.0))
+        piezas = [(texto, logprob) for texto, logprob in piezas if texto]
+        contenido = "".join(texto for texto, _ in piezas)
+        logprobs = {"content": [{"token": texto, "logprob": logprob, "bytes": list(texto.encode("utf-8")), "top_logprobs": []}
+                                for texto, logprob in piezas]} if cuerpo.get("logprobs") else None
+        if (self.veneno and self.veneno in datos) or random.random() < self.tasa_json_roto:
+            contenido = contenido[:len(contenido) // 2]
+            logprobs = None
+        tokens_entrada = sum(len(m["content"]) for m in cuerpo["messages"]) // 4
+        tokens_salida = len(contenido) // 4
+        return {
+            "id": f"chatcmpl-falso-{self.pedidos}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": cuerpo.get("model", "gpt-4o-mini"),
+            "choices": [{"index": 0, "finish_reason": "stop", "logprobs": logprobs, "message": {"role": "assistant", "content": contenido}}],
+            "usage": {"prompt_tokens": tokens_entrada, "completion_tokens": tokens_salida, "total_tokens": tokens_entrada + tokens_salida}
+        }
+
+
+def levantar_servidor(puerto: int = 8765, latencia: float = 0.0, tasa_429: float = 0.0, tasa_json_roto: float = 0.0,
+                      tasa_filas_perdidas: float = 0.0, veneno: str = None, tasa_dudosos: float = 0.0) -> ThreadingHTTPServer:
+    """
+    Levanta el servidor falso en un hilo de fondo y lo devuelve (cerrar con .shutdown()).
+    """
+    ManejadorOpenAIFalso.latencia = latencia
+    ManejadorOpenAIFalso.tasa_429 = tasa_429
+    ManejadorOpenAIFalso.tasa_json_roto = tasa_json_roto
+    ManejadorOpenAIFalso.tasa_filas_perdidas = tasa_filas_perdidas
+    ManejadorOpenAIFalso.veneno = veneno
+    ManejadorOpenAIFalso.tasa_dudosos = tasa_dudosos
+    servidor = ThreadingHTTPServer(("127.0.0.1", puerto), ManejadorOpenAIFalso)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servidor falso compatible con la API de OpenAI")
+    parser.add_argument("--puerto", type=int, default=8765)
+    parser.add_argument("--latencia", type=float, default=0.5, help="Segundos de demora por pedido")
+    parser.add_argument("--tasa-429", type=float, default=0.0, help="Probabilidad de responder 429")
+    parser.add_argument("--tasa-json-roto", type=float, default=0.0, help="Probabilidad de devolver JSON cortado")
+    parser.add_argument("--tasa-filas-perdidas", type=float, default=0.0, help="Probabilidad de omitir cada fila")
+    parser.add_argument("--tasa-dudosos", type=float, default=0.0, help="Probabilidad de baja confianza por ítem (logprobs)")
+    parser.add_argument("--veneno", default=None, help="Texto que, si aparece en un pedido, rompe la respuesta")
+    args = parser.parse_args()
+
+    servidor = levantar_servidor(args.puerto, args.latencia, args.tasa_429, args.tasa_json_roto, args.tasa_filas_perdidas, args.veneno, args.tasa_dudosos)
+    print(f"🧪 OpenAI falso escuchando en http://127.0.0.1:{args.puerto}/v1 (Ctrl+C para salir)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        servidor.shutdown()
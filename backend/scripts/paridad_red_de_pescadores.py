@@ -0,0 +1,116 @@
+# scripts/paridad_red_de_pescadores.py
+"""
+Informe de paridad entre los motores de la red de pescadores: "secuencia" (SequenceMatcher
+dentro del mismo proveedor) y "trigramas" (índice de trigramas con similitud por
+subsecuencia común, solo en el mismo proveedor y con respaldo por proveedores con el mismo
+RUC o nombre parecido). Empareja los ítems de un resultado guardado contra el histórico de
+data/ con cada motor y muestra cuántos reconoce cada uno, en cuántos coinciden con
+SequenceMatcher, las diferencias y el tiempo. Si el archivo trae ítems verificados con
+'categoria', también compara contra esas categorías.
+
+Uso:
+    python -m backend.scripts.paridad_red_de_pescadores
+    python -m backend.scripts.paridad_red_de_pescadores --nuevos data/items_clasificados_enero.csv --historico data/redomon/febrero_2025.json data/redomon/marzo_2025.json
+    python -m backend.scripts.paridad_red_de_pescadores --variar-proveedores
+"""
+import argparse
+import json
+import time
+
+import pandas as pd
+
+from backend.etl.red_de_pescadores import IndiceHistorico, IndiceHistoricoTrigramas, emparejar_con_historico, preparar_historico_para_red
+from backend.scripts.benchmark_red_de_pescadores import leer_nuevos
+from backend.scripts.entrenar_modelo_local import leer_archivos
+
+MOTORES = {
+    "secuencia": IndiceHistorico,
+    "trigramas": lambda historico: IndiceHistoricoTrigramas(historico, buscar_parecidos=False),
+    "trigramas + parecidos": IndiceHistoricoTrigramas,
+}
+
+
+def _emparejar(crear_indice, nuevos: pd.DataFrame, historico: pd.DataFrame):
+    """
+    Returns:
+        (categoría asignada por ítem, NaN si no se reconoció; segundos)
+    """
+    inicio = time.perf_counter()
+    resultado = emparejar_con_historico(nuevos, historico, indice=crear_indice(historico))
+    segundos = time.perf_counter() - inicio
+    if "categoria" not in resultado.columns:
+        return pd.Series(index=resultado.index, dtype=object), segundos
+    return resultado["categoria"].where(resultado["verificado"]), segundos
+
+
+def _leer_referencia(rutas: list) -> pd.Series:
+    """
+    Categorías guardadas de los ítems que venían verificados (NaN en el resto), alineadas
+    con las filas de leer_nuevos.
+    """
+    frames = []
+    for ruta in rutas:
+        if ruta.lower().endswith(".csv"):
+            frames.append(pd.read_csv(ruta, encoding="utf-8-sig", dtype={"ruc": str}))
+        else:
+            with open(ruta, "r", encoding="utf-8") as f:
+                frames.append(pd.DataFrame(json.load(f)))
+    df = pd.concat(frames, ignore_index=True)
+    if "categoria" not in df.columns:
+        return pd.Series(index=df.index, dtype=object)
+    if "verificado" in df.columns:
+        return df["categoria"].where(df["verificado"] == True)
+    return df["categoria"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Paridad de los motores de la red de pescadores")
+    parser.add_argument("--nuevos", nargs="+", default=["data/resultados/red_de_pescadores_resultado.csv"])
+    parser.add_argument("--historico", nargs="+", default=["data/redomon/enero_2025.json", "data/redomon/febrero_2025.json", "data/redomon/marzo_2025.json"])
+    parser.add_argument("--ejemplos", type=int, default=10)
+    parser.add_argument("--variar-proveedores", action="store_true",
+                        help="Quita la última palabra del proveedor (S.A., SRL, ...) para simular nombres escritos distinto")
+    args = parser.parse_args()
+
+    historico = preparar_historico_para_red(leer_archivos(args.historico))
+    nuevos = leer_nuevos(args.nuevos)
+    referencia = _leer_referencia(args.nuevos)
+    if args.variar_proveedores:
+        nuevos["proveedor"] = nuevos["proveedor"].map(lambda p: p.rsplit(" ", 1)[0] if isinstance(p, str) and " " in p.strip() else p)
+    print(f"📊 {len(nuevos)} ítems de {', '.join(args.nuevos)} contra {len(historico)} filas verificadas del histórico\n")
+
+    categorias, filas = {}, []
+    for nombre, crear_indice in MOTORES.items():
+        categorias[nombre], segundos = _emparejar(crear_indice, nuevos, historico)
+    base = categorias["secuencia"]
+    con_referencia = referencia.notna()
+    for nombre, asignadas in categorias.items():
+        reconocidos = asignadas.notna()
+        ambos = reconocidos & base.notna()
+        filas.append({
+            "motor": nombre,
+            "reconocidos": int(reconocidos.sum()),
+            "igual a secuencia": int((ambos & (asignadas == base)).sum()),
+            "distinta categoría": int((ambos & (asignadas != base)).sum()),
+            "solo este": int((reconocidos & base.isna()).sum()),
+            "solo secuencia": int((base.notna() & ~reconocidos).sum()),
+            "acierta guardada": f"{int((reconocidos & con_referencia & (asignadas == referencia)).sum())}/{int((reconocidos & con_referencia).sum())}",
+        })
+    print(pd.DataFrame(filas).to_string(index=False))
+    print("   ('acierta guardada': de los reconocidos con categoría guardada en el archivo, cuántos la repiten)")
+
+    for nombre, crear_indice in MOTORES.items():
+        _, segundos = _emparejar(crear_indice, nuevos, historico)
+        print(f"⏱️ {nombre}: {segundos * 1000:.1f} ms ({segundos / max(len(nuevos), 1) * 1e6:.0f} µs por ítem)")
+
+    diferentes = nuevos.index[(categorias["trigramas + parecidos"].fillna("") != base.fillna(""))]
+    if len(diferentes):
+        print(f"\n🔍 Diferencias con secuencia (hasta {args.ejemplos}):")
+        ejemplos = nuevos.loc[diferentes[:args.ejemplos], ["proveedor", "descripcion"]].assign(
+            secuencia=base.loc[diferentes[:args.ejemplos]], trigramas=categorias["trigramas + parecidos"].loc[diferentes[:args.ejemplos]]
+        )
+        print(ejemplos.to_string())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+# scripts/trabajador_cola.py
+"""
+Trabajadores de la cola de trabajos (COLA_TRABAJOS_PATH): se pueden lanzar en cualquier
+cantidad de procesos o máquinas que compartan la base; cada uno reclama un trabajo, lo
+procesa, lo confirma y pasa al siguiente. Si un proceso muere, su trabajo vuelve a la cola
+cuando vence el lease (LEASE_COLA).
+
+Uso:
+    python -m backend.scripts.trabajador_cola --cola clasificacion --procesos 4
+    python -m backend.scripts.trabajador_cola --cola embeddings --encolar-embeddings vector_redomon_2025 --procesos 2
+    python -m backend.scripts.trabajador_cola --cola clasificacion --esperar   # queda escuchando trabajos nuevos
+    python -m backend.scripts.trabajador_cola --cola clasificacion --estado
+"""
+import argparse
+
+from backend.etl.trabajos_cola import PROCESADORES, lanzar_trabajadores, obtener_cola
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Trabajadores de la cola de clasificación/embeddings")
+    parser.add_argument("--cola", choices=sorted(PROCESADORES), required=True)
+    parser.add_argument("--procesos", type=int, default=1, help="Cantidad de procesos trabajadores")
+    parser.add_argument("--esperar", action="store_true", help="No terminar al vaciar la cola: esperar trabajos nuevos")
+    parser.add_argument("--estado", action="store_true", help="Mostrar cuántos trabajos hay por estado y salir")
+    parser.add_argument("--reintentar-fallidos", action="store_true", help="Volver a encolar los trabajos fallidos")
+    parser.add_argument("--encolar-embeddings", metavar="TABLA", default=None, help="Encolar las filas sin embedding de TABLA")
+    args = parser.parse_args()
+
+    cola = obtener_cola()
+    if args.reintentar_fallidos:
+        print(f"🔁 {cola.reintentar_fallidos(args.cola)} trabajos fallidos vueltos a encolar.")
+    if args.encolar_embeddings:
+        from backend.embeddings import encolar_embeddings
+        encolar_embeddings(args.encolar_embeddings)
+    print(f"📋 Cola '{args.cola}': {cola.estado(args.cola)}")
+    cola.cerrar()
+    if args.estado:
+        return
+
+    for proceso in lanzar_trabajadores(args.cola, args.procesos, args.esperar):
+        proceso.join()
+
+
+if __name__ == "__main__":
+    main()